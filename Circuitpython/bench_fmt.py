@@ -0,0 +1,111 @@
+# HAM RADIO GPS - DISPLAY FORMATTING ALLOCATION BENCHMARK
+#
+# FORMATS THE SAME RUN OF FIXES (LAT, LON, ALTITUDE FT AND M, SPEED, TRACK, SATELLITES, CLOCK) THE WAY
+# CODE.PY USED TO ('{0:.4f}'.format(), str(), ' ' * pad + text) AND WITH hamgps.fmt.number_field AND THE
+# CLOCK ENGINE BUFFERS, AND PRINTS THE HEAP BYTES ALLOCATED AND THE TIME SPENT PER FIX.
+#
+# ON THE BOARD: COPY TO CIRCUITPY AND RUN 'import bench_fmt' FROM THE REPL. THE GARBAGE COLLECTOR IS
+# DISABLED WHILE MEASURING SO gc.mem_alloc() COUNTS EVERY BYTE ALLOCATED.
+# UNDER CPYTHON (python Circuitpython/bench_fmt.py) FLOATS AND INTS ARE HEAP OBJECTS AND ARE FREED AS SOON
+# AS THEY ARE DROPPED, SO tracemalloc CAN ONLY REPORT THE PEAK TRANSIENT HEAP FOR THE WHOLE RUN.
+
+import gc
+import time
+
+from hamgps.fmt import number_field, put_two
+
+fixes = 200
+
+
+# THE FIX FIELDS ARE WORKED OUT INLINE, A TUPLE WOULD BE ALLOCATED IN BOTH MEASUREMENTS
+
+
+def old_format(i):
+    lat = 41.8781 + i * 0.00003
+    lon = -87.6298 + i * 0.00004
+    alt = 181 + i // 20
+    speed = 12.0 + (i % 7) * 0.1
+    track = 45.0 + (i % 5) * 0.1
+    sat = 9 + i % 3
+
+    pad_length = 8 - len('{0:.4f}'.format(lat))
+    lat_text = ' ' * pad_length + '{0:.4f}'.format(lat)
+    pad_length = 9 - len('{0:.4f}'.format(lon))
+    lon_text = ' ' * pad_length + '{0:.4f}'.format(lon)
+
+    alt_feet = int(alt * 3.28084)
+    alt_ft_text = ' ' * (5 - len(str(alt_feet))) + str(alt_feet)
+    alt_m_text = ' ' * (5 - len(str(alt))) + str(alt)
+
+    speed_text = '{0:.1f}'.format(speed)
+    speed_text = ' ' * (5 - len(speed_text)) + speed_text
+    track_text = '{0:.1f}'.format(track)
+    track_text = ' ' * (5 - len(track_text)) + track_text
+    sat_text = str(sat)
+
+    clock_text = '{:02d}'.format(i // 3600 % 24) + ':' + '{:02d}'.format(i // 60 % 60) + ':' + '{:02d}'.format(i % 60)
+    return lat_text, lon_text, alt_ft_text, alt_m_text, speed_text, track_text, sat_text, clock_text
+
+
+fields = (number_field(8, 4), number_field(9, 4), number_field(5), number_field(5), number_field(5, 1), number_field(5, 1), number_field(2))
+clock = bytearray(b'00:00:00')
+
+
+def new_format(i):
+    lat = 41.8781 + i * 0.00003
+    lon = -87.6298 + i * 0.00004
+    alt = 181 + i // 20
+    speed = 12.0 + (i % 7) * 0.1
+    track = 45.0 + (i % 5) * 0.1
+    sat = 9 + i % 3
+
+    fields[0].set(lat)
+    fields[1].set(lon)
+    fields[2].set(alt * 3.28084)
+    fields[3].set(alt)
+    fields[4].set(speed)
+    fields[5].set(track)
+    fields[6].set(sat)
+
+    put_two(clock, 0, i // 3600 % 24)
+    put_two(clock, 3, i // 60 % 60)
+    put_two(clock, 6, i % 60)
+
+
+def measure(name, format_fix):
+    gc.collect()
+
+    try:
+        import tracemalloc
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_alloc = tracemalloc.get_traced_memory()[0]
+    except ImportError:
+        tracemalloc = None
+        gc.disable()
+        start_alloc = gc.mem_alloc()
+
+    start = time.monotonic_ns()
+
+    for i in range(fixes):
+        format_fix(i)
+
+    elapsed = time.monotonic_ns() - start
+
+    if tracemalloc is not None:
+        allocated = '{:8d} peak bytes'.format(tracemalloc.get_traced_memory()[1] - start_alloc)
+        tracemalloc.stop()
+    else:
+        allocated = '{:8.1f} bytes / fix'.format((gc.mem_alloc() - start_alloc) / fixes)
+        gc.enable()
+
+    print('{:10s} {} {:8.1f} us / fix'.format(name, allocated, elapsed / 1000 / fixes))
+
+
+def main():
+    measure('format', old_format)
+    measure('fmt', new_format)
+
+
+main()
@@ -0,0 +1,63 @@
+# HAM RADIO GPS - LABEL VS GLYPH FIELD UPDATE BENCHMARK
+#
+# SHOWS A CLOCK AS A bitmap_label.Label AND AS A hamgps.glyphs.glyph_field AND TIMES AN UPDATE WHERE ONLY
+# THE SECONDS DIGIT CHANGES: THE text ASSIGNMENT ON ITS OWN, THEN THE ASSIGNMENT PLUS display.refresh().
+#
+# BOARD ONLY (NEEDS displayio): STOP CODE.PY (CTRL-C), THEN RUN 'import bench_glyphs' FROM THE REPL.
+# THE PINS MATCH THE DEFAULTS IN CODE.PY.
+
+import gc
+import time
+
+from hamgps import hal
+
+font_file = 'fonts/consolas-16.pcf'
+repeats = 100
+
+
+def measure(name, field, refresh):
+    texts = tuple('12:34:5{}'.format(i) for i in range(10))
+    field.text = texts[-1]
+    refresh()
+
+    gc.collect()
+    start = time.monotonic_ns()
+
+    for i in range(repeats):
+        field.text = texts[i % 10]
+
+    set_ns = (time.monotonic_ns() - start) / repeats
+
+    gc.collect()
+    start = time.monotonic_ns()
+
+    for i in range(repeats):
+        field.text = texts[i % 10]
+        refresh()
+
+    total_ns = (time.monotonic_ns() - start) / repeats
+
+    print('{:6s} {:9.1f} us set {:9.1f} us set + refresh'.format(name, set_ns / 1000, total_ns / 1000))
+
+
+def main():
+    disp = hal.board_display('SCK', 'MOSI', 'D5', 'D6', 'D9', 320, 240)
+    font = disp.load_font(font_file)
+    group = disp.group()
+    disp.show(group)
+    disp.set_auto_refresh(False)
+
+    label = disp.label(font, ' ' * 8, 0x00FF00, 0, 20)
+    group.append(label)
+    measure('label', label, disp.refresh)
+    group.remove(label)
+
+    field = disp.glyph_field(disp.glyph_atlas(font), ' ' * 8, 0x00FF00, 0, 20)
+    group.append(field)
+    measure('glyph', field, disp.refresh)
+    group.remove(field)
+
+    disp.set_auto_refresh(True)
+
+
+main()
@@ -0,0 +1,115 @@
+# HAM RADIO GPS - NMEA PARSER ALLOCATION BENCHMARK
+#
+# FEEDS THE SAME RMC + GGA SENTENCES THROUGH adafruit_gps.GPS AND hamgps.nmea.nmea_reader AND PRINTS
+# THE HEAP BYTES ALLOCATED AND THE TIME SPENT PER SENTENCE.
+#
+# ON THE BOARD: COPY TO CIRCUITPY AND RUN 'import bench_nmea' FROM THE REPL. THE GARBAGE COLLECTOR IS
+# DISABLED WHILE MEASURING SO gc.mem_alloc() COUNTS EVERY BYTE ALLOCATED.
+# UNDER CPYTHON (python Circuitpython/bench_nmea.py) OBJECTS ARE FREED AS SOON AS THEY ARE DROPPED, SO
+# tracemalloc CAN ONLY REPORT THE PEAK TRANSIENT HEAP ABOVE THE STARTING POINT FOR THE WHOLE RUN.
+
+import gc
+import time
+
+import adafruit_gps
+
+from hamgps.nmea import nmea_reader
+
+sentence_bodies = (
+    'GNRMC,110640.00,A,4152.68600,N,08737.78800,W,12.000,45.00,101022,,,A',
+    'GNGGA,110640.00,4152.68600,N,08737.78800,W,1,09,0.90,181.0,M,-34.0,M,,',
+    'GNRMC,110641.00,A,4152.68835,N,08737.78484,W,12.000,45.00,101022,,,A',
+    'GNGGA,110641.00,4152.68835,N,08737.78484,W,1,09,0.90,181.2,M,-34.0,M,,',
+)
+
+repeats = 25
+
+
+def nmea_sentence(body):
+    checksum = 0
+
+    for char in body:
+        checksum ^= ord(char)
+
+    return bytes('${}*{:02X}\r\n'.format(body, checksum), 'ascii')
+
+
+# IN-MEMORY UART, READS ARE CAPPED AT chunk BYTES LIKE A UART THAT IS POLLED AS DATA ARRIVES
+
+
+class memory_uart:
+    def __init__(self, data, chunk=64):
+        self._data = data
+        self._view = memoryview(data)
+        self._pos = 0
+        self._chunk = chunk
+        self.timeout = 1
+
+    @property
+    def in_waiting(self):
+        return len(self._data) - self._pos
+
+    def readinto(self, buf):
+        count = min(len(buf), self._chunk, len(self._data) - self._pos)
+
+        if not count:
+            return None
+
+        buf[0:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def readline(self):
+        end = self._data.find(b'\n', self._pos) + 1
+
+        if not end:
+            end = len(self._data)
+
+        line = self._data[self._pos:end]
+        self._pos = end
+        return line
+
+
+def measure(name, parser, uart, sentences):
+    gc.collect()
+
+    try:
+        import tracemalloc
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_alloc = tracemalloc.get_traced_memory()[0]
+    except ImportError:
+        tracemalloc = None
+        gc.disable()
+        start_alloc = gc.mem_alloc()
+
+    start = time.monotonic_ns()
+
+    while uart.in_waiting:
+        parser.update()
+
+    elapsed = time.monotonic_ns() - start
+
+    if tracemalloc is not None:
+        allocated = '{:8d} peak bytes'.format(tracemalloc.get_traced_memory()[1] - start_alloc)
+        tracemalloc.stop()
+    else:
+        allocated = '{:8.1f} bytes / sentence'.format((gc.mem_alloc() - start_alloc) / sentences)
+        gc.enable()
+
+    print('{:10s} {} {:8.1f} us / sentence'.format(name, allocated, elapsed / 1000 / sentences))
+
+
+def main():
+    data = b''.join(nmea_sentence(body) for body in sentence_bodies) * repeats
+    sentences = len(sentence_bodies) * repeats
+
+    uart = memory_uart(data)
+    measure('adafruit', adafruit_gps.GPS(uart, debug=False), uart, sentences)
+
+    uart = memory_uart(data)
+    measure('nmea', nmea_reader(uart), uart, sentences)
+
+
+main()
@@ -0,0 +1,25 @@
+# HAM RADIO GPS - BOOT
+# 2022 DOUGLAS GRAHAM, AB9XA
+#
+# RUNS ONCE AFTER A HARD RESET, BEFORE USB IS STARTED. CIRCUITPY CAN ONLY BE WRITTEN BY ONE SIDE: THE
+# COMPUTER OVER USB OR CODE.PY. BY DEFAULT IT IS REMOUNTED WRITABLE FOR CODE.PY SO THE TRACK LOGGER CAN
+# WRITE /tracks (THE COMPUTER SEES A READ-ONLY DRIVE AND CAN STILL COPY THE TRACKS OFF).
+#
+# HOLD THE BRIGHTNESS DOWN BUTTON DURING RESET TO LEAVE CIRCUITPY WRITABLE OVER USB, TO EDIT CODE.PY OR
+# DELETE TRACKS. THE TRACK LOGGER THEN FINDS THE FILESYSTEM READ-ONLY AND TURNS ITSELF OFF.
+
+import board
+import digitalio
+import storage
+
+# BRIGHTNESS DOWN BUTTON (pin_bright_down IN CODE.PY)
+pin_usb_write = board.D11
+
+button = digitalio.DigitalInOut(pin_usb_write)
+button.direction = digitalio.Direction.INPUT
+button.pull = digitalio.Pull.UP
+
+if button.value:
+    storage.remount('/', readonly=False)
+
+button.deinit()
@@ -30,24 +30,29 @@
 # D11   DIGITAL INPUT - BRIGHTNESS DOWN
 # D12   DIGITAL INPUT - BRIGHTNESS UP
 
-import analogio
-import board
-import busio
-import displayio
-import math
-import pwmio
-import rtc
+import asyncio
+import os
 import time
 
-import adafruit_fancyled.adafruit_fancyled as fancy
-import adafruit_gps
-import adafruit_ili9341
-import adafruit_lsm303dlh_mag
-
-from adafruit_bitmap_font import bitmap_font
-from adafruit_display_text import bitmap_label
-from adafruit_progressbar.horizontalprogressbar import (HorizontalProgressBar, HorizontalFillDirection)
-from digitalio import DigitalInOut, Direction, Pull
+from hamgps import hal
+from hamgps import link
+from hamgps import magcal
+from hamgps import scheduler
+from hamgps import startup
+from hamgps import timekeeping
+from hamgps import tzrules
+from hamgps import ui
+from hamgps.buttons import debounced_button
+from hamgps.compass import comp_point, heading
+from hamgps.fmt import number_field
+from hamgps.frame import frame_display
+from hamgps.grid import grid_engine
+from hamgps.heap import heap_monitor
+from hamgps.magsampler import mag_sampler, mag_scale
+from hamgps.pages import page_manager
+from hamgps.power import bat_level, power_manager
+from hamgps.profiler import page_lines, profiler
+from hamgps.track import track_logger
 
 # VERSION
 version = '1.3'
@@ -56,20 +61,23 @@ version = '1.3'
 # USER ADJUSTABLE VARIABLES LISTED BELOW                       #
 ################################################################
 
-# DST START / END (MONTH, WEEK, DAY, HOUR) / OFFSET IN SECONDS
-dst_start = (3, 2, 6, 2)
-dst_end = (11, 1, 6, 2)
-dst_offset = 3600
-
-# TIMEZONE DATA
-timezone_desc = ('EST', 'EDT')
-timezone_offset = -5
+# TIMEZONE AS A POSIX TZ STRING (SEE tzrules.py), timezone_2 IS A SECOND LOCAL TIME FOR THE STATUS PAGE
+# ('' FOR NONE). HAMGPS_TZ / HAMGPS_TZ2 IN settings.toml ON CIRCUITPY REPLACE THEM WITHOUT EDITING CODE.PY
+timezone = 'EST5EDT,M3.2.0,M11.1.0'
+timezone_2 = ''
 
-# MAGNETOMETER DATA
+# MAGNETOMETER DATA (OFFSETS ARE REPLACED BY THE ON-DEVICE CALIBRATION ONCE ONE HAS BEEN SAVED)
 offset_x_axis = 30.9091
 offset_y_axis = -20.5
 declination = -6
 
+# MAGNETOMETER SAMPLING - SAMPLES PER SECOND, MEDIAN OF THE LAST comp_median READINGS, HEADING AVERAGED
+# OVER comp_filter SAMPLES, POINT ONLY CHANGES comp_hysteresis DEGREES PAST THE SECTOR EDGE
+comp_rate = 15
+comp_median = 3
+comp_filter = 8
+comp_hysteresis = 3
+
 # MAGNETOMETER ORIENTATION
 # BN-880 GPS HAS X AND Y AXIS FLIPPED (N/S E/W READINGS ARE BACKWARDS)
 # BN-880 X AND Y AXIS ARE ROTATED 90 DEGREES
@@ -77,9 +85,65 @@ flip_x_axis = True
 flip_y_axis = False
 swap_axis = False
 
+# GPS DATA MODE
+# 'nmea'     - PARSE NMEA RMC AND GGA TEXT SENTENCES (STREAMING PARSER, NO ALLOCATION PER SENTENCE)
+# 'adafruit' - PARSE NMEA RMC AND GGA TEXT SENTENCES WITH ADAFRUIT_GPS
+# 'ubx'      - TURN NMEA OFF AND DECODE ONE BINARY UBX NAV-PVT FRAME PER FIX (LESS SERIAL TRAFFIC AND PARSING)
+gps_mode = 'nmea'
+
+# NAVIGATION RATE IN HZ (1, 5 OR 10), ABOVE 1 HZ THE GPS LINK RUNS AT 115200 BAUD WITH A RECEIVE BUFFER
+# SIZED FOR THE MESSAGE TRAFFIC. IF THE BUFFER RUNS CLOSE TO FULL OR SENTENCES ARE LOST, GGA IS SHED TO
+# ONCE A SECOND AND THEN THE RATE FALLS BACK (10 -> 5 -> 1 HZ) UNTIL THE NEXT RESTART
+nav_rate = 1
+
+# GPS TIME ('nmea' AND 'ubx' MODES) - THE CLOCK IS WORKED OUT FROM WHEN THE FIRST MESSAGE OF EACH EPOCH
+# ARRIVES AND THE TIME LABELS CHANGE ON THE GPS SECOND. time_delay IS THE RECEIVER'S OWN DELAY IN SECONDS
+# FROM THE START OF AN EPOCH TO ITS FIRST OUTPUT BYTE (MEASURE IT AGAINST A PPS LED OR A WWV TICK),
+# time_window EPOCHS ARE COMBINED FOR EACH CORRECTION
+time_delay = 0
+time_window = 8
+
+# MAIDENHEAD GRID PRECISION (6, 8 OR 10 CHARACTERS), PRESS BOTH BUTTONS TOGETHER TO CHANGE IT
+grid_precision = 6
+
+# POWER PROFILE
+# 'normal' - RECEIVER CONTINUOUS AT 1 HZ
+# 'saver'  - NAVIGATION SLOWS TO ONE FIX EVERY 5 SECONDS WHEN STATIONARY, MCU LIGHT SLEEPS BETWEEN TASKS
+# 'max'    - AS 'saver' WITH THE RECEIVER IN POWER SAVE MODE, ONE FIX EVERY 10 SECONDS WHEN STATIONARY
+power_profile = 'normal'
+
+# DIM THE BACKLIGHT TO dim_level AFTER dim_after SECONDS WITHOUT A BUTTON PRESS (0 = NEVER DIM), THE
+# FIRST PRESS ONLY BRINGS THE BRIGHTNESS BACK
+dim_after = 0
+dim_level = 2048
+
+# BATTERY CAPACITY IN MAH, FOR THE HOURS REMAINING SHOWN NEXT TO THE BATTERY GAUGE
+bat_capacity = 3600
+
+# TRACK LOG - ONE RECORD EVERY track_interval SECONDS IN /tracks ON CIRCUITPY, WRITTEN IN 512 BYTE
+# PAGES EVERY track_flush SECONDS. A NEW FILE IS STARTED AT POWER UP AND EVERY track_file_kb, ONLY THE
+# LAST track_files FILES ARE KEPT. NEEDS boot.py TO MAKE CIRCUITPY WRITABLE, HOLD THE BRIGHTNESS DOWN
+# BUTTON DURING RESET TO KEEP IT WRITABLE OVER USB INSTEAD (NO LOGGING)
+track_log = True
+track_interval = 1
+track_flush = 60
+track_file_kb = 256
+track_files = 8
+
 # STARTUP LOGO
 startup_logo = '/images/ab9xa.bmp'
 
+# MINIMUM TIME THE SPLASH LOGO AND THE VERSION ARE SHOWN IN SECONDS (GPS SETUP RUNS WHILE THEY ARE UP,
+# HOLD BOTH BUTTONS WHILE THE VERSION IS SHOWN TO CALIBRATE THE COMPASS)
+splash_time = 0.5
+version_time = 1.0
+
+# PRINT HOW LONG EACH BOOT PHASE TOOK TO THE SERIAL CONSOLE
+boot_report = True
+
+# ALSO PRINT THE FREE HEAP AFTER EACH BOOT PHASE (COLLECTS AT EVERY PHASE, SO THE TIMES GROW A LITTLE)
+boot_heap = False
+
 # TEXT COLOR SETUP
 clock_color = 0x00FF00
 compass_color = 0xFFFF00
@@ -89,23 +153,62 @@ grid_color = 0xFFFF00
 location_color = 0x00FF00
 sat_color = 0xFF00FF
 
-# PIN LAYOUT
-pin_battery = board.A0
-pin_sck = board.SCK
-pin_mosi = board.MOSI
-pin_rx = board.RX
-pin_tx = board.TX
-pin_sda = board.SDA
-pin_scl = board.SCL
-pin_cs = board.D5
-pin_dc = board.D6
-pin_rst = board.D9
-pin_bl = board.D10
-pin_bright_down = board.D11
-pin_bright_up = board.D12
-
-# STARTUP DISPLAY BRIGHTNESS
+# PIN LAYOUT (BOARD PIN NAMES)
+pin_battery = 'A0'
+pin_sck = 'SCK'
+pin_mosi = 'MOSI'
+pin_rx = 'RX'
+pin_tx = 'TX'
+pin_sda = 'SDA'
+pin_scl = 'SCL'
+pin_cs = 'D5'
+pin_dc = 'D6'
+pin_rst = 'D9'
+pin_bl = 'D10'
+pin_bright_down = 'D11'
+pin_bright_up = 'D12'
+
+# STARTUP DISPLAY BRIGHTNESS / BRIGHTNESS STEP PER BUTTON PRESS OR REPEAT
 disp_level = 32767
+disp_step = 1024
+
+# TASK INTERVALS IN SECONDS
+gps_interval = 0.02
+bat_interval = 60
+power_interval = 1
+link_interval = 5
+log_interval = 1
+button_interval = 0.01
+frame_interval = 0.1
+
+# DISPLAY REFRESH - AT MOST ONE FRAME EVERY frame_interval, NEVER TWO FRAMES CLOSER THAN frame_min_interval
+frame_min_interval = 0.05
+
+# BUTTON DEBOUNCE, HOLD TIME BEFORE AUTO-REPEAT, AUTO-REPEAT INTERVAL AND LONG PRESS IN SECONDS
+button_debounce = 0.03
+button_repeat_delay = 0.5
+button_repeat_interval = 0.05
+button_long_press = 1.5
+
+# PRINT PER-TASK TIMING AND DISPLAY REFRESH COUNTS TO THE SERIAL CONSOLE EVERY N SECONDS (0 = OFF)
+task_stats_interval = 0
+
+# PAGES - A LONG PRESS ON BRIGHTNESS UP SHOWS THE NEXT PAGE, ON BRIGHTNESS DOWN THE PREVIOUS ONE:
+# MAIN SCREEN, SKY VIEW, STATUS (TRACK LOG, GPS LINK, POWER, FIX), DEBUG. THE STATUS PAGE IS UPDATED EVERY
+# status_interval SECONDS WHILE IT IS SHOWN
+status_interval = 1
+
+# SKY VIEW - SATELLITE POSITIONS AND C/N0 FROM UBX NAV-SAT, POLLED EVERY sky_interval SECONDS WHILE THE
+# PAGE IS SHOWN (0 = NO SKY PAGE). UP TO sky_sats SATELLITES ARE SHOWN AND THE RECEIVE BUFFER HAS ROOM FOR
+# A RESPONSE THAT LONG. A POLL IS HELD BACK WHILE THE GPS LINK HAS NO ROOM FOR IT
+sky_interval = 5
+sky_sats = 32
+
+# PROFILER - THE DEBUG PAGE SHOWS MIN / MEAN / MAX MS PER STAGE, LOOP RATE, FRAMES, UART BYTES PER
+# SECOND, GC RUNS AND FREE HEAP OVER THE LAST profile_window SECONDS. profile_serial ALSO PRINTS THEM AS
+# ONE LINE PER WINDOW ON THE SERIAL CONSOLE
+profile_window = 1
+profile_serial = False
 
 # ARRAY FOR ADC VALUE TO BATTERY PERCENTAGE (BELOW [0] = 0%, [0] - [1] = 10%, [9]-[10] = 100%
 bat_curve = (48500, 49600, 50900, 51400, 52000, 52900, 53900, 55900, 56900, 58000, 65535)
@@ -125,7 +228,11 @@ disp_x = 320
 disp_y = 240
 
 # DISPLAY FONT DATA
-font = bitmap_font.load_font('fonts/consolas-16.pcf')
+font_file = 'fonts/consolas-16.pcf'
+
+# DRAW TIME, LAT / LON, ALTITUDE, SPEED, TRACK AND SATELLITE FIELDS FROM A GLYPH ATLAS (ONLY CHANGED
+# CHARACTERS ARE REDRAWN) INSTEAD OF AS LABELS (WHOLE TEXT RE-RENDERED ON EVERY CHANGE)
+glyph_fields = True
 char_height = 20
 char_start = 6
 char_width = 12
@@ -136,484 +243,618 @@ line_gap = 12
 # END OF USER ADJUSTABLE VARIABLES                             #
 ################################################################
 
-# ARRAYS FOR DAY AND MONTH TEXT
-day_text = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN')
-month_text = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+# DISPLAY A MESSAGE CENTERED ON LINE row (0 = MIDDLE OF THE SCREEN) DURING BOOT
 
-# COMPASS DATA
-comp_angle = (11.25, 33.75, 56.25, 78.75, 101.25, 123.75, 146.25, 168.75, 191.25, 213.75, 236.25, 258.75, 281.25, 303.75, 326.25, 348.75)
-comp_point = ('NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
 
-# ARRAYS FOR GRID SQUARE TEXT
-grid_upper = 'ABCDEFGHIJKLMNOPQRSTUVWX'
-grid_lower = 'abcdefghijklmnopqrstuvwx'
+def show_message(text, color, row=0):
+    message = layout.message(text, color, row)
+    disp_group.append(message)
+    return message
 
 
-# CALCULATE AND FORMAT UTC TIME, UTC DATE, TIMEZONE TIME AND TIMEZONE DATE. CALCULATE DST
+# STEP THE GPS SETUP UNTIL deadline WHILE A STARTUP SCREEN IS SHOWN
 
 
-class comp_date_time:
-    def __init__(self, base_time_secs):
-        time_utc_tuple = time.localtime(base_time_secs)
+def step_gps_until(deadline):
+    while True:
+        gps_setup.step()
+        remaining = deadline - clock.monotonic()
 
-        # CHECK FOR DEC 31 / JAN 1 OVERLAP AND CORRECT YEAR FOR TIMEZONE DATE
-        base_year = time_utc_tuple[0]
-        err_check_tuple = (base_year, 1, 1, 0, 0, 0, 0, 0, 0)
-        err_check_secs = time.mktime(err_check_tuple) - timezone_offset * 3600
+        if remaining <= 0:
+            return
 
-        if base_time_secs < err_check_secs:
-            base_year -= 1
+        clock.sleep(min(remaining, 0.01))
 
-        # CALCULATE IN SECONDS THE DST START TIME AND DATE
-        dst_start_tuple = (base_year, dst_start[0], dst_start[1] * 7 - 6, dst_start[3], 0, 0, 0, 0, 0)
-        dst_start_secs = time.mktime(dst_start_tuple)
-        dst_start_tuple = time.localtime(dst_start_secs)
 
-        dst_start_diff = dst_start[2] - dst_start_tuple[6]
+# SETUP CLOCK, TFT DISPLAY, MAGNETOMETER, BATTERY ADC, BRIGHTNESS BUTTONS AND GPS UART
+# (BOARD DEVICES, OR SIMULATED DEVICES WHEN RUN UNDER THE HOST SIMULATOR)
+dev = hal.open_devices({
+    'pin_battery': pin_battery, 'pin_sck': pin_sck, 'pin_mosi': pin_mosi, 'pin_rx': pin_rx, 'pin_tx': pin_tx,
+    'pin_sda': pin_sda, 'pin_scl': pin_scl, 'pin_cs': pin_cs, 'pin_dc': pin_dc, 'pin_rst': pin_rst, 'pin_bl': pin_bl,
+    'pin_bright_down': pin_bright_down, 'pin_bright_up': pin_bright_up,
+    'disp_x': disp_x, 'disp_y': disp_y, 'disp_level': disp_level})
 
-        if dst_start_diff < 0:
-            dst_start_diff += 7
+clock = dev.clock
+disp = dev.display
+disp_backlight = dev.backlight
+comp = dev.compass
+bat = dev.battery
+b_up = dev.button_up
+b_dn = dev.button_down
 
-        dst_start_secs += dst_start_diff * 86400 - timezone_offset * 3600
+boot = startup.boot_timeline(clock, heap=boot_heap)
+boot.mark('devices')
 
-        # CALCULATE IN SECONDS THE DST END TIME AND DATE
-        dst_end_tuple = (base_year, dst_end[0], dst_end[1] * 7 - 6, dst_end[3], 0, 0, 0, 0, 0)
-        dst_end_secs = time.mktime(dst_end_tuple) - dst_offset
-        dst_end_tuple = time.localtime(dst_end_secs)
+# DISPLAY SPLASH LOGO
+tile_grid = disp.image(startup_logo)
+disp_group = disp.group()
+disp_group.append(tile_grid)
+disp.show(disp_group)
+splash_end = clock.monotonic() + splash_time
+boot.mark('splash')
 
-        dst_end_diff = dst_end[2] - dst_end_tuple[6]
+# GPS SETUP STARTS NOW AND IS STEPPED BETWEEN THE OTHER STARTUP JOBS, THE RECEIVER ANSWERS WHILE THE
+# FONT LOADS (SKIPS RECONFIGURATION WHEN THE RECEIVER KEPT ITS SETTINGS)
+# A NAV-SAT RESPONSE FOR THE SKY PAGE ARRIVES AS ONE BURST, THE RECEIVE BUFFER IS SIZED TO HOLD IT
+if sky_interval:
+    from hamgps import sky
 
-        if dst_end_diff < 0:
-            dst_end_diff += 7
+    sky_burst = sky.frame_len(sky_sats)
+else:
+    sky_burst = 0
 
-        dst_end_secs += dst_end_diff * 86400 - timezone_offset * 3600 - dst_offset
+gps_setup = startup.gps_setup(dev.gps_port, clock, gps_mode, link.link_baud(nav_rate), link.buffer_size(gps_mode, nav_rate, sky_burst))
+gps_setup.step()
 
-        # IF THE CURRENT TIME AND DATE FALL BETWEEN THE DST START AND END TIMES, SET DST_ACTIVE
-        if base_time_secs >= dst_start_secs and base_time_secs < dst_end_secs:
-            dst_active = True
-        else:
-            dst_active = False
+font = disp.load_font(font_file)
+layout = ui.cell_layout(disp, font, None, char_width, char_height, char_start, line_space, line_gap)
+gps_setup.step()
 
-        # FORMAT UTC DATA
-        self.utc_date = '{} {} {:02d}, {}'.format(day_text[time_utc_tuple[6]], month_text[time_utc_tuple[1] - 1], time_utc_tuple[2], time_utc_tuple[0])
-        self.utc_time = '{:02d}:{:02d}:{:02d}'.format(time_utc_tuple[3], time_utc_tuple[4], time_utc_tuple[5])
+# A HARD / SOFT-IRON CALIBRATION SAVED IN NVM REPLACES offset_x_axis AND offset_y_axis
+comp_matrix = None
+comp_cal = magcal.load(dev.nvm)
 
-        # CALCULATE TIMEZONE TIME AND DATE
-        time_tz_secs = base_time_secs + timezone_offset * 3600 + dst_active * dst_offset
-        time_tz_tuple = time.localtime(time_tz_secs)
+if comp_cal is not None:
+    offset_x_axis, offset_y_axis, comp_matrix = comp_cal
 
-        # FORMAT TIMEZONE DATA
-        self.tz_date = '{} {} {:02d}, {}'.format(day_text[time_tz_tuple[6]], month_text[time_tz_tuple[1] - 1], time_tz_tuple[2], time_tz_tuple[0])
-        self.tz_time = '{:02d}:{:02d}:{:02d}'.format(time_tz_tuple[3], time_tz_tuple[4], time_tz_tuple[5])
+# MAGNETOMETER OFFSETS, ORIENTATION AND DECLINATION ARE FOLDED INTO THE HEADING CONSTANTS ONCE
+comp_heading = heading(offset_x_axis * mag_scale, offset_y_axis * mag_scale, declination, flip_x_axis, flip_y_axis, swap_axis, comp_matrix)
+comp_sampler = mag_sampler(comp, comp_heading, comp_rate, comp_filter, comp_median, comp_hysteresis)
+gps_setup.step()
 
-        self.tz_desc = timezone_desc[dst_active]
+# BATTERY GAUGE COLORS, adafruit_fancyled IS RELEASED AGAIN ONCE THEY ARE BUILT
+bat_colors = ui.battery_colors()
+boot.mark('load')
 
+# REMOVE SPLASH LOGO
+step_gps_until(splash_end)
+disp_group.remove(tile_grid)
+del tile_grid
 
-# SEND UBX MESSAGES TO GPS
-# WAITS FOR ACK/NAK, RETRANSMITS ON FAILED RESPONSE
-# RETURNS TRUE FOR ACK, FALSE FOR NAK
+# DISPLAY VERSION
+message_text = show_message('Version ' + version, 0xFFB000)
+step_gps_until(clock.monotonic() + version_time)
+disp_group.remove(message_text)
+boot.mark('version')
 
+# HOLD BOTH BUTTONS WHILE THE VERSION IS SHOWN TO CALIBRATE THE COMPASS
+if not b_up.value and not b_dn.value:
+    from hamgps.calibrate import calibrate_compass
 
-def ubx_send(msg_type, msg_class, msg_payload):
-    msg_len = len(msg_class) + len(msg_payload)
-    msg_base = msg_type + msg_len.to_bytes(2, 'little') + msg_class + msg_payload
-    msg_out = ubx_header + msg_base + ubx_checksum(msg_base)
+    calibrate_compass(layout, disp_group, clock, comp, comp_heading, b_up, b_dn, dev.nvm, comp_rate)
+    del calibrate_compass
+    ui.release('hamgps.calibrate')
+    boot.mark('calibration')
 
-    msg_ackx = ubx_ack + len(msg_type).to_bytes(2, 'little') + msg_type
-    msg_ack = ubx_header + msg_ackx + ubx_checksum(msg_ackx)
+# FINISH GPS SETUP IF IT IS STILL RUNNING
+if not gps_setup.done:
+    message_text = show_message('Configuring GPS', 0x00FFFF)
 
-    msg_nakx = ubx_nak + len(msg_type).to_bytes(2, 'little') + msg_type
-    msg_nak = ubx_header + msg_nakx + ubx_checksum(msg_nakx)
+    while not gps_setup.step():
+        clock.sleep(0.01)
 
-    while True:
-        serial.reset_input_buffer()
-        serial.write(msg_out)
-        msg_res = serial.read(10)
-
-        if msg_res == msg_ack:
-            return True
-        elif msg_res == msg_nak:
-            return False
-        elif msg_type == cfg_prt:
-            return None
+    disp_group.remove(message_text)
+
+# THE GPS READER READS THROUGH THE UBX TRANSPORT, COMMANDS CAN STILL BE QUEUED WHILE IT RUNS
+serial = gps_setup.transport
+boot.mark('gps setup')
 
-        time.sleep(0.1)
+# WAIT FOR GPS FIX
+message_text = show_message('Waiting for GPS Fix', 0x00FFFF)
+timer_start_gps = clock.monotonic()
+counter_text = show_message('00:00', 0xFFFFFF, 1)
 
+# SETUP GPS DECODING
+if gps_mode == 'ubx':
+    from hamgps.ubx import nav_pvt
 
-# CALCULATE CHECKSUMS FOR UBX MESSAGES
+    gps = nav_pvt(serial)
+elif gps_mode == 'nmea':
+    from hamgps.nmea import nmea_reader
 
+    gps = nmea_reader(serial)
+else:
+    import adafruit_gps
 
-def ubx_checksum(msg):
-    cs_a = 0x00
-    cs_b = 0x00
+    gps = adafruit_gps.GPS(serial, debug=False)
 
-    for i in range(len(msg)):
-        cs_a += msg[i]
-        cs_b += cs_a
+# RECEIVE BUFFER HIGH-WATER MARK, THROUGHPUT AND OVERRUNS
+gps_link = link.link_monitor(serial, clock, gps_mode, nav_rate, link.buffer_size(gps_mode, nav_rate, sky_burst))
 
-    checksum = (cs_a & 255).to_bytes(1, 'big') + (cs_b & 255).to_bytes(1, 'big')
-    return checksum
+# WAIT FOR INITIAL GPS FIX
+old_counter = -1
 
+while not gps.has_fix:
+    gps.update()
+    counter_gps = clock.monotonic() - timer_start_gps
+    counter_min = int(counter_gps / 60)
+    counter_sec = int(counter_gps % 60)
 
-# CALCULATE MAIDENHEAD GRID SQUARE BASED ON CURRENT LAT / LON
+    if old_counter != counter_sec:
+        old_counter = counter_sec
+        counter_text.text = '{:02d}:{:02d}'.format(counter_min, counter_sec)
 
+    clock.sleep(0.1)
 
-def calc_grid(latitude, longitude):
-    grid_lat_adj = latitude + 90
-    grid_lat_sq = grid_upper[int(grid_lat_adj / 10)]
-    grid_lat_field = str(int(grid_lat_adj % 10))
-    grid_lat_rem = (grid_lat_adj - int(grid_lat_adj)) * 60
-    grid_lat_subsq = grid_lower[int(grid_lat_rem / 2.5)]
+disp_group.remove(message_text)
+boot.mark('gps fix')
+
+message_text = show_message('Waiting For Time Sync', 0x00FFFF)
 
-    grid_lon_adj = longitude + 180
-    grid_lon_sq = grid_upper[int(grid_lon_adj / 20)]
-    grid_lon_field = str(int((grid_lon_adj / 2) % 10))
-    grid_lon_rem = (grid_lon_adj - int(grid_lon_adj / 2) * 2) * 60
-    grid_lon_subsq = grid_lower[int(grid_lon_rem / 5)]
+serial.reset_input_buffer()
 
-    return grid_lon_sq + grid_lat_sq + grid_lon_field + grid_lat_field + grid_lon_subsq + grid_lat_subsq
+# WAIT FOR VALID TIME DATA TO SET RTC
+while True:
+    if gps.timestamp_utc.tm_year != 0:
+        break
+
+    gps.update()
+    counter_gps = clock.monotonic() - timer_start_gps
+    counter_min = int(counter_gps / 60)
+    counter_sec = int(counter_gps % 60)
 
+    if old_counter != counter_sec:
+        old_counter = counter_sec
+        counter_text.text = '{:02d}:{:02d}'.format(counter_min, counter_sec)
 
-# CALCULATE ANGLE FROM MAGNETOMETER DATA
+    clock.sleep(0.1)
 
+# SET RTC TO GPS TIME (GPS REFERENCES UTC). THE NMEA AND UBX READERS ALSO FEED THE TIME SYNC, WHICH
+# TAKES OVER THE CLOCK LABELS AND KEEPS THE RTC TO GPS TIME, adafruit_gps IS THE RTC TIME SOURCE INSTEAD
+clock.set_datetime(time.struct_time((gps.timestamp_utc.tm_year, gps.timestamp_utc.tm_mon, gps.timestamp_utc.tm_mday, gps.timestamp_utc.tm_hour, gps.timestamp_utc.tm_min, gps.timestamp_utc.tm_sec, 0, -1, -1)))
 
-def comp_degree(x_axis, y_axis):
-    x_axis -= offset_x_axis
-    y_axis -= offset_y_axis
+if gps_mode == 'adafruit':
+    sync = None
+    clock.set_time_source(gps)
+else:
+    from hamgps.timesync import time_sync
 
-    if flip_x_axis:
-        x_axis *= -1
+    sync = time_sync(link.link_baud(nav_rate), time_delay, time_window)
+    gps_probe_ns = int(gps_interval * 1000000000)
 
-    if flip_y_axis:
-        y_axis *= -1
+disp_group.remove(counter_text)
+disp_group.remove(message_text)
+boot.mark('time sync')
 
-    if swap_axis:
-        x_axis, y_axis = y_axis, x_axis
+# MAIN SCREEN, NUMERIC FIELDS ARE GLYPH FIELDS OR LABELS
+if glyph_fields:
+    layout.glyphs = disp.glyph_atlas(font)
 
-    if (x_axis > 0) and (y_axis == 0):
-        angle = declination
-    elif (x_axis < 0) and (y_axis == 0):
-        angle = 180 + declination
-    elif y_axis > 0:
-        angle = 90 - math.atan(x_axis / y_axis) * 180 / math.pi + declination
-    elif y_axis < 0:
-        angle = 270 - math.atan(x_axis / y_axis) * 180 / math.pi + declination
+screen = ui.main_screen(layout, bat_x, bat_y, grid_precision, clock_color, compass_color, date_color, gps_color, grid_color, location_color, sat_color)
 
-    if angle < 0:
-        angle += 360
+# NUMBERS ARE FORMATTED INTO PREALLOCATED BUFFERS (SEE fmt.py), ONE PER FIELD, SAME WIDTHS AS ABOVE
+lat_number = number_field(8, 4)
+lon_number = number_field(9, 4)
+alt_ft_number = number_field(5)
+alt_m_number = number_field(5)
+speed_number = number_field(5, 1)
+track_number = number_field(5, 1)
+sat_number = number_field(2)
+bat_hours_number = number_field(3, 0, 'h')
 
-    if angle >= 360:
-        angle -= 360
+# COMPASS POINTS PADDED TO THE FIELD WIDTH ONCE
+comp_padded = {point: ' ' * (3 - len(point)) + point for point in comp_point + ('---',)}
 
-    return angle
+heap = heap_monitor()
 
+# THE OTHER PAGES, ALL BUILT NOW SO A PAGE SWITCH ONLY CHANGES THE GROUP SHOWN
+status_lines = 10
+status = ui.text_page(layout, status_lines, location_color, 'status_text')
+debug = ui.text_page(layout, page_lines, clock_color, 'debug_text')
+low_battery = ui.message_page(layout, 'LOW BATTERY', 0xFFB000)
 
-# CALCULATE COMPASS DIRECTION FROM ANGLE
+if sky_interval:
+    sats = sky.nav_sat(sky_sats)
+    sky_view = sky.sky_page(layout, sats, sat_color)
 
 
-def comp_direction(degrees):
-    if degrees == -1:
-        direction = '---'
-    elif (degrees < 11.25) or (degrees >= 348.75):
-        direction = 'N'
-    else:
-        for i in range(15):
-            c_angle = comp_angle[i]
+# TIME ZONES, settings.toml FIRST. THE STRINGS ARE PARSED NOW, THE TRANSITION TABLE IS COMPILED AT THE FIRST
+# TIME SHOWN AND AGAIN EACH NEW YEAR
+local_zone = tzrules.time_zone(os.getenv('HAMGPS_TZ') or timezone)
+timezone_2 = os.getenv('HAMGPS_TZ2') or timezone_2
+second_zone = tzrules.time_zone(timezone_2) if timezone_2 else None
 
-            if (degrees >= c_angle) and (degrees < (c_angle + 22.5)):
-                direction = comp_point[i]
-                break
 
-    return direction
+# STATE SHARED BETWEEN THE TASKS
+# fix_count IS BUMPED FOR EVERY SENTENCE / FRAME DECODED, THE DISPLAY REDRAWS THE GPS FIELDS WHEN IT MOVES
+# utc_secs IS THE SECOND THE CLOCK LABELS LAST SHOWED
 
 
-# CALCULATE BATTERY PERCENTAGE
+class shared_state:
+    def __init__(self):
+        self.fix_count = 0
+        self.comp_direction = '---'
+        self.bat_percent = -1
+        self.bat_hours = -1
+        self.bat_low = False
+        self.grid_precision = grid_precision
+        self.utc_secs = None
 
 
-def bat_level(adc_value):
-    bat_percent = 0
+state = shared_state()
+tasks = scheduler.scheduler(clock)
 
-    for percent in range(10, 1, -1):
-        if adc_value <= bat_curve[percent] and adc_value > bat_curve[percent - 1]:
-            bat_percent = percent * 10
-            break
+# GRID SQUARE IS ONLY RECALCULATED WHEN A FIX LEAVES THE CURRENT SQUARE
+grid = grid_engine(grid_precision)
+grid_precisions = (6, 8, 10)
 
-    return bat_percent
+# RECEIVER POWER SAVE / NAVIGATION RATE, BACKLIGHT DIMMING AND RUNTIME ESTIMATE
+power = power_manager(serial, clock, power_profile, dim_after, bat_capacity, 1000 // nav_rate)
 
+if power.light_sleep:
+    tasks.set_light_sleep(clock.light_sleep)
 
-# SETUP CLOCK
-clock = rtc.RTC()
+# TRACK LOG, OFF WITHOUT A FILESYSTEM
+track = None
 
-# SETUP TFT DISPLAY
-displayio.release_displays()
-spi = busio.SPI(pin_sck, MOSI=pin_mosi)
-disp_bus = displayio.FourWire(spi, command=pin_dc, chip_select=pin_cs, reset=pin_rst, baudrate=60000000)
-disp = adafruit_ili9341.ILI9341(disp_bus, width=disp_x, height=disp_y)
+if track_log and dev.storage is not None:
+    track = track_logger(dev.storage, clock, '/tracks', track_interval, track_flush, file_bytes=track_file_kb * 1024, max_files=track_files)
 
-disp_backlight = pwmio.PWMOut(pin_bl, frequency=5000, duty_cycle=disp_level)
+# LABEL CHANGES ARE BATCHED AND DRAWN ONCE PER FRAME FROM HERE ON
+frame = frame_display(disp, frame_min_interval)
 
-# SETUP MAGNETOMETER
-i2c = busio.I2C(pin_scl, pin_sda)
-comp = adafruit_lsm303dlh_mag.LSM303DLH_Mag(i2c)
+# STAGES: GPS DRAIN, COMPASS SAMPLE AND BATTERY READ TASKS, CLOCK ENGINE, LABEL WRITES AND REFRESH IN THE
+# DISPLAY TASK
+profile = profiler(clock, tasks, serial, frame, heap, ('gps', 'compass', 'battery'), ('clock', 'labels', 'refresh'), 'display', profile_serial)
+stage_clock = profile.stage('clock')
+stage_labels = profile.stage('labels')
+stage_refresh = profile.stage('refresh')
 
-# SETUP ADC FOR BATTERY MONITORING
-bat = analogio.AnalogIn(pin_battery)
+# SKY PAGE - POLL NAV-SAT WHEN THE PAGE IS SHOWN AND EVERY sky_interval WHILE IT STAYS UP, THE TRANSPORT
+# STREAMS THE RESPONSE INTO sats. NOTHING IS ASKED FOR WHILE THE LAST POLL IS OUT OR THE LINK HAS NO ROOM
 
-# SETUP INPUTS FOR DISPLAY BRIGHTNESS ADJUSTMENT
-b_up = DigitalInOut(pin_bright_up)
-b_up.direction = Direction.INPUT
-b_up.pull = Pull.UP
 
-b_dn = DigitalInOut(pin_bright_down)
-b_dn.direction = Direction.INPUT
-b_dn.pull = Pull.UP
+sky_poll = None
+sky_held = 0
 
-# DISPLAY SPLASH LOGO
-bitmap = displayio.OnDiskBitmap(startup_logo)
-tile_grid = displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader)
-disp_group = displayio.Group()
-disp_group.append(tile_grid)
-disp.show(disp_group)
 
-# CREATE COLOR GRADIENT AND PALETTE FOR BATTERY GAUGE
-bat_gradient = [(0.0, 0xFF0000), (0.25, 0xFF7F00), (0.50, 0xFFFF00), (0.75, 0x00FF00)]
-bat_palette = fancy.expand_gradient(bat_gradient, 100)
-bat_colors = []
+def sky_task():
+    global sky_poll, sky_held
 
-for i in range(100):
-    color = fancy.palette_lookup(bat_palette, i / 100)
-    bat_colors.append(color.pack())
+    if not pages.active('sky') or (sky_poll is not None and not sky_poll.done):
+        return
 
-# REMOVE SPLASH LOGO
-time.sleep(1.5)
-disp_group.remove(tile_grid)
+    burst = max(sats.frame_bytes, sky_burst)
 
-# DISPLAY VERSION
-message_text = 'Version ' + version
-message_x = int((disp_x - len(message_text) * char_width) / 2)
-message_text = bitmap_label.Label(font, text=message_text, color=0xFFB000, x=message_x, y=int(disp_y / 2))
-disp_group.append(message_text)
-time.sleep(1.0)
-disp_group.remove(message_text)
+    if gps_link.room(burst / sky_interval, burst):
+        sky_poll = serial.poll(sky.nav_sat_class, sky.nav_sat_id, timeout=1.5, tries=1, sink=sats)
+    else:
+        sky_held += 1
+        frame.text(sky_view.title, 'Sky link busy')
 
-# CONFIGURE GPS
-message_text = ('Configuring GPS')
-message_x = int((disp_x - len(message_text) * char_width) / 2)
-message_text = bitmap_label.Label(font, text=message_text, color=0x00FFFF, x=message_x, y=int(disp_y / 2))
-disp_group.append(message_text)
 
-# UBX HEADER
-ubx_header = bytes([0xb5, 0x62])
+def show_sky(visible):
+    if visible:
+        sky_task()
 
-# UBX ACK/NAK
-ubx_ack = bytes([0x05, 0x01])
-ubx_nak = bytes([0x05, 0x00])
 
-# UBX MESSAGE TYPES
-cfg_prt = bytes([0x06, 0x00])
-cfg_msg = bytes([0x06, 0x01])
+# ONLY THE VISIBLE PAGE IS ON THE DISPLAY, THE DEBUG PAGE KEEPS THE MAIN SCREEN PIPELINE RUNNING SO THE
+# PROFILER TIMES IT
+pages = page_manager(disp, frame)
+pages.add('main', screen.group)
 
-# UBX CLASS IDS
-cls_gll = bytes([0xF0, 0x01])
-cls_gsa = bytes([0xF0, 0x02])
-cls_gsv = bytes([0xF0, 0x03])
-cls_vtg = bytes([0xF0, 0x05])
+if sky_interval:
+    pages.add('sky', sky_view.group, show_sky)
 
-# CONFIGURE UART AND GPS BAUD RATE
-serial = busio.UART(pin_tx, pin_rx, baudrate=9600, timeout=1, receiver_buffer_size=256)
+pages.add('status', status.group)
+pages.add('debug', debug.group, profile.set_page, ('main',))
+pages.add('low battery', low_battery.group, cycle=False)
+pages.show('main')
+del disp_group
 
-payload = bytes([0x01, 0x00, 0x00, 0x00, 0xD0, 0x08, 0x00, 0x00, 0x00, 0x96, 0x00, 0x00, 0x07, 0x00, 0x03, 0x00, 0x00, 0x00, 0x00, 0x00])
-ubx_send(cfg_prt, '', payload)
-time.sleep(0.1)
-ubx_send(cfg_prt, '', payload)
 
-serial.deinit()
-serial = busio.UART(pin_tx, pin_rx, baudrate=38400, timeout=1, receiver_buffer_size=256)
+# GPS READER - DRAIN EVERYTHING THE UART HAS RECEIVED, THE TIME SYNC CAN ASK FOR THE NEXT DRAIN TO BE
+# EARLIER THAN USUAL, AS THE NEXT EPOCH'S MESSAGE IS DUE TO END
 
-# DISABLE NMEA GLL, GSA, GSV AND VTG MESSAGES, ONLY RMC AND GGA ARE NEEDED
-# ENABLING MORE MESSAGES THAN NEEDED CAN CAUSE SERIAL BUFFER OVERRUNS AND DEVICE LOCKUPS
-payload = bytes([0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
 
-while not ubx_send(cfg_msg, cls_gll, payload):
-    time.sleep(.1)
+def gps_task():
+    start = clock.monotonic_ns()
+    waiting = serial.in_waiting
+    gps_link.sample(waiting)
+    fixes = state.fix_count
 
-while not ubx_send(cfg_msg, cls_gsa, payload):
-    time.sleep(.1)
+    while gps.update():
+        state.fix_count += 1
 
-while not ubx_send(cfg_msg, cls_gsv, payload):
-    time.sleep(.1)
+    if track is not None and state.fix_count != fixes and gps.has_fix:
+        track.add(clock.time(), gps)
 
-while not ubx_send(cfg_msg, cls_vtg, payload):
-    time.sleep(0.1)
+    if sync is not None:
+        now = clock.monotonic_ns()
+        sync.drained(gps, start, waiting, now)
+        return sync.probe_ns(now, gps_probe_ns)
 
-disp_group.remove(message_text)
+    return None
 
-# CONFIGURE GPS
-message_text = ('Waiting for GPS Fix')
-message_x = int((disp_x - len(message_text) * char_width) / 2)
-message_text = bitmap_label.Label(font, text=message_text, color=0x00FFFF, x=message_x, y=int(disp_y / 2))
-disp_group.append(message_text)
 
-timer_start_gps = time.monotonic()
-counter_text = '00:00'
-counter_x = int((disp_x - len(counter_text) * char_width) / 2)
-counter_text = bitmap_label.Label(font, text=counter_text, color=0xFFFFFF, x=counter_x, y=int(disp_y / 2) + char_height + 2)
-disp_group.append(counter_text)
+# TRACK LOG - THE UART IS DRAINED FIRST SO THE FLASH WRITE STARTS WITH AN EMPTY RECEIVE BUFFER
 
-# SETUP GPS DECODING
-gps = adafruit_gps.GPS(serial, debug=False)
 
-# WAIT FOR INITIAL GPS FIX
-old_counter = -1
+def log_task():
+    if track.due(clock.monotonic()):
+        gps_task()
+        track.flush()
 
-while not gps.has_fix:
-    gps.update()
-    counter_gps = time.monotonic() - timer_start_gps
-    counter_min = int(counter_gps / 60)
-    counter_sec = int(counter_gps % 60)
 
-    if old_counter != counter_sec:
-        old_counter = counter_sec
-        counter_text.text = '{:02d}:{:02d}'.format(counter_min, counter_sec)
+# COMPASS SAMPLER
 
-    time.sleep(0.5)
 
-disp_group.remove(message_text)
+def compass_task():
+    comp_sampler.sample(clock.monotonic())
+    state.comp_direction = comp_sampler.direction
 
-message_text = ('Waiting For Time Sync')
-message_x = int((disp_x - len(message_text) * char_width) / 2)
-message_text = bitmap_label.Label(font, text=message_text, color=0x00FFFF, x=message_x, y=int(disp_y / 2))
-disp_group.append(message_text)
 
-serial.reset_input_buffer()
+# BATTERY MONITOR
 
-# WAIT FOR VALID TIME DATA TO SET RTC
-while True:
-    if gps.timestamp_utc.tm_year != 0:
-        break
 
-    gps.update()
-    counter_gps = time.monotonic() - timer_start_gps
-    counter_min = int(counter_gps / 60)
-    counter_sec = int(counter_gps % 60)
-    counter_text.text = '{:02d}:{:02d}'.format(counter_min, counter_sec)
-    time.sleep(0.5)
+def battery_task():
+    curr_bat = bat.value
+    state.bat_percent = bat_level(curr_bat, bat_curve)
 
-# SET RTC TO GPS TIME (GPS REFERENCES UTC)
-clock.datetime = time.struct_time((gps.timestamp_utc.tm_year, gps.timestamp_utc.tm_mon, gps.timestamp_utc.tm_mday, gps.timestamp_utc.tm_hour, gps.timestamp_utc.tm_min, gps.timestamp_utc.tm_sec, 0, -1, -1))
-rtc.set_time_source(gps)
-disp_group.remove(counter_text)
-disp_group.remove(message_text)
+    if curr_bat <= bat_cutoff:
+        state.bat_low = True
 
-# DISPLAY BATTERY GAUGE
-bat_progress_bar = HorizontalProgressBar((disp_x - bat_x, 0), (bat_x, bat_y), value=0, min_value=0, max_value=100, fill_color=0x000000, outline_color=0xFFFFFF, bar_color=0x00FF00, direction=HorizontalFillDirection.LEFT_TO_RIGHT)
-disp_group.append(bat_progress_bar)
 
-# DISPLAY TIME AND DATE FIELDS
-utc_clock_text = bitmap_label.Label(font, text=' ' * 8, color=clock_color, x=0, y=char_start)
-disp_group.append(utc_clock_text)
+# GPS LINK - SHED MESSAGES OR LOWER THE NAVIGATION RATE WHEN THE RECEIVE BUFFER IS UNDER PRESSURE
 
-utc_clock_label = bitmap_label.Label(font, text='UTC', color=clock_color, x=char_width * 9, y=char_start)
-disp_group.append(utc_clock_label)
 
-utc_date_text = bitmap_label.Label(font, text=' ' * 16, color=date_color, x=0, y=char_start + char_height + line_space)
-disp_group.append(utc_date_text)
+def link_task():
+    if gps_mode == 'ubx':
+        errors = gps.bad_frames
+    elif gps_mode == 'nmea':
+        errors = gps.bad_checksums + gps.overlong
+    else:
+        errors = 0
+
+    if gps_link.update(errors):
+        power.set_moving_period(1000 // gps_link.nav_rate)
+
+
+# POWER - NAVIGATION RATE FROM THE SPEED, BACKLIGHT DIMMING, HOURS REMAINING
+
 
-tz_clock_text = bitmap_label.Label(font, text=' ' * 8, color=clock_color, x=0, y=char_start + (char_height + line_space) * 2 + line_gap)
-disp_group.append(tz_clock_text)
+def power_task():
+    if power.update(clock.monotonic(), gps.speed_knots if gps.has_fix else None):
+        disp_backlight.duty_cycle = min(dim_level, disp_level)
 
-tz_clock_label = bitmap_label.Label(font, text='   ', color=clock_color, x=char_width * 9, y=char_start + (char_height + line_space) * 2 + line_gap)
-disp_group.append(tz_clock_label)
+    state.bat_hours = power.hours_remaining(state.bat_percent, disp_backlight.duty_cycle, tasks.sleep_share())
 
-tz_date_text = bitmap_label.Label(font, text=' ' * 16, color=date_color, x=0, y=char_start + (char_height + line_space) * 3 + line_gap)
-disp_group.append(tz_date_text)
 
-# DISPLAY LATITUDE / LONGITUDE / ALTITUDE / GRID / COMPASS FIELDS
-lat_label = bitmap_label.Label(font, text='Lat:', color=location_color, x=0, y=char_start + (char_height + line_space) * 4 + line_gap * 2)
-disp_group.append(lat_label)
+# PROFILER WINDOW - DEBUG PAGE LINES AND SERIAL TELEMETRY
 
-lat_text = bitmap_label.Label(font, text=' ' * 8, color=location_color, x=char_width * 6, y=char_start + (char_height + line_space) * 4 + line_gap * 2)
-disp_group.append(lat_text)
 
-grid_text = bitmap_label.Label(font, text=' ' * 6, color=grid_color, x=char_width * 20, y=char_start + (char_height + line_space) * 4 + line_gap * 2)
-disp_group.append(grid_text)
+def profile_task():
+    if profile.update():
+        if profile.page:
+            for i in range(page_lines):
+                frame.text(debug.text[i], profile.lines[i])
 
-lon_label = bitmap_label.Label(font, text='Lon:', color=location_color, x=0, y=char_start + (char_height + line_space) * 5 + line_gap * 2)
-disp_group.append(lon_label)
+        if profile.serial:
+            print(profile.telemetry())
 
-lon_text = bitmap_label.Label(font, text=' ' * 9, color=location_color, x=char_width * 5, y=char_start + (char_height + line_space) * 5 + line_gap * 2)
-disp_group.append(lon_text)
 
-gps_update_text = bitmap_label.Label(font, text=' ', color=gps_color, x=char_width * 25, y=char_start + (char_height + line_space) * 5 + line_gap * 2)
-disp_group.append(gps_update_text)
+# STATUS PAGE - TRACK LOG, GPS LINK, POWER, FIX, HEAP, TIME SYNC AND THE SECOND LOCAL TIME, NOTHING IS
+# FORMATTED WHILE THE PAGE IS HIDDEN
 
-# DISPLAY GPS STATISTICS
-alt_label = bitmap_label.Label(font, text='Alt:', color=location_color, x=0, y=char_start + (char_height + line_space) * 6 + line_gap * 3)
-disp_group.append(alt_label)
 
-alt_ft_text = bitmap_label.Label(font, text=' ' * 5, color=location_color, x=char_width * 6, y=char_start + (char_height + line_space) * 6 + line_gap * 3)
-disp_group.append(alt_ft_text)
+def status_task():
+    if not pages.active('status'):
+        return
 
-alt_ft_label = bitmap_label.Label(font, text='FT', color=location_color, x=char_width * 12, y=char_start + (char_height + line_space) * 6 + line_gap * 3)
-disp_group.append(alt_ft_label)
+    if track is None:
+        lines = ['Track off', '']
+    elif not track.enabled:
+        lines = ['Track off ' + track.error[:16], '{:6d} records'.format(track.records)]
+    else:
+        lines = ['Track {:6d} rec {:5d} kB'.format(track.records, track.bytes_written // 1024), '      {:3d} files {:3d} drop'.format(track.files, track.dropped)]
+
+    lines.append('Link {:2d} Hz {:6.0f} B/s'.format(gps_link.nav_rate, gps_link.bytes_per_sec))
+    lines.append('     ovr {:3d} hw {:5d}'.format(gps_link.overruns, gps_link.high_water))
+    lines.append('Power {:6s} {:5.1f} mA'.format(power.profile, power.current_ma))
+    lines.append('      {:5d} ms {}'.format(power.period_ms, 'still' if power.stationary else 'moving'))
+    lines.append('GPS {:4s} fix {:3s} sats {:2d}'.format(gps_mode, 'yes' if gps.has_fix else 'no', gps.satellites or 0))
+    lines.append('Heap {:6d} free'.format(heap.free) if heap.enabled else 'Heap -')
+
+    if sync is None:
+        lines.append('Sync off')
+    elif not sync.valid:
+        lines.append('Sync waiting')
+    else:
+        lines.append('Sync +-{:4.1f} ms {:+5.1f} ppm'.format(sync.spread_ns / 2000000, sync.drift_ppb / 1000))
 
-alt_m_text = bitmap_label.Label(font, text=' ' * 5, color=location_color, x=char_width * 19, y=char_start + (char_height + line_space) * 6 + line_gap * 3)
-disp_group.append(alt_m_text)
+    if second_zone is None or state.utc_secs is None:
+        lines.append('')
+    else:
+        local = time.localtime(state.utc_secs + second_zone.at(state.utc_secs))
+        lines.append('{:02d}:{:02d}:{:02d} {} {} {:02d}'.format(local[3], local[4], local[5], second_zone.name, timekeeping.day_text[local[6]], local[2]))
 
-alt_m_label = bitmap_label.Label(font, text='M', color=location_color, x=char_width * 25, y=char_start + (char_height + line_space) * 6 + line_gap * 3)
-disp_group.append(alt_m_label)
+    for i in range(status_lines):
+        frame.text(status.text[i], lines[i])
 
-speed_label = bitmap_label.Label(font, text='Spd:', color=location_color, x=0, y=char_start + (char_height + line_space) * 7 + line_gap * 3)
-disp_group.append(speed_label)
 
-speed_text = bitmap_label.Label(font, text=' ' * 5, color=location_color, x=char_width * 6, y=char_start + (char_height + line_space) * 7 + line_gap * 3)
-disp_group.append(speed_text)
+# BRIGHTNESS BUTTONS - ONE STEP PER PRESS, REPEATING WHILE HELD
+# A PRESS WHILE THE BACKLIGHT IS DIMMED ONLY WAKES IT
+# BOTH BUTTONS TOGETHER STEP THE GRID PRECISION, A LONG PRESS ON UP SHOWS THE NEXT PAGE, ON DOWN THE
+# PREVIOUS ONE. EITHER WAY THE BRIGHTNESS GOES BACK TO WHERE IT WAS BEFORE THE FIRST BUTTON WENT DOWN
 
-track_label = bitmap_label.Label(font, text='Trk:', color=location_color, x=char_width * 13, y=char_start + (char_height + line_space) * 7 + line_gap * 3)
-disp_group.append(track_label)
 
-track_text = bitmap_label.Label(font, text=' ' * 5, color=location_color, x=char_width * 19, y=char_start + (char_height + line_space) * 7 + line_gap * 3)
-disp_group.append(track_text)
+button_down = debounced_button(b_dn, button_debounce, button_repeat_delay, button_repeat_interval, button_long_press)
+button_up = debounced_button(b_up, button_debounce, button_repeat_delay, button_repeat_interval, button_long_press)
+chord_active = False
+chord_level = disp_level
 
-sat_count_label = bitmap_label.Label(font, text='Satellites:', color=sat_color, x=0, y=char_start + (char_height + line_space) * 8 + line_gap * 4)
-disp_group.append(sat_count_label)
 
-sat_count_text = bitmap_label.Label(font, text='  ', color=sat_color, x=char_width * 12, y=char_start + (char_height + line_space) * 8 + line_gap * 4)
-disp_group.append(sat_count_text)
+def button_task():
+    global disp_level, chord_active, chord_level
 
-comp_text = bitmap_label.Label(font, text='   ', color=compass_color, x=char_width * 23, y=char_start + (char_height + line_space) * 8 + line_gap * 4)
-disp_group.append(comp_text)
+    now = clock.monotonic()
+    down = button_down.update(now)
+    up = button_up.update(now)
+    level = disp_level
+
+    if down or up:
+        if power.activity(now):
+            disp_backlight.duty_cycle = disp_level
+            chord_active = True
+            return
+
+    if button_down.pressed and button_up.pressed:
+        if chord_active:
+            return
+
+        chord_active = True
+        level = chord_level
+        state.grid_precision = grid_precisions[(grid_precisions.index(state.grid_precision) + 1) % len(grid_precisions)]
+    elif button_down.long_pressed or button_up.long_pressed:
+        chord_active = True
+        level = chord_level
+        pages.step(1 if button_up.long_pressed else -1)
+    elif chord_active:
+        if not button_down.pressed and not button_up.pressed:
+            chord_active = False
+
+        return
+    elif not button_down.pressed and not button_up.pressed:
+        chord_level = disp_level
+    else:
+        if down:
+            level = max(level - disp_step, 0)
+
+        if up:
+            level = min(level + disp_step, 65535)
+
+    if level != disp_level:
+        disp_level = level
+        disp_backlight.duty_cycle = disp_level
+
+
+# PER-TASK TIMING, DISPLAY REFRESH COUNTS, COMPASS SAMPLE TIMING AND UBX COMMAND COUNTS
+
+
+def print_stats():
+    tasks.print_report()
+
+    for line in frame.report() + pages.report() + (sats.report() if sky_interval else []) + (sync.report() if sync is not None else []) + heap.report() + comp_sampler.report() + serial.report() + gps_link.report() + power.report() + (track.report() if track is not None else []):
+        print(line)
 
 
 def main():
-    last_alt = None
     last_comp = None
-    last_grid_sq = None
+    last_fix = 0
     last_lat = None
     last_lon = None
-    last_tz_date = None
-    last_tz_desc = None
-    last_tz_time = None
-    last_utc_date = None
-    last_utc_time = None
     last_bat_percent = -1
-    last_bat_time = -60
-    last_sat = -1
-    last_speed = -1
-    last_track = -1
+    heartbeat = False
 
-    while True:
-        global disp_level
+    # UTC TIME, UTC DATE, TIMEZONE TIME AND TIMEZONE DATE, ONLY RECALCULATED WHEN THE SECOND CHANGES
+    curr_datetime = timekeeping.clock_engine(local_zone)
+
+    # HOW LONG BEFORE THE GPS SECOND THE CLOCK TASK WAKES, THE TIME ITS LAST REPAINTS TOOK (AT MOST 50 MS)
+    clock_lead = 0
+    clock_max_lead = 50000000
+
+    # FORMATTED TIME AND DATE FOR secs, UPDATE LABELS IF ANY HAVE CHANGED
+
+    def update_clock(secs):
+        start = profile.start()
+        changed = curr_datetime.update(secs)
+        state.utc_secs = int(secs)
+
+        if changed:
+            if changed & timekeeping.changed_utc_time:
+                frame.text_bytes(screen.utc_clock_text, curr_datetime.utc_clock)
+
+            if changed & timekeeping.changed_utc_date:
+                frame.text(screen.utc_date_text, curr_datetime.utc_date)
+
+            if changed & timekeeping.changed_tz_time:
+                frame.text_bytes(screen.tz_clock_text, curr_datetime.tz_clock)
+
+            if changed & timekeeping.changed_tz_desc:
+                frame.text(screen.tz_clock_label, curr_datetime.tz_desc)
+
+            if changed & timekeeping.changed_tz_date:
+                frame.text(screen.tz_date_text, curr_datetime.tz_date)
+
+        profile.stop(stage_clock, start)
+
+    # CLOCK - ONCE THE TIME SYNC HAS AN OFFSET THE TIME LABELS ARE REPAINTED ON THE GPS SECOND. THE TASK
+    # WAKES clock_lead EARLY SO THE NEW SECOND IS ON THE SCREEN AS IT STARTS, AND SETS THE RTC AGAIN WHEN IT
+    # HAS DRIFTED MORE THAN A SECOND (THE RTC ONLY COUNTS WHOLE SECONDS, ITS PHASE IS ITS OWN)
+
+    def clock_task():
+        nonlocal clock_lead
+
+        if not sync.valid:
+            return None
+
+        start = clock.monotonic_ns()
+
+        # THE TASK RUNS A LITTLE EITHER SIDE OF THE SECOND, THE MIDDLE OF THE COMING SECOND NAMES IT
+        target = start + clock_lead + 500000000
+        secs = sync.second(target)
+        update_clock(secs)
+
+        if not sync.rtc_sets or abs(clock.time() - secs) > 1:
+            clock.set_datetime(time.localtime(secs))
+            sync.rtc_sets += 1
+
+        if pages.active('main'):
+            frame.refresh(clock.monotonic(), True)
+
+        clock_lead = min((clock_lead * 3 + clock.monotonic_ns() - start) // 4, clock_max_lead)
+        return sync.boundary_ns(target) - clock_lead
+
+    # MAIN SCREEN - LABEL UPDATES FROM THE SHARED STATE, ONLY WHILE ITS PRODUCERS ARE ACTIVE
 
-        # GET GPS DATA
-        if gps.update():
-            gps_update_text.text = gps_char
+    def update_main():
+        nonlocal last_comp, last_fix, last_lat, last_lon, last_bat_percent, heartbeat
 
-            if gps.latitude is not None:
-                curr_lat = gps.latitude
+        # HEARTBEAT IS SHOWN FOR ONE FRAME AFTER NEW GPS DATA
+        if heartbeat:
+            heartbeat = False
+            frame.text(screen.gps_update_text, ' ')
 
-            if gps.longitude is not None:
-                curr_lon = gps.longitude
+        # GRID PRECISION CHANGED, MOVE THE GRID LABEL SO IT STILL ENDS AT THE RIGHT EDGE
+        if state.grid_precision != grid.precision:
+            grid.set_precision(state.grid_precision)
+            grid_x, grid_y, grid_width, grid_height = disp.label_area(screen.grid_text)
+            frame.touch(grid_x, grid_y, grid_width, grid_height)
+            screen.move_grid(grid.precision)
+
+            if last_lat is not None and last_lon is not None and grid.update(last_lat, last_lon):
+                frame.text(screen.grid_text, grid.square)
+
+        # UPDATE GPS LABELS IF NEW DATA HAS ARRIVED
+        start = profile.start()
+
+        if last_fix != state.fix_count:
+            last_fix = state.fix_count
+            heartbeat = True
+            frame.text(screen.gps_update_text, gps_char)
+
+            curr_lat = gps.latitude
+            curr_lon = gps.longitude
 
             if gps.altitude_m is not None:
                 curr_alt = int(gps.altitude_m)
@@ -636,153 +877,128 @@ def main():
             else:
                 curr_sat = 0
 
-            # GET CURRENT GRID SQUARE, UPDATE LAT, LON AND GRID LABELS IF DATA HAS CHANGED
-            curr_grid_sq = calc_grid(curr_lat, curr_lon)
-
-            if last_lat != curr_lat:
+            # UPDATE LAT, LON AND GRID LABELS IF THE SHOWN DIGITS HAVE CHANGED
+            if curr_lat is not None and curr_lon is not None:
                 last_lat = curr_lat
-                pad_length = 8 - len('{0:.4f}'.format(curr_lat))
-                lat_text.text = ' ' * pad_length + '{0:.4f}'.format(curr_lat)
-
-            if last_lon != curr_lon:
                 last_lon = curr_lon
-                pad_length = 9 - len('{0:.4f}'.format(curr_lon))
-                lon_text.text = ' ' * pad_length + '{0:.4f}'.format(curr_lon)
-
-            if last_grid_sq != curr_grid_sq:
-                last_grid_sq = curr_grid_sq
-                grid_text.text = curr_grid_sq
-
-            # UPDATE ALTITUDE LABELS IF DATA HAS CHANGED
-            if last_alt != curr_alt:
-                last_alt = curr_alt
-                alt_feet = int(curr_alt * 3.28084)
-                meter_pad_length = 5 - len(str(curr_alt))
-                feet_pad_length = 5 - len(str(alt_feet))
-                alt_ft_text.text = ' ' * feet_pad_length + str(alt_feet)
-                alt_m_text.text = ' ' * meter_pad_length + str(curr_alt)
-
-            # UPDATE SPEED AND TRACK ANGLE LABELS IF DATA HAS CHANGED
-            if last_speed != curr_speed:
-                last_speed = curr_speed
-                speed = '{0:.1f}'.format(curr_speed)
-                speed_pad_length = 5 - len(speed)
-                speed_text.text = ' ' * speed_pad_length + speed
-
-            if last_track != curr_track:
-                last_track = curr_track
-                track = '{0:.1f}'.format(curr_track)
-                track_pad_length = 5 - len(track)
-                track_text.text = ' ' * track_pad_length + track
-
-            # UPDATE SATELLITE COUNT LABEL IF DATA HAS CHANGED
-            if last_sat != curr_sat:
-                last_sat = curr_sat
-                sat_count_text.text = str(curr_sat)
-
-            time.sleep(0.1)
-
-        # GET CURRENT FORMATTED TIME AND DATE, UPDATE LABELS IF ANY HAVE CHANGED
-        curr_datetime = comp_date_time(time.time())
-
-        if last_utc_time != curr_datetime.utc_time:
-            last_utc_time = curr_datetime.utc_time
-            utc_clock_text.text = curr_datetime.utc_time
-
-        if last_utc_date != curr_datetime.utc_date:
-            last_utc_date = curr_datetime.utc_date
-            utc_date_text.text = curr_datetime.utc_date
-
-        if last_tz_time != curr_datetime.tz_time:
-            last_tz_time = curr_datetime.tz_time
-            tz_clock_text.text = curr_datetime.tz_time
-
-        if last_tz_desc != curr_datetime.tz_desc:
-            last_tz_desc = curr_datetime.tz_desc
-            tz_clock_label.text = curr_datetime.tz_desc
-
-        if last_tz_date != curr_datetime.tz_date:
-            last_tz_date = curr_datetime.tz_date
-            tz_date_text.text = curr_datetime.tz_date
-
-        # CHECK MAGNETOMETER AND UPDATE LABEL IF DATA HAS CHANGED
-        x, y, _ = comp.magnetic
-
-        curr_angle = comp_degree(x, y)
-        curr_comp = comp_direction(curr_angle)
+
+                if lat_number.set(curr_lat):
+                    frame.text_bytes(screen.lat_text, lat_number.buffer)
+
+                if lon_number.set(curr_lon):
+                    frame.text_bytes(screen.lon_text, lon_number.buffer)
+
+                if grid.update(curr_lat, curr_lon):
+                    frame.text(screen.grid_text, grid.square)
+
+            # UPDATE ALTITUDE, SPEED, TRACK ANGLE AND SATELLITE COUNT LABELS IF THE SHOWN DIGITS HAVE CHANGED
+            if alt_ft_number.set(curr_alt * 3.28084):
+                frame.text_bytes(screen.alt_ft_text, alt_ft_number.buffer)
+
+            if alt_m_number.set(curr_alt):
+                frame.text_bytes(screen.alt_m_text, alt_m_number.buffer)
+
+            if speed_number.set(curr_speed):
+                frame.text_bytes(screen.speed_text, speed_number.buffer)
+
+            if track_number.set(curr_track):
+                frame.text_bytes(screen.track_text, track_number.buffer)
+
+            if sat_number.set(curr_sat):
+                frame.text_bytes(screen.sat_count_text, sat_number.buffer)
+
+        profile.stop(stage_labels, start)
+
+        # TIME AND DATE FROM THE RTC UNTIL THE CLOCK TASK HAS GPS TIME
+        if sync is None or not sync.valid:
+            update_clock(clock.time())
+
+        # UPDATE COMPASS LABEL IF DIRECTION HAS CHANGED
+        curr_comp = state.comp_direction
 
         if last_comp != curr_comp:
             last_comp = curr_comp
-            pad_length = 3 - len(curr_comp)
-            comp_text.text = ' ' * pad_length + curr_comp
-
-        # CHECK BATTERY VOLTAGE ONCE A MINUTE AND CALCULATE PERCENTAGE OF CHARGE
-        curr_bat_time = time.monotonic()
-
-        if (curr_bat_time - last_bat_time) >= 60:
-            last_bat_time = curr_bat_time
-            curr_bat = bat.value
-            curr_bat_percent = bat_level(curr_bat)
-
-            # UPDATE BATTERY GAUGE IF PERCENTAGE HAS CHANGED
-            if last_bat_percent != curr_bat_percent:
-                bat_progress_bar.bar_color = bat_colors[curr_bat_percent - 1]
-                bat_progress_bar.value = curr_bat_percent
-
-            if curr_bat <= bat_cutoff:
-                disp_group.remove(utc_clock_text)
-                disp_group.remove(utc_clock_label)
-                disp_group.remove(utc_date_text)
-                disp_group.remove(tz_clock_text)
-                disp_group.remove(tz_clock_label)
-                disp_group.remove(tz_date_text)
-                disp_group.remove(lat_label)
-                disp_group.remove(lat_text)
-                disp_group.remove(grid_text)
-                disp_group.remove(lon_label)
-                disp_group.remove(lon_text)
-                disp_group.remove(gps_update_text)
-                disp_group.remove(alt_label)
-                disp_group.remove(alt_ft_text)
-                disp_group.remove(alt_ft_label)
-                disp_group.remove(alt_m_text)
-                disp_group.remove(alt_m_label)
-                disp_group.remove(speed_label)
-                disp_group.remove(speed_text)
-                disp_group.remove(track_label)
-                disp_group.remove(track_text)
-                disp_group.remove(sat_count_label)
-                disp_group.remove(sat_count_text)
-                disp_group.remove(comp_text)
-
-                message_text = 'LOW BATTERY'
-                message_x = int((disp_x - len(message_text) * char_width) / 2)
-                message_text = bitmap_label.Label(font, text=message_text, color=0xFFB000, x=message_x, y=int(disp_y / 2))
-                disp_group.append(message_text)
-
-                while True:
-                    pass
-
-        # CHECK FOR BUTTON PRESS TO ADJUST SCREEN BRIGHTNESS
-        if not b_dn.value:
-            disp_level -= 1024
-
-            if disp_level < 0:
-                disp_level = 0
+            frame.text(screen.comp_text, comp_padded[curr_comp])
 
-            disp_backlight.duty_cycle = disp_level
-            time.sleep(0.05)
+        # UPDATE BATTERY GAUGE IF PERCENTAGE HAS CHANGED
+        curr_bat_percent = state.bat_percent
 
-        if not b_up.value:
-            disp_level += 1024
+        if curr_bat_percent >= 0 and last_bat_percent != curr_bat_percent:
+            last_bat_percent = curr_bat_percent
+            screen.bat_progress_bar.bar_color = bat_colors[max(curr_bat_percent - 1, 0)]
+            screen.bat_progress_bar.value = curr_bat_percent
+            frame.touch(disp_x - bat_x, 0, bat_x, bat_y)
 
-            if disp_level > 65535:
-                disp_level = 65535
+        # HOURS REMAINING, WHOLE HOURS ONLY
+        curr_bat_hours = int(state.bat_hours)
 
-            disp_backlight.duty_cycle = disp_level
-            time.sleep(0.05)
+        if curr_bat_hours >= 0 and bat_hours_number.set(min(curr_bat_hours, 999)):
+            frame.text_bytes(screen.bat_hours_text, bat_hours_number.buffer)
 
-        gps_update_text.text = ' '
+    # DISPLAY REFRESH - ONE FRAME OF UPDATES FOR THE VISIBLE PAGE
+
+    def display_task():
+        clock.tick()
+
+        # REPLACE WHATEVER PAGE IS SHOWN WITH THE LOW BATTERY MESSAGE
+        if state.bat_low:
+            tasks.stop()
+            pages.show('low battery')
+            frame.refresh(clock.monotonic(), True)
+            return
+
+        if pages.active('main'):
+            update_main()
+
+        if pages.active('sky'):
+            sky_view.update(frame)
+
+        start = profile.start()
+        frame.refresh(clock.monotonic())
+        profile.stop(stage_refresh, start)
+        heap.sample()
+
+    boot.mark('screen')
+
+    if boot_report:
+        boot.print_report()
+
+        for line in gps_setup.report():
+            print(line)
+
+    # BATTERY IS READ BEFORE THE FIRST FRAME SO A FLAT BATTERY IS CAUGHT STRAIGHT AWAY
+    tasks.every('gps', gps_interval, gps_task)
+    tasks.every('battery', bat_interval, battery_task)
+    tasks.every('power', power_interval, power_task)
+    tasks.every('link', link_interval, link_task, link_interval)
+
+    if track is not None:
+        tasks.every('log', log_interval, log_task, log_interval)
+
+    tasks.every('compass', 1 / comp_rate, compass_task)
+    tasks.every('buttons', button_interval, button_task)
+    tasks.every('display', frame_interval, display_task)
+
+    if sync is not None:
+        tasks.every('clock', 1, clock_task)
+
+    tasks.every('profile', profile_window, profile_task, profile_window)
+    tasks.every('status', status_interval, status_task, status_interval)
+
+    if sky_interval:
+        tasks.every('sky', sky_interval, sky_task, sky_interval)
+
+    if task_stats_interval:
+        tasks.every('stats', task_stats_interval, print_stats, task_stats_interval)
+
+    asyncio.run(tasks.run())
+
+    # LOW BATTERY, ALL TASKS HAVE STOPPED, WRITE WHAT IS LEFT OF THE TRACK
+    if track is not None:
+        track.flush()
+
+    while True:
+        clock.sleep(1)
 
 
 main()
@@ -1,6 +1,5 @@
 import board
 import displayio
-import math
 import pwmio
 import terminalio
 import time
@@ -10,54 +9,16 @@ import adafruit_lsm303dlh_mag
 
 from adafruit_display_text import label
 
+from hamgps.compass import heading
+
 flip_x_axis = True
 flip_y_axis = False
 swap_axis = False
 
 
-def comp_degree(x_axis, y_axis):
-    if flip_x_axis:
-        x_axis *= -1
-
-    if flip_y_axis:
-        y_axis *= -1
-
-    if swap_axis:
-        x_axis, y_axis = y_axis, x_axis
-
-    if (x_axis > 0) and (y_axis == 0):
-        angle = 0
-    elif (x_axis < 0) and (y_axis == 0):
-        angle = 180
-    elif y_axis > 0:
-        angle = 90 - math.atan(x_axis / y_axis) * 180 / math.pi
-    elif y_axis < 0:
-        angle = 270 - math.atan(x_axis / y_axis) * 180 / math.pi
-
-    if angle < 0:
-        angle += 360
-
-    if angle >= 360:
-        angle -= 360
-
-    return angle
-
-
-def comp_direction(degrees):
-    if degrees == -1:
-        direction = '---'
-    elif (degrees < 11.25) or (degrees >= 348.75):
-        direction = 'N'
-    else:
-        for i in range(15):
-            c_angle = comp_angle[i]
-
-            if (degrees >= c_angle) and (degrees < (c_angle + 22.5)):
-                direction = comp_point[i]
-                break
-
-    return direction
-
+# UNCORRECTED AND HARD-IRON CORRECTED HEADINGS, THE CORRECTED OFFSETS FOLLOW THE MIN / MAX SEEN SO FAR
+raw_heading = heading(0, 0, 0, flip_x_axis, flip_y_axis, swap_axis)
+corrected_heading = heading(0, 0, 0, flip_x_axis, flip_y_axis, swap_axis)
 
 displayio.release_displays()
 spi = board.SPI()
@@ -76,9 +37,6 @@ disp_group = displayio.Group()
 disp_group.append(tile_grid)
 disp.show(disp_group)
 
-comp_angle = (11.25, 33.75, 56.25, 78.75, 101.25, 123.75, 146.25, 168.75, 191.25, 213.75, 236.25, 258.75, 281.25, 303.75, 326.25, 348.75)
-comp_point = ('NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
-
 font = terminalio.FONT
 
 # REMOVE SPLASH LOGO
@@ -136,13 +94,12 @@ def main():
         x_cal = (x_min + x_max) / 2
         y_cal = (y_min + y_max) / 2
 
-        corrected_x = x - x_cal
-        corrected_y = y - y_cal
+        corrected_heading.set_offsets(x_cal, y_cal)
 
-        uncorrected_angle = comp_degree(x, y)
-        uncorrected_direction = comp_direction(uncorrected_angle)
-        corrected_angle = comp_degree(corrected_x, corrected_y)
-        corrected_direction = comp_direction(corrected_angle)
+        uncorrected_angle = raw_heading.degrees(x, y)
+        uncorrected_direction = raw_heading.direction(x, y)
+        corrected_angle = corrected_heading.degrees(x, y)
+        corrected_direction = corrected_heading.direction(x, y)
 
         angle_text.text = str(uncorrected_angle)
         direction_text.text = uncorrected_direction
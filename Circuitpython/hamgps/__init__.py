@@ -0,0 +1,4 @@
+# HAM RADIO GPS
+# 2022 DOUGLAS GRAHAM, AB9XA
+#
+# SUPPORT MODULES FOR CODE.PY
@@ -0,0 +1,63 @@
+# HAM RADIO GPS - BUTTON DEBOUNCE AND AUTO-REPEAT
+#
+# BUTTONS ARE WIRED TO GROUND WITH A PULL-UP, value IS FALSE WHILE PRESSED. A PRESS IS ACCEPTED ONCE
+# THE INPUT HAS BEEN STABLE FOR debounce SECONDS. update() RETURNS TRUE ON THE ACCEPTED PRESS, AGAIN
+# AFTER repeat_delay WHILE HELD AND THEN EVERY repeat_interval UNTIL RELEASED.
+#
+# WITH long_press SET, long_pressed IS TRUE FOR THE ONE update() WHERE THE BUTTON HAS BEEN HELD FOR
+# long_press SECONDS. THE REPEATS BEFORE IT STILL HAPPEN, THE CALLER UNDOES THEM IF IT NEEDS TO.
+
+
+class debounced_button:
+    def __init__(self, button, debounce=0.04, repeat_delay=0.4, repeat_interval=0.05, long_press=0):
+        self._button = button
+        self._debounce = debounce
+        self._repeat_delay = repeat_delay
+        self._repeat_interval = repeat_interval
+        self._long_press = long_press
+        self._long_sent = False
+
+        self._raw = False
+        self._raw_since = 0
+        self._next_repeat = 0
+
+        self.pressed = False
+        self.pressed_since = 0
+        self.long_pressed = False
+
+    def update(self, now):
+        raw = not self._button.value
+        self.long_pressed = False
+
+        if raw != self._raw:
+            self._raw = raw
+            self._raw_since = now
+            return False
+
+        if now - self._raw_since < self._debounce:
+            return False
+
+        if raw != self.pressed:
+            self.pressed = raw
+
+            if raw:
+                self.pressed_since = now
+                self._next_repeat = now + self._repeat_delay
+                self._long_sent = False
+                return True
+
+            return False
+
+        if raw and self._long_press and not self._long_sent and now - self.pressed_since >= self._long_press:
+            self._long_sent = True
+            self.long_pressed = True
+
+        if raw and now >= self._next_repeat:
+            self._next_repeat += self._repeat_interval
+
+            if self._next_repeat < now:
+                self._next_repeat = now + self._repeat_interval
+
+            return True
+
+        return False
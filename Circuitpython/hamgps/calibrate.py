@@ -0,0 +1,52 @@
+# HAM RADIO GPS - COMPASS CALIBRATION SCREEN
+#
+# TURN THE DEVICE SLOWLY, LEVEL, THROUGH AT LEAST ONE FULL CIRCLE, THEN PRESS EITHER BUTTON. THE FIT IS
+# SAVED TO NVM AND USED STRAIGHT AWAY. PRESSING BEFORE EVERY SECTOR OF THE CIRCLE HAS SAMPLES CANCELS
+# AND KEEPS THE OLD CALIBRATION.
+#
+# ONLY RUN AT BOOT WHEN BOTH BUTTONS ARE HELD, CODE.PY IMPORTS IT THEN AND RELEASES IT AGAIN (ui.release).
+
+from hamgps import magcal
+from hamgps.magsampler import mag_scale
+
+
+def calibrate_compass(layout, group, clock, comp, comp_heading, b_up, b_dn, nvm, rate):
+    title_text = layout.message('Compass Calibration', 0x00FFFF, -1)
+    status_text = layout.message('Turn slowly, full circle', 0xFFFFFF, 1)
+    group.append(title_text)
+    group.append(status_text)
+
+    # WAIT FOR BOTH BUTTONS TO BE RELEASED
+    while not b_up.value or not b_dn.value:
+        clock.sleep(0.05)
+
+    fit = magcal.ellipse_fit(comp_heading.offset_x / mag_scale, comp_heading.offset_y / mag_scale)
+    last_status = clock.monotonic()
+
+    while b_up.value and b_dn.value:
+        x, y, _ = comp.magnetic
+        fit.add(x, y)
+        now = clock.monotonic()
+
+        if now - last_status >= 0.5:
+            last_status = now
+            status_text.text = '{:5d} samples {:2d}/{}'.format(fit.count, fit.sectors, magcal.coverage_sectors)
+
+        clock.sleep(1 / rate)
+
+    result = fit.solve()
+    group.remove(status_text)
+
+    if result is None:
+        status_text = layout.message('Cancelled', 0xFFB000, 1)
+    else:
+        cal_x, cal_y, cal_matrix = result
+        magcal.save(nvm, cal_x, cal_y, cal_matrix)
+        comp_heading.set_offsets(cal_x * mag_scale, cal_y * mag_scale)
+        comp_heading.set_matrix(cal_matrix)
+        status_text = layout.message('Saved {:.1f} {:.1f}'.format(cal_x, cal_y), 0x00FF00, 1)
+
+    group.append(status_text)
+    clock.sleep(2)
+    group.remove(title_text)
+    group.remove(status_text)
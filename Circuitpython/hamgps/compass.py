@@ -0,0 +1,126 @@
+# HAM RADIO GPS - COMPASS HEADING
+#
+# HEADING IS atan2(y, x) OF THE HARD-IRON CORRECTED MAGNETOMETER AXES, WORKED OUT IN HUNDREDTHS OF A
+# DEGREE WITHOUT math.atan:
+#
+# - THE VECTOR IS FOLDED INTO THE FIRST OCTANT (0 - 45 DEGREES) SO THE RATIO small / large IS 0 - 1
+# - atan OF THAT RATIO IS READ FROM A 257 ENTRY TABLE BUILT ONCE AT IMPORT, ROUNDED TO THE NEAREST ENTRY.
+#   THE TABLE STEP IS 1/256, atan CHANGES BY AT MOST 1 RADIAN PER UNIT, SO THE ERROR IS AT MOST
+#   0.5 / 256 RADIAN (0.112 DEGREE) PLUS 0.005 DEGREE OF ROUNDING: MAXIMUM ERROR 0.12 DEGREE
+# - THE OCTANT AND QUADRANT ARE UNFOLDED WITH INTEGER ADDS
+#
+# AXIS FLIPS AND SWAP ARE REFLECTIONS OF THE ANGLE (FLIP X: 180 - A, FLIP Y: -A, SWAP: 90 - A), SO WITH
+# THE DECLINATION THEY REDUCE TO ONE SIGN AND ONE CONSTANT, heading = sign * A + constant, WORKED OUT
+# WHEN THE heading IS CREATED. THE HEADING IS TURNED INTO A comp_point INDEX WITH ONE INTEGER DIVISION.
+#
+# HARD-IRON OFFSETS ARE SUBTRACTED FROM EACH SAMPLE AND AN OPTIONAL SOFT-IRON MATRIX (SEE magcal.py) IS
+# APPLIED BEFORE atan2, ONE 2X2 MULTIPLY PER SAMPLE.
+#
+# A ZERO VECTOR HAS NO HEADING, centidegrees() RETURNS -1 AND direction() RETURNS '---'.
+
+import math
+
+from array import array
+
+table_steps = 256
+
+# atan(i / 256) IN HUNDREDTHS OF A DEGREE
+atan_table = array('H', [int(math.atan(i / table_steps) * 18000 / math.pi + 0.5) for i in range(table_steps + 1)])
+
+full_turn = 36000
+quarter_turn = 9000
+half_turn = 18000
+
+# 16 POINTS, 22.5 DEGREES EACH, NORTH CENTERED ON 0
+comp_point = ('N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
+sector_size = full_turn // 16
+sector_half = sector_size // 2
+
+
+# atan2(y, x) IN HUNDREDTHS OF A DEGREE, 0 - 35999, -1 FOR A ZERO VECTOR
+
+
+def atan2_centidegrees(y, x):
+    ax = -x if x < 0 else x
+    ay = -y if y < 0 else y
+
+    if ay > ax:
+        angle = quarter_turn - atan_table[int(ax * table_steps / ay + 0.5)]
+    elif ax:
+        angle = atan_table[int(ay * table_steps / ax + 0.5)]
+    else:
+        return -1
+
+    if x < 0:
+        angle = half_turn - angle
+
+    if y < 0:
+        angle = full_turn - angle
+
+    return angle % full_turn
+
+
+# comp_point INDEX FOR A HEADING IN HUNDREDTHS OF A DEGREE
+
+
+def sector(centidegrees):
+    return (centidegrees + sector_half) // sector_size % 16
+
+
+class heading:
+    def __init__(self, offset_x=0, offset_y=0, declination=0, flip_x=False, flip_y=False, swap=False, matrix=None):
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.set_matrix(matrix)
+
+        # heading = sign * atan2(y, x) + constant, EACH STEP IS APPLIED ON TOP OF THE ONES BEFORE IT
+        sign = 1
+        constant = 0
+
+        if flip_x:
+            sign, constant = -sign, half_turn - constant
+
+        if flip_y:
+            sign, constant = -sign, -constant
+
+        if swap:
+            sign, constant = -sign, quarter_turn - constant
+
+        self._sign = sign
+        self._constant = (constant + int(declination * 100)) % full_turn
+
+    def set_offsets(self, offset_x, offset_y):
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+    # SOFT-IRON CORRECTION (m00, m01, m10, m11) APPLIED AFTER THE OFFSETS, NONE FOR NO CORRECTION
+
+    def set_matrix(self, matrix):
+        self._matrix = matrix is not None
+
+        if matrix is not None:
+            self._m00, self._m01, self._m10, self._m11 = matrix
+
+    # HEADING IN HUNDREDTHS OF A DEGREE, 0 - 35999, -1 WHEN THE CORRECTED VECTOR IS ZERO
+
+    def centidegrees(self, x_axis, y_axis):
+        x_axis -= self.offset_x
+        y_axis -= self.offset_y
+
+        if self._matrix:
+            x_axis, y_axis = self._m00 * x_axis + self._m01 * y_axis, self._m10 * x_axis + self._m11 * y_axis
+
+        angle = atan2_centidegrees(y_axis, x_axis)
+
+        if angle < 0:
+            return -1
+
+        return (self._sign * angle + self._constant) % full_turn
+
+    def degrees(self, x_axis, y_axis):
+        angle = self.centidegrees(x_axis, y_axis)
+        return angle / 100 if angle >= 0 else -1
+
+    def direction(self, x_axis, y_axis):
+        angle = self.centidegrees(x_axis, y_axis)
+        return comp_point[sector(angle)] if angle >= 0 else '---'
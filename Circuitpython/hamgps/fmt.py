@@ -0,0 +1,103 @@
+# HAM RADIO GPS - FIXED WIDTH NUMBER FIELDS
+#
+# '{0:.4f}'.format(), str() AND ' ' * pad + text EACH BUILD A NEW STRING, SEVERAL PER FIX, AND EVERY ONE
+# OF THEM IS GARBAGE BY THE NEXT FIX. ENOUGH OF THEM AND THE GC RUNS IN THE MIDDLE OF A FRAME.
+#
+# number_field KEEPS ITS TEXT IN A PREALLOCATED bytearray. set() SCALES THE VALUE TO AN INTEGER
+# (value * 10 ** decimals, ROUNDED), RETURNS FALSE IF THAT IS THE SAME AS LAST TIME, OTHERWISE WRITES THE
+# DIGITS RIGHT ALIGNED INTO THE BUFFER. SMALL INTEGERS AND FLOATS ARE NOT HEAP OBJECTS IN CIRCUITPYTHON,
+# SO NOTHING IS ALLOCATED. A VALUE TOO WIDE FOR THE FIELD IS SHOWN AS DASHES.
+#
+# frame_display.text_bytes() HANDS THE BUFFER TO THE LABEL: A GLYPH FIELD COPIES THE BYTES INTO ITS
+# TILES, A bitmap_label NEEDS A str AND GETS ONE (ONLY WHEN THE VALUE CHANGED).
+
+char_space = 0x20
+char_minus = 0x2D
+char_point = 0x2E
+char_zero = 0x30
+
+
+# WRITE scaled (AN INTEGER, THE LAST decimals DIGITS ARE THE FRACTION) RIGHT ALIGNED INTO
+# buffer[start:start + width], RETURNS FALSE (FIELD FILLED WITH DASHES) IF IT DOES NOT FIT
+
+
+def put_number(buffer, start, width, scaled, decimals=0):
+    negative = scaled < 0
+
+    if negative:
+        scaled = -scaled
+
+    i = start + width - 1
+    digits = 0
+
+    while i >= start:
+        if decimals and digits == decimals:
+            buffer[i] = char_point
+            decimals = 0
+            digits = 0
+            i -= 1
+            continue
+
+        buffer[i] = char_zero + scaled % 10
+        scaled //= 10
+        digits += 1
+        i -= 1
+
+        if not scaled and not decimals:
+            break
+
+    if scaled or decimals or (negative and i < start):
+        for i in range(start, start + width):
+            buffer[i] = char_minus
+
+        return False
+
+    if negative:
+        buffer[i] = char_minus
+        i -= 1
+
+    while i >= start:
+        buffer[i] = char_space
+        i -= 1
+
+    return True
+
+
+# TWO DIGITS WITH A LEADING ZERO (CLOCK FIELDS)
+
+
+def put_two(buffer, start, value):
+    buffer[start] = char_zero + value // 10
+    buffer[start + 1] = char_zero + value % 10
+
+
+class number_field:
+    def __init__(self, width, decimals=0, suffix=''):
+        # ROOM FOR AT LEAST ONE DIGIT, THE POINT AND THE FRACTION
+        if width < (decimals + 2 if decimals else 1):
+            raise ValueError('field too narrow for {} decimals'.format(decimals))
+
+        self._width = width
+        self._decimals = decimals
+        self._scale = 10 ** decimals
+        self._value = None
+
+        self.buffer = bytearray(b' ' * width + suffix.encode())
+        self.changes = 0
+
+    # NEW VALUE, RETURNS TRUE IF THE TEXT CHANGED
+
+    def set(self, value):
+        scaled = round(value * self._scale) if self._decimals else int(value)
+
+        if scaled == self._value:
+            return False
+
+        self._value = scaled
+        self.changes += 1
+        put_number(self.buffer, 0, self._width, scaled, self._decimals)
+        return True
+
+    @property
+    def text(self):
+        return str(self.buffer, 'ascii')
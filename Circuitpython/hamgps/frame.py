@@ -0,0 +1,106 @@
+# HAM RADIO GPS - FRAME BASED DISPLAY REFRESH
+#
+# WITH auto_refresh ON EVERY label.text ASSIGNMENT IS PICKED UP BY THE NEXT BACKGROUND REFRESH, SO A PASS
+# THAT CHANGES SEVERAL LABELS CAN PUSH THEM OVER SPI IN SEVERAL SEPARATE REFRESHES.
+#
+# frame_display TURNS auto_refresh OFF. text() ONLY RECORDS THE NEW TEXT, AN ASSIGNMENT THAT ENDS UP
+# WHERE IT STARTED (HEARTBEAT ON AND OFF IN THE SAME FRAME) IS DROPPED. refresh() APPLIES EVERYTHING
+# RECORDED SINCE THE LAST FRAME AND CALLS display.refresh() ONCE. FRAMES CLOSER THAN min_interval ARE
+# HELD BACK AND MERGED INTO THE NEXT ONE.
+#
+# EACH CHANGED LABEL IS COUNTED AS ONE DIRTY RECTANGLE COVERING ITS OLD AND NEW TEXT (ONLY THE CHANGED
+# TILES FOR A GLYPH FIELD), BYTES ARE THE RGB565 PIXELS IN THOSE RECTANGLES (2 BYTES EACH), WHICH IS
+# WHAT displayio SENDS OVER SPI FOR THEM.
+
+bytes_per_pixel = 2
+
+
+class frame_display:
+    def __init__(self, display, min_interval=0.05):
+        self._display = display
+        self._min_interval = min_interval
+        self._pending = {}
+        self._touched = []
+        self._last_refresh = None
+
+        display.set_auto_refresh(False)
+
+        self.text_sets = 0
+        self.frames = 0
+        self.held = 0
+        self.dirty_rects = 0
+        self.dirty_bytes = 0
+
+    # RECORD NEW TEXT FOR A LABEL, APPLIED ON THE NEXT FRAME
+
+    def text(self, label, text):
+        self.text_sets += 1
+
+        if label.text == text:
+            if label in self._pending:
+                del self._pending[label]
+        else:
+            self._pending[label] = text
+
+    # RECORD TEXT HELD IN A bytearray (fmt.py, CLOCK ENGINE) THAT THE CALLER KNOWS HAS CHANGED. A GLYPH
+    # FIELD IS GIVEN THE BUFFER ITSELF AND COPIES THE BYTES ON THE NEXT FRAME, SO THE LATEST VALUE IS
+    # SHOWN. OTHER LABELS NEED A str
+
+    def text_bytes(self, label, buffer):
+        self.text_sets += 1
+        self._pending[label] = buffer if hasattr(label, 'changed_area') else str(buffer, 'ascii')
+
+    # COUNT AN AREA CHANGED OUTSIDE text() (PROGRESS BAR, GROUP CHANGES) AS PART OF THE NEXT FRAME
+
+    def touch(self, x, y, width, height):
+        self._touched.append(width * height)
+
+    # DRAW ONE FRAME IF ANYTHING CHANGED, RETURNS TRUE IF THE DISPLAY WAS REFRESHED
+
+    def refresh(self, now, force=False):
+        if not self._pending and not self._touched and not force:
+            return False
+
+        if not force and self._last_refresh is not None and now - self._last_refresh < self._min_interval:
+            self.held += 1
+            return False
+
+        display = self._display
+
+        for label, text in self._pending.items():
+            old_x, old_y, old_width, old_height = display.label_area(label)
+            label.text = text
+
+            # GLYPH FIELDS ONLY DIRTY THE TILES THAT CHANGED
+            if hasattr(label, 'changed_area'):
+                old_x, old_y, old_width, old_height = label.changed_area()
+                x, y, width, height = old_x, old_y, old_width, old_height
+            else:
+                x, y, width, height = display.label_area(label)
+
+            left = min(old_x, x)
+            top = min(old_y, y)
+            right = max(old_x + old_width, x + width)
+            bottom = max(old_y + old_height, y + height)
+
+            if right > left and bottom > top:
+                self.dirty_rects += 1
+                self.dirty_bytes += (right - left) * (bottom - top) * bytes_per_pixel
+
+        for area in self._touched:
+            self.dirty_rects += 1
+            self.dirty_bytes += area * bytes_per_pixel
+
+        self._pending.clear()
+        self._touched.clear()
+        self._last_refresh = now
+        self.frames += 1
+
+        display.refresh()
+        return True
+
+    def report(self):
+        full = self._display.width * self._display.height * bytes_per_pixel
+
+        return ['frames {}, held {}, text sets {}, dirty rects {}, {} bytes pushed ({} per frame, full screen {})'.format(
+            self.frames, self.held, self.text_sets, self.dirty_rects, self.dirty_bytes, self.dirty_bytes // self.frames if self.frames else 0, full)]
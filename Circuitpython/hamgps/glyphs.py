@@ -0,0 +1,149 @@
+# HAM RADIO GPS - TILE BASED FIXED WIDTH TEXT FIELDS
+#
+# bitmap_label.Label RASTERIZES ITS WHOLE BITMAP FROM THE FONT EVERY TIME ITS TEXT CHANGES, EVEN WHEN
+# ONLY THE SECONDS DIGIT MOVED.
+#
+# glyph_atlas DRAWS EACH CHARACTER A FIELD CAN SHOW (DIGITS, SIGNS, PUNCTUATION AND A FEW LETTERS) ONCE,
+# AT STARTUP, INTO ONE BITMAP OF FIXED SIZE CELLS. glyph_field IS A displayio.TileGrid WITH ONE TILE PER
+# CHARACTER OVER THAT BITMAP, SETTING text ONLY CHANGES THE TILE INDEX OF THE CHARACTERS THAT DIFFER.
+# THE ATLAS BITMAP IS SHARED, EACH FIELD ONLY HAS ITS OWN TWO COLOR PALETTE.
+#
+# A FIELD IS PLACED THE SAME WAY AS A LABEL: x IS THE LEFT EDGE, y IS HALF THE FONT ASCENT ABOVE THE
+# BASELINE. CHARACTERS NOT IN THE ATLAS ARE SHOWN AS BLANKS, TEXT LONGER THAN THE FIELD IS CUT OFF.
+#
+# text CAN ALSO BE SET FROM A bytearray (SEE fmt.py), THE FIELD KEEPS ITS OWN COPY OF THE CHARACTER
+# CODES AND ONLY BUILDS A str WHEN text IS READ.
+
+import displayio
+
+# CHARACTERS BAKED INTO THE ATLAS, INDEX 0 (SPACE) IS THE BLANK TILE
+atlas_chars = ' 0123456789+-.:/NSEW'
+
+
+class glyph_atlas:
+    def __init__(self, font, chars=atlas_chars):
+        font.load_glyphs(chars)
+
+        self.ascent = font.ascent
+        self.cell_height = font.ascent + font.descent
+        self.cell_width = 0
+
+        for char in chars:
+            glyph = font.get_glyph(ord(char))
+
+            if glyph is not None and glyph.shift_x > self.cell_width:
+                self.cell_width = glyph.shift_x
+
+        self.bitmap = displayio.Bitmap(self.cell_width * len(chars), self.cell_height, 2)
+
+        # TILE INDEX BY ASCII CODE, 0 (BLANK) FOR CHARACTERS NOT IN THE ATLAS
+        self.index = bytearray(128)
+
+        for i in range(len(chars)):
+            self.index[ord(chars[i])] = i
+            glyph = font.get_glyph(ord(chars[i]))
+
+            if glyph is None:
+                continue
+
+            # GLYPH TOP IS height + dy ABOVE THE BASELINE, THE BASELINE IS ascent ROWS DOWN THE CELL
+            left = i * self.cell_width + glyph.dx
+            top = self.ascent - glyph.height - glyph.dy
+
+            for gy in range(glyph.height):
+                y = top + gy
+
+                if 0 <= y < self.cell_height:
+                    for gx in range(glyph.width):
+                        x = left + gx
+
+                        if glyph.bitmap[gx, gy] and i * self.cell_width <= x < (i + 1) * self.cell_width:
+                            self.bitmap[x, y] = 1
+
+    def palette(self, color):
+        palette = displayio.Palette(2)
+        palette[0] = 0x000000
+        palette[1] = color
+        palette.make_transparent(0)
+        return palette
+
+
+class glyph_field(displayio.Group):
+    def __init__(self, atlas, length, color, x, y, text=''):
+        super().__init__(x=x, y=y)
+
+        self._atlas = atlas
+        self._index = atlas.index
+        self._length = length
+        self._chars = bytearray(b' ' * length)
+        self._text = ' ' * length
+        self._top = atlas.ascent // 2 - atlas.ascent
+
+        self._grid = displayio.TileGrid(atlas.bitmap, pixel_shader=atlas.palette(color), width=length, height=1,
+                                        tile_width=atlas.cell_width, tile_height=atlas.cell_height, default_tile=0, y=self._top)
+        self.append(self._grid)
+
+        # FIRST AND LAST TILE CHANGED BY THE LAST text SET, FOR changed_area()
+        self._first = 0
+        self._last = -1
+
+        self.text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = str(self._chars, 'ascii')
+
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        chars = self._chars
+        grid = self._grid
+        index = self._index
+        from_str = isinstance(text, str)
+        count = len(text)
+        self._first = self._length
+        self._last = -1
+
+        for i in range(self._length):
+            if i < count:
+                code = ord(text[i]) if from_str else text[i]
+            else:
+                code = 0x20
+
+            # NOTHING ABOVE ASCII IS IN THE ATLAS
+            if code > 127:
+                code = 0x20
+
+            if code != chars[i]:
+                chars[i] = code
+                grid[i] = index[code]
+
+                if i < self._first:
+                    self._first = i
+
+                self._last = i
+
+        self._text = text if from_str and count == self._length else None
+
+    @property
+    def color(self):
+        return self._grid.pixel_shader[1]
+
+    @color.setter
+    def color(self, color):
+        self._grid.pixel_shader[1] = color
+
+    @property
+    def bounding_box(self):
+        return 0, self._top, self._length * self._atlas.cell_width, self._atlas.cell_height
+
+    # SCREEN AREA (X, Y, WIDTH, HEIGHT) OF THE TILES CHANGED BY THE LAST text SET
+
+    def changed_area(self):
+        if self._last < 0:
+            return self.x, self.y + self._top, 0, 0
+
+        cell_width = self._atlas.cell_width
+        return self.x + self._first * cell_width, self.y + self._top, (self._last - self._first + 1) * cell_width, self._atlas.cell_height
@@ -0,0 +1,160 @@
+# HAM RADIO GPS - MAIDENHEAD LOCATOR
+#
+# 6, 8 OR 10 CHARACTER LOCATORS: FIELD (A-R, 20 X 10 DEGREES), SQUARE (0-9), SUBSQUARE (a-x),
+# EXTENDED SQUARE (0-9) AND EXTENDED SUBSQUARE (a-x, 1/2880 X 1/5760 DEGREE).
+#
+# THE POSITION IS TURNED INTO THE INDEX OF ITS 10 CHARACTER CELL ON EACH AXIS AND THE CHARACTERS ARE
+# PEELED OFF WITH divmod, THE LOCATOR STRING IS BUILT ONCE. grid_engine KEEPS THE BOUNDS OF THE CURRENT
+# CELL, update() ONLY RECALCULATES WHEN A FIX LANDS OUTSIDE THEM.
+#
+# decode() TURNS A LOCATOR (2 - 10 CHARACTERS) BACK INTO ITS CENTER AND BOUNDS.
+
+# CELLS PER DEGREE AT 10 CHARACTER PRECISION
+lon_cells = 2880
+lat_cells = 5760
+
+# DIVISIONS FROM THE SMALLEST PAIR OUTWARDS: EXTENDED SUBSQUARE, EXTENDED SQUARE, SUBSQUARE, SQUARE
+pair_divisions = (24, 10, 24, 10)
+
+# SIZE OF ONE CELL IN 10 CHARACTER CELLS FOR EACH PRECISION (2, 4, 6, 8, 10 CHARACTERS)
+cell_span = {2: 57600, 4: 5760, 6: 240, 8: 24, 10: 1}
+
+# 6 CHARACTER SQUARES AROUND THE EQUATOR
+square_columns = 360 * lon_cells // cell_span[6]
+
+grid_upper = 'ABCDEFGHIJKLMNOPQRSTUVWX'
+grid_lower = 'abcdefghijklmnopqrstuvwx'
+grid_digits = '0123456789'
+
+pair_chars = (grid_upper, grid_digits, grid_lower, grid_digits, grid_lower)
+
+
+def cell_index(latitude, longitude):
+    lon_index = int((longitude + 180) * lon_cells)
+    lat_index = int((latitude + 90) * lat_cells)
+
+    # THE POLES AND THE ANTIMERIDIAN BELONG TO THE LAST CELL
+    if lon_index >= 360 * lon_cells:
+        lon_index = 360 * lon_cells - 1
+
+    if lat_index >= 180 * lat_cells:
+        lat_index = 180 * lat_cells - 1
+
+    if lon_index < 0:
+        lon_index = 0
+
+    if lat_index < 0:
+        lat_index = 0
+
+    return lat_index, lon_index
+
+
+# INDEX OF THE 6 CHARACTER SQUARE (0 - 18,662,399, ROW BY ROW FROM THE SOUTH WEST CORNER), FOR STORING
+# A SQUARE IN AN INTEGER. locator_from_square() TURNS IT BACK INTO A LOCATOR
+
+
+def square_index(latitude, longitude):
+    lat_index, lon_index = cell_index(latitude, longitude)
+    return lat_index // cell_span[6] * square_columns + lon_index // cell_span[6]
+
+
+def locator_from_square(index):
+    lat_index, lon_index = divmod(index, square_columns)
+    return locator_from_index(lat_index * cell_span[6], lon_index * cell_span[6], 6)
+
+
+def locator(latitude, longitude, precision=6):
+    return locator_from_index(*cell_index(latitude, longitude), precision)
+
+
+def locator_from_index(lat_index, lon_index, precision):
+    pairs = []
+
+    for division in pair_divisions:
+        lon_index, lon_char = divmod(lon_index, division)
+        lat_index, lat_char = divmod(lat_index, division)
+        pairs.append((lon_char, lat_char))
+
+    pairs.append((lon_index, lat_index))
+    text = ''
+
+    for i in range(precision // 2):
+        lon_char, lat_char = pairs[4 - i]
+        text += pair_chars[i][lon_char] + pair_chars[i][lat_char]
+
+    return text
+
+
+# CENTER (LAT, LON) AND BOUNDS (SOUTH, WEST, NORTH, EAST) OF A LOCATOR, ValueError IF IT IS NOT ONE
+
+
+def decode(text):
+    precision = len(text)
+
+    if precision not in cell_span:
+        raise ValueError('locator must be 2, 4, 6, 8 or 10 characters')
+
+    text = text[:2].upper() + text[2:].lower()
+    lon_index = 0
+    lat_index = 0
+    divisions = (18,) + tuple(reversed(pair_divisions))
+
+    for i in range(precision // 2):
+        lon_char = pair_chars[i].find(text[i * 2])
+        lat_char = pair_chars[i].find(text[i * 2 + 1])
+
+        if not 0 <= lon_char < divisions[i] or not 0 <= lat_char < divisions[i]:
+            raise ValueError('invalid locator {}'.format(text))
+
+        lon_index = lon_index * divisions[i] + lon_char
+        lat_index = lat_index * divisions[i] + lat_char
+
+    span = cell_span[precision]
+    west = lon_index * span / lon_cells - 180
+    south = lat_index * span / lat_cells - 90
+    east = west + span / lon_cells
+    north = south + span / lat_cells
+
+    return ((south + north) / 2, (west + east) / 2), (south, west, north, east)
+
+
+class grid_engine:
+    def __init__(self, precision=6):
+        self.square = ''
+        self.recalculations = 0
+        self.set_precision(precision)
+
+    def set_precision(self, precision):
+        if precision not in (6, 8, 10):
+            raise ValueError('precision must be 6, 8 or 10')
+
+        self.precision = precision
+
+        # EMPTY BOUNDS, THE NEXT update() RECALCULATES
+        self._south = self._west = 1
+        self._north = self._east = 0
+
+    # RETURNS TRUE WHEN square HAS CHANGED
+
+    def update(self, latitude, longitude):
+        if self._south <= latitude < self._north and self._west <= longitude < self._east:
+            return False
+
+        self.recalculations += 1
+        lat_index, lon_index = cell_index(latitude, longitude)
+        span = cell_span[self.precision]
+        lat_index -= lat_index % span
+        lon_index -= lon_index % span
+
+        self._south = lat_index / lat_cells - 90
+        self._north = (lat_index + span) / lat_cells - 90
+        self._west = lon_index / lon_cells - 180
+        self._east = (lon_index + span) / lon_cells - 180
+
+        square = locator_from_index(lat_index, lon_index, self.precision)
+
+        if square == self.square:
+            return False
+
+        self.square = square
+        return True
@@ -0,0 +1,277 @@
+# HAM RADIO GPS - HARDWARE ABSTRACTION LAYER
+#
+# THIN DEVICE LAYER BETWEEN CODE.PY AND THE BOARD PERIPHERALS:
+#
+# clock         MONOTONIC TIME, SLEEP, LIGHT SLEEP, RTC
+# display       ILI9341 TFT, FONTS, LABELS, GROUPS, SPLASH IMAGE, BATTERY BAR, BITMAPS
+# gps_port      UART TO THE GPS RECEIVER (REOPENED WHEN THE BAUD RATE CHANGES)
+# compass       LSM303DLH MAGNETOMETER
+# battery       ADC ON THE BATTERY DIVIDER
+# button_up     BRIGHTNESS UP BUTTON
+# button_down   BRIGHTNESS DOWN BUTTON
+# backlight     PWM OUTPUT FOR THE DISPLAY BACKLIGHT
+# nvm           NON-VOLATILE MEMORY (microcontroller.nvm) FOR SETTINGS THAT SURVIVE A RESET
+# storage       CIRCUITPY FILESYSTEM FOR THE TRACK LOG (WRITABLE ONLY IF boot.py REMOUNTED IT)
+#
+# ON THE BOARD EVERY DEVICE IS THE NATIVE CIRCUITPYTHON OBJECT OR A SMALL WRAPPER
+# AROUND IT, SO THE LAYER COSTS NOTHING IN THE MAIN LOOP. HARDWARE MODULES ARE ONLY
+# IMPORTED INSIDE THE BOARD CLASSES, WHICH LETS THIS FILE IMPORT UNDER CPYTHON.
+# THE HOST SIMULATOR (Host/simulator.py) CALLS install() WITH ITS OWN FACTORY
+# BEFORE RUNNING CODE.PY.
+
+import time
+
+_factory = None
+
+
+# REPLACE THE BOARD DEVICES WITH ANOTHER IMPLEMENTATION (USED BY THE HOST SIMULATOR)
+
+
+def install(factory):
+    global _factory
+    _factory = factory
+
+
+# OPEN ALL DEVICES, PINS ARE GIVEN AS BOARD PIN NAMES ('A0', 'D5', ...)
+
+
+def open_devices(config):
+    if _factory is not None:
+        return _factory(config)
+
+    return board_devices(config)
+
+
+class devices:
+    def __init__(self, clock, display, gps_port, compass, battery, button_up, button_down, backlight, nvm=None, storage=None):
+        self.clock = clock
+        self.display = display
+        self.gps_port = gps_port
+        self.compass = compass
+        self.battery = battery
+        self.button_up = button_up
+        self.button_down = button_down
+        self.backlight = backlight
+        self.nvm = nvm
+        self.storage = storage
+
+
+def board_pin(name):
+    import board
+
+    return getattr(board, name)
+
+
+# MONOTONIC TIME, SLEEP, LIGHT SLEEP AND RTC
+# tick() IS CALLED ONCE PER PASS OF THE MAIN LOOP, IT IS ONLY COUNTED BY THE SIMULATOR
+
+
+class board_clock:
+    def __init__(self):
+        import rtc
+
+        self._rtc = rtc
+        self._clock = rtc.RTC()
+
+        self.monotonic = time.monotonic
+        self.monotonic_ns = time.monotonic_ns
+        self.sleep = time.sleep
+        self.time = time.time
+
+        try:
+            import alarm
+
+            self._alarm = alarm
+        except ImportError:
+            self._alarm = None
+
+    # LIGHT SLEEP FOR secs, THE UART KEEPS RECEIVING AND THE BACKLIGHT PWM KEEPS RUNNING
+    # (PLAIN time.sleep ON BUILDS WITHOUT alarm)
+
+    def light_sleep(self, secs):
+        if self._alarm is None:
+            time.sleep(secs)
+            return
+
+        self._alarm.light_sleep_until_alarms(self._alarm.time.TimeAlarm(monotonic_time=time.monotonic() + secs))
+
+    def tick(self):
+        pass
+
+    def set_datetime(self, datetime):
+        self._clock.datetime = datetime
+
+    def set_time_source(self, source):
+        self._rtc.set_time_source(source)
+
+
+# ILI9341 TFT DISPLAY
+
+
+class board_display:
+    def __init__(self, pin_sck, pin_mosi, pin_cs, pin_dc, pin_rst, width, height):
+        import busio
+        import displayio
+        import adafruit_ili9341
+
+        from adafruit_display_text import bitmap_label
+
+        self._displayio = displayio
+        self._label = bitmap_label.Label
+
+        try:
+            import bitmaptools
+
+            self._bitmaptools = bitmaptools
+        except ImportError:
+            self._bitmaptools = None
+
+        displayio.release_displays()
+        spi = busio.SPI(board_pin(pin_sck), MOSI=board_pin(pin_mosi))
+        disp_bus = displayio.FourWire(spi, command=board_pin(pin_dc), chip_select=board_pin(pin_cs), reset=board_pin(pin_rst), baudrate=60000000)
+
+        self.disp = adafruit_ili9341.ILI9341(disp_bus, width=width, height=height)
+        self.width = width
+        self.height = height
+
+    def load_font(self, path):
+        from adafruit_bitmap_font import bitmap_font
+
+        return bitmap_font.load_font(path)
+
+    def group(self, scale=1):
+        return self._displayio.Group(scale=scale)
+
+    def show(self, group):
+        self.disp.show(group)
+
+    def set_auto_refresh(self, auto_refresh):
+        self.disp.auto_refresh = auto_refresh
+
+    def refresh(self):
+        self.disp.refresh()
+
+    # SCREEN AREA (X, Y, WIDTH, HEIGHT) COVERED BY A LABEL'S TEXT
+    def label_area(self, label):
+        x, y, width, height = label.bounding_box
+        return label.x + x, label.y + y, width, height
+
+    # NAME IS ONLY USED BY THE SIMULATOR FOR PER-LABEL REDRAW COUNTS
+    def label(self, font, text, color, x, y, name=None):
+        return self._label(font, text=text, color=color, x=x, y=y)
+
+    # FIXED WIDTH FIELD DRAWN FROM A GLYPH ATLAS, SEE glyphs.py
+    def glyph_atlas(self, font):
+        from hamgps.glyphs import glyph_atlas
+
+        return glyph_atlas(font)
+
+    def glyph_field(self, atlas, text, color, x, y, name=None):
+        from hamgps.glyphs import glyph_field
+
+        return glyph_field(atlas, len(text), color, x, y, text)
+
+    def image(self, path):
+        bitmap = self._displayio.OnDiskBitmap(path)
+        return self._displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader)
+
+    def progress_bar(self, x, y, width, height, **kwargs):
+        from adafruit_progressbar.horizontalprogressbar import (HorizontalProgressBar, HorizontalFillDirection)
+
+        return HorizontalProgressBar((x, y), (width, height), direction=HorizontalFillDirection.LEFT_TO_RIGHT, **kwargs)
+
+    # PALETTE BITMAP AND THE TILE GRID SHOWING IT AT (x, y), PALETTE INDEX 0 IS SEE-THROUGH WHEN transparent
+    # IS SET. NAME IS ONLY USED BY THE SIMULATOR
+    def bitmap(self, width, height, colors, x, y, transparent=False, name=None):
+        displayio = self._displayio
+        bitmap = displayio.Bitmap(width, height, len(colors))
+        palette = displayio.Palette(len(colors))
+
+        for i, color in enumerate(colors):
+            palette[i] = color
+
+        if transparent:
+            palette.make_transparent(0)
+
+        return bitmap, displayio.TileGrid(bitmap, pixel_shader=palette, x=x, y=y)
+
+    # SET THE PIXELS x1 <= x < x2, y1 <= y < y2 OF A BITMAP TO value, displayio ONLY REDRAWS THAT AREA
+    def fill(self, bitmap, x1, y1, x2, y2, value):
+        if x2 <= x1 or y2 <= y1:
+            return
+
+        if self._bitmaptools is not None:
+            self._bitmaptools.fill_region(bitmap, x1, y1, x2, y2, value)
+            return
+
+        for y in range(y1, y2):
+            for x in range(x1, x2):
+                bitmap[x, y] = value
+
+
+# UART TO THE GPS RECEIVER
+# open() CLOSES ANY PREVIOUS UART SO THE BAUD RATE CAN BE CHANGED AFTER RECONFIGURING THE RECEIVER
+
+
+class board_gps_port:
+    def __init__(self, pin_tx, pin_rx):
+        self._pin_tx = board_pin(pin_tx)
+        self._pin_rx = board_pin(pin_rx)
+        self.uart = None
+
+    def open(self, baudrate, receiver_buffer_size=256, timeout=1):
+        import busio
+
+        if self.uart is not None:
+            self.uart.deinit()
+
+        self.uart = busio.UART(self._pin_tx, self._pin_rx, baudrate=baudrate, timeout=timeout, receiver_buffer_size=receiver_buffer_size)
+        return self.uart
+
+
+# CIRCUITPY FILESYSTEM, PATHS ARE ABSOLUTE ('/tracks/...')
+
+
+class board_storage:
+    def __init__(self):
+        import os
+
+        self.listdir = os.listdir
+        self.mkdir = os.mkdir
+        self.remove = os.remove
+        self.open = open
+
+
+def board_button(pin_name):
+    from digitalio import DigitalInOut, Direction, Pull
+
+    button = DigitalInOut(board_pin(pin_name))
+    button.direction = Direction.INPUT
+    button.pull = Pull.UP
+    return button
+
+
+def board_devices(config):
+    import analogio
+    import busio
+    import microcontroller
+    import pwmio
+
+    import adafruit_lsm303dlh_mag
+
+    clock = board_clock()
+
+    display = board_display(config['pin_sck'], config['pin_mosi'], config['pin_cs'], config['pin_dc'], config['pin_rst'], config['disp_x'], config['disp_y'])
+    backlight = pwmio.PWMOut(board_pin(config['pin_bl']), frequency=5000, duty_cycle=config['disp_level'])
+
+    i2c = busio.I2C(board_pin(config['pin_scl']), board_pin(config['pin_sda']))
+    compass = adafruit_lsm303dlh_mag.LSM303DLH_Mag(i2c)
+
+    battery = analogio.AnalogIn(board_pin(config['pin_battery']))
+
+    button_up = board_button(config['pin_bright_up'])
+    button_down = board_button(config['pin_bright_down'])
+
+    gps_port = board_gps_port(config['pin_tx'], config['pin_rx'])
+
+    return devices(clock, display, gps_port, compass, battery, button_up, button_down, backlight, microcontroller.nvm, board_storage())
@@ -0,0 +1,51 @@
+# HAM RADIO GPS - HEAP MONITOR
+#
+# CIRCUITPYTHON HAS gc.mem_free() BUT NO COUNT OF COLLECTIONS. sample() IS CALLED ONCE PER DISPLAY
+# FRAME: FREE MEMORY ONLY GOES UP WHEN THE GC HAS RUN, SO A RISE IS COUNTED AS ONE COLLECTION AND A FALL
+# AS BYTES ALLOCATED SINCE THE LAST SAMPLE. A COLLECTION FOLLOWED BY MORE ALLOCATION THAN IT FREED IN THE
+# SAME FRAME IS MISSED, SO BOTH FIGURES ARE LOWER BOUNDS.
+#
+# UNDER CPYTHON (HOST SIMULATOR) THERE IS NO gc.mem_free() AND THE MONITOR DOES NOTHING, USE
+# Host/bench_suite.py TO MEASURE ALLOCATION ON THE HOST.
+
+import gc
+
+
+class heap_monitor:
+    def __init__(self):
+        self._mem_free = getattr(gc, 'mem_free', None)
+        self._last = None
+
+        self.enabled = self._mem_free is not None
+        self.samples = 0
+        self.collections = 0
+        self.allocated = 0
+        self.free = 0
+        self.min_free = 0
+
+    def sample(self):
+        if not self.enabled:
+            return
+
+        free = self._mem_free()
+
+        if self._last is None:
+            self.min_free = free
+        elif free > self._last:
+            self.collections += 1
+        else:
+            self.allocated += self._last - free
+
+        if free < self.min_free:
+            self.min_free = free
+
+        self._last = free
+        self.free = free
+        self.samples += 1
+
+    def report(self):
+        if not self.enabled:
+            return ['heap not measured (no gc.mem_free)']
+
+        per_sample = self.allocated // (self.samples - self.collections - 1) if self.samples - self.collections > 1 else 0
+        return ['heap {} free, min {}, {} collections, {} bytes allocated ({} per frame)'.format(self.free, self.min_free, self.collections, self.allocated, per_sample)]
@@ -0,0 +1,154 @@
+# HAM RADIO GPS - GPS LINK RATE AND THROUGHPUT
+#
+# AT 1 HZ THE LINK RUNS AT 38400 BAUD WITH A 256 BYTE RECEIVE BUFFER. HIGH RATE NAVIGATION (5 OR 10 HZ)
+# MOVES IT TO 115200 BAUD AND SIZES THE RECEIVE BUFFER FROM THE BYTES PER SECOND THE ENABLED MESSAGES
+# PRODUCE: ONE EPOCH (WHICH ARRIVES AS A BURST) PLUS WHAT ARRIVES DURING THE LONGEST EXPECTED STALL OF
+# THE GPS TASK, ROUNDED UP TO A POWER OF TWO.
+#
+# link_monitor MEASURES THE THROUGHPUT, THE RECEIVE BUFFER HIGH-WATER MARK (SAMPLED EACH TIME THE GPS
+# TASK DRAINS IT), A FULL BUFFER (COUNTED AS AN OVERRUN, BYTES WERE LOST) AND PARSER ERRORS. WHEN A
+# WINDOW SHOWS THE BUFFER MORE THAN 3/4 FULL, AN OVERRUN OR NEW PARSER ERRORS IT STEPS DOWN ONE LEVEL:
+#
+# - NMEA: GGA DROPS TO ONCE A SECOND (RMC STILL CARRIES POSITION, SPEED AND TRACK AT THE FULL RATE)
+# - THEN THE NAVIGATION RATE FALLS BACK, 10 -> 5 -> 1 HZ
+#
+# IT NEVER STEPS BACK UP, A RESTART GOES BACK TO THE CONFIGURED RATE.
+#
+# A POLLED MESSAGE (NAV-SAT FOR THE SKY PAGE) IS ONLY ASKED FOR WHEN room() SAYS THE LINK HAS SPACE FOR
+# IT: NO PRESSURE IN THE LAST WINDOW, NOTHING SHED, THE MEASURED THROUGHPUT PLUS THE POLL'S BYTES PER
+# SECOND STILL UNDER HALF THE LINK AND ITS BURST PLUS ONE EPOCH FITTING THE RECEIVE BUFFER. buffer_size()
+# TAKES THAT BURST INTO ACCOUNT.
+
+high_rate_baud = 115200
+low_rate_baud = 38400
+
+# BYTES PER EPOCH OF THE MESSAGES EACH MODE LEAVES ENABLED (RMC + GGA, NAV-PVT)
+epoch_bytes = {'nmea': 150, 'adafruit': 150, 'ubx': 100}
+
+# LONGEST THE GPS TASK IS EXPECTED TO GO WITHOUT DRAINING THE UART (DISPLAY REFRESH), SECONDS
+max_stall = 0.25
+
+# GGA CLASS / ID
+msg_gga = (0xF0, 0x00)
+
+
+def link_baud(nav_rate):
+    return high_rate_baud if nav_rate > 1 else low_rate_baud
+
+
+def bytes_per_sec(gps_mode, nav_rate):
+    return epoch_bytes[gps_mode] * nav_rate
+
+
+def buffer_size(gps_mode, nav_rate, burst=0):
+    need = epoch_bytes[gps_mode] + burst + bytes_per_sec(gps_mode, nav_rate) * max_stall
+    size = 256
+
+    while size < need:
+        size *= 2
+
+    return size
+
+
+# (NAVIGATION RATE, GGA EVERY N EPOCHS) FROM THE CONFIGURED RATE DOWN TO 1 HZ
+
+
+def shed_levels(gps_mode, nav_rate):
+    nmea = gps_mode != 'ubx'
+    levels = [(nav_rate, 1)]
+
+    if nmea and nav_rate > 1:
+        levels.append((nav_rate, nav_rate))
+
+    while nav_rate > 1:
+        nav_rate = 5 if nav_rate > 5 else 1
+        levels.append((nav_rate, nav_rate if nmea else 1))
+
+    return levels
+
+
+class link_monitor:
+    def __init__(self, transport, clock, gps_mode, nav_rate, buffer_size):
+        if gps_mode not in epoch_bytes:
+            raise ValueError('unknown gps mode {}'.format(gps_mode))
+
+        if bytes_per_sec(gps_mode, nav_rate) * 10 * 2 > link_baud(nav_rate):
+            raise ValueError('{} Hz needs more than half of the link'.format(nav_rate))
+
+        self._transport = transport
+        self._clock = clock
+        self._baud = link_baud(nav_rate)
+        self._epoch = epoch_bytes[gps_mode]
+        self._nmea = gps_mode != 'ubx'
+        self._levels = shed_levels(gps_mode, nav_rate)
+        self._window_high = 0
+        self._window_overruns = 0
+        self._errors = 0
+        self._bytes = 0
+        self._time = clock.monotonic()
+
+        self.buffer_size = buffer_size
+        self.level = 0
+        self.nav_rate = nav_rate
+        self.gga_every = 1
+        self.high_water = 0
+        self.overruns = 0
+        self.bytes_per_sec = 0.0
+        self.pressure = False
+
+    # BYTES WAITING JUST BEFORE THE GPS TASK DRAINS THE UART
+
+    def sample(self, waiting):
+        if waiting > self._window_high:
+            self._window_high = waiting
+
+        if waiting >= self.buffer_size:
+            self._window_overruns += 1
+
+    # CLOSE A MEASUREMENT WINDOW, errors IS THE PARSER'S RUNNING COUNT OF BAD SENTENCES / FRAMES.
+    # RETURNS TRUE WHEN THE NAVIGATION RATE HAS BEEN LOWERED (THE CALLER SENDS THE NEW CFG-RATE)
+
+    def update(self, errors):
+        now = self._clock.monotonic()
+        received = self._transport.bytes_in
+
+        if now > self._time:
+            self.bytes_per_sec = (received - self._bytes) / (now - self._time)
+
+        self._bytes = received
+        self._time = now
+
+        pressure = self._window_high * 4 > self.buffer_size * 3 or self._window_overruns or errors - self._errors >= 2
+        self.pressure = bool(pressure)
+        self.high_water = max(self.high_water, self._window_high)
+        self.overruns += self._window_overruns
+        self._window_high = 0
+        self._window_overruns = 0
+        self._errors = errors
+
+        if not pressure or self.level + 1 >= len(self._levels):
+            return False
+
+        self.level += 1
+        nav_rate, gga_every = self._levels[self.level]
+
+        if self._nmea and gga_every != self.gga_every:
+            self.gga_every = gga_every
+            self._transport.send(0x06, 0x01, bytes([msg_gga[0], msg_gga[1], 0x00, gga_every, 0x00, 0x00, 0x00, 0x00]))
+
+        if nav_rate == self.nav_rate:
+            return False
+
+        self.nav_rate = nav_rate
+        return True
+
+    # SPACE FOR extra MORE BYTES PER SECOND ARRIVING burst BYTES AT A TIME
+
+    def room(self, extra, burst):
+        if self.pressure or self.level:
+            return False
+
+        return (self.bytes_per_sec + extra) * 10 * 2 <= self._baud and self._epoch + burst <= self.buffer_size
+
+    def report(self):
+        return ['gps link {} Hz, gga every {}, {:.0f} bytes/s, buffer {} high water {}, overruns {}'.format(self.nav_rate, self.gga_every, self.bytes_per_sec, self.buffer_size, self.high_water, self.overruns)]
@@ -0,0 +1,214 @@
+# HAM RADIO GPS - MAGNETOMETER HARD / SOFT-IRON CALIBRATION
+#
+# WHILE THE DEVICE IS TURNED THROUGH A FULL CIRCLE THE X / Y READINGS TRACE AN ELLIPSE: ITS CENTER IS
+# THE HARD-IRON OFFSET, ITS STRETCH AND TILT ARE THE SOFT-IRON ERROR. ellipse_fit FITS THE CONIC
+#
+#   A x^2 + B xy + C y^2 + D x + E y = 1
+#
+# BY LEAST SQUARES. ONLY THE 20 RUNNING SUMS OF THE NORMAL EQUATIONS ARE KEPT, SO MEMORY DOES NOT GROW
+# WITH THE NUMBER OF SAMPLES. POINTS ARE SHIFTED BY A STARTING CENTER AND SCALED TO ROUGHLY UNIT SIZE
+# BEFORE THEY ARE SUMMED, WHICH KEEPS THE FOURTH POWERS WITHIN THE PRECISION OF CIRCUITPYTHON FLOATS.
+#
+# solve() RETURNS THE CENTER (offset_x, offset_y) AND A 2X2 MATRIX THAT MAPS THE ELLIPSE ONTO A CIRCLE
+# OF THE SAME AREA, heading APPLIES BOTH TO EVERY SAMPLE.
+#
+# THE RESULT IS STORED IN microcontroller.nvm: MAGIC, VERSION, SIX FLOATS AND A 16 BIT SUM OF THE BYTES.
+
+import math
+import struct
+
+from hamgps.compass import atan2_centidegrees
+
+nvm_offset = 0
+nvm_magic = b'MAGC'
+nvm_version = 1
+nvm_format = '<4sB6fH'
+nvm_size = struct.calcsize(nvm_format)
+
+# SECTORS OF THE CIRCLE THAT MUST HAVE SAMPLES BEFORE A FIT IS ACCEPTED
+coverage_sectors = 16
+full_coverage = (1 << coverage_sectors) - 1
+
+
+def nvm_sum(data):
+    total = 0
+
+    for byte in data:
+        total += byte
+
+    return total & 0xFFFF
+
+
+# CALIBRATION STORED IN NVM AS (offset_x, offset_y, (m00, m01, m10, m11)), NONE IF MISSING OR CORRUPT
+
+
+def load(nvm):
+    if nvm is None or len(nvm) < nvm_offset + nvm_size:
+        return None
+
+    data = bytes(nvm[nvm_offset:nvm_offset + nvm_size])
+    magic, version, offset_x, offset_y, m00, m01, m10, m11, checksum = struct.unpack(nvm_format, data)
+
+    if magic != nvm_magic or version != nvm_version or checksum != nvm_sum(data[:-2]):
+        return None
+
+    return offset_x, offset_y, (m00, m01, m10, m11)
+
+
+def save(nvm, offset_x, offset_y, matrix):
+    data = struct.pack(nvm_format[:-1], nvm_magic, nvm_version, offset_x, offset_y, matrix[0], matrix[1], matrix[2], matrix[3])
+    nvm[nvm_offset:nvm_offset + nvm_size] = data + struct.pack('<H', nvm_sum(data))
+
+
+def erase(nvm):
+    nvm[nvm_offset:nvm_offset + nvm_size] = bytes(nvm_size)
+
+
+# SOLVE a x = b IN PLACE BY GAUSSIAN ELIMINATION WITH PARTIAL PIVOTING, NONE IF SINGULAR
+
+
+def solve_linear(a, b):
+    size = len(b)
+
+    for col in range(size):
+        pivot = col
+
+        for row in range(col + 1, size):
+            if abs(a[row][col]) > abs(a[pivot][col]):
+                pivot = row
+
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+
+        a[col], a[pivot] = a[pivot], a[col]
+        b[col], b[pivot] = b[pivot], b[col]
+
+        for row in range(col + 1, size):
+            factor = a[row][col] / a[col][col]
+
+            for k in range(col, size):
+                a[row][k] -= factor * a[col][k]
+
+            b[row] -= factor * b[col]
+
+    x = [0.0] * size
+
+    for row in range(size - 1, -1, -1):
+        total = b[row]
+
+        for k in range(row + 1, size):
+            total -= a[row][k] * x[k]
+
+        x[row] = total / a[row][row]
+
+    return x
+
+
+class ellipse_fit:
+    def __init__(self, center_x=0.0, center_y=0.0, scale=50.0):
+        self._center_x = center_x
+        self._center_y = center_y
+        self._scale = scale
+
+        # SUMS OF x^i y^j FOR i + j <= 4 (NORMAL EQUATIONS) AND i + j <= 2 (RIGHT HAND SIDE)
+        self._xxxx = self._xxxy = self._xxyy = self._xyyy = self._yyyy = 0.0
+        self._xxx = self._xxy = self._xyy = self._yyy = 0.0
+        self._xx = self._xy = self._yy = self._x = self._y = 0.0
+
+        self.count = 0
+        self.coverage = 0
+
+    def add(self, x_axis, y_axis):
+        x = (x_axis - self._center_x) / self._scale
+        y = (y_axis - self._center_y) / self._scale
+
+        xx = x * x
+        xy = x * y
+        yy = y * y
+
+        self._xxxx += xx * xx
+        self._xxxy += xx * xy
+        self._xxyy += xx * yy
+        self._xyyy += xy * yy
+        self._yyyy += yy * yy
+        self._xxx += xx * x
+        self._xxy += xx * y
+        self._xyy += x * yy
+        self._yyy += yy * y
+        self._xx += xx
+        self._xy += xy
+        self._yy += yy
+        self._x += x
+        self._y += y
+
+        # COVERAGE IS MEASURED AROUND THE MEAN OF THE POINTS SO FAR, WHICH CLOSES ON THE CENTER AS THE
+        # DEVICE IS TURNED EVEN WHEN THE STARTING CENTER IS WELL OFF
+        self.count += 1
+        angle = atan2_centidegrees(y - self._y / self.count, x - self._x / self.count)
+
+        if angle >= 0:
+            self.coverage |= 1 << (angle * coverage_sectors // 36000)
+
+    @property
+    def sectors(self):
+        count = 0
+        bits = self.coverage
+
+        while bits:
+            count += bits & 1
+            bits >>= 1
+
+        return count
+
+    # (offset_x, offset_y, (m00, m01, m10, m11)) IN THE UNITS GIVEN TO add(), NONE IF THE POINTS ARE NOT
+    # AN ELLIPSE (TOO FEW, NOT TURNED ALL THE WAY ROUND, OR A DEGENERATE FIT)
+
+    def solve(self):
+        if self.count < 10 or self.coverage != full_coverage:
+            return None
+
+        # ROW k OF THE NORMAL EQUATIONS IS SUM(m_k * m) WITH m = (xx, xy, yy, x, y)
+        normal = [
+            [self._xxxx, self._xxxy, self._xxyy, self._xxx, self._xxy],
+            [self._xxxy, self._xxyy, self._xyyy, self._xxy, self._xyy],
+            [self._xxyy, self._xyyy, self._yyyy, self._xyy, self._yyy],
+            [self._xxx, self._xxy, self._xyy, self._xx, self._xy],
+            [self._xxy, self._xyy, self._yyy, self._xy, self._yy],
+        ]
+        rhs = [self._xx, self._xy, self._yy, self._x, self._y]
+        conic = solve_linear(normal, rhs)
+
+        if conic is None:
+            return None
+
+        a, b, c, d, e = conic
+        det = 4 * a * c - b * b
+
+        # ELLIPSE ONLY (QUADRATIC PART DEFINITE)
+        if det <= 0:
+            return None
+
+        # CENTER: GRADIENT OF THE CONIC IS ZERO
+        center_x = (b * e - 2 * c * d) / det
+        center_y = (b * d - 2 * a * e) / det
+
+        # (p - center)' Q (p - center) = k WITH Q = [[a, b/2], [b/2, c]], Q / k IS POSITIVE DEFINITE FOR A
+        # REAL ELLIPSE (BOTH ARE NEGATIVE WHEN THE STARTING CENTER LIES OUTSIDE IT)
+        k = 1 + a * center_x * center_x + b * center_x * center_y + c * center_y * center_y
+
+        if k == 0 or a / k <= 0:
+            return None
+
+        q00 = a / k
+        q01 = b / 2 / k
+        q11 = c / k
+
+        # SYMMETRIC SQUARE ROOT OF Q MAPS THE ELLIPSE TO THE UNIT CIRCLE, SCALED BACK TO THE SAME AREA
+        root_det = math.sqrt(q00 * q11 - q01 * q01)
+        norm = math.sqrt(q00 + q11 + 2 * root_det)
+        radius = 1 / math.sqrt(root_det)
+        m00 = (q00 + root_det) / norm * radius
+        m01 = q01 / norm * radius
+        m11 = (q11 + root_det) / norm * radius
+
+        return (self._center_x + center_x * self._scale, self._center_y + center_y * self._scale, (m00, m01, m01, m11))
@@ -0,0 +1,168 @@
+# HAM RADIO GPS - MAGNETOMETER SAMPLER AND HEADING FILTER
+#
+# sample() IS CALLED FROM A TASK AT A FIXED RATE. EACH READING IS STORED IN TENTHS OF A MICROTESLA IN
+# PREALLOCATED array('h') RING BUFFERS, NOTHING IS ALLOCATED PER SAMPLE:
+#
+# - MEDIAN: EACH AXIS IS THE MEDIAN OF THE LAST median_length READINGS, A SINGLE SPIKE NEVER GETS THROUGH
+# - CIRCULAR MEAN: THE DESPIKED X / Y VECTORS OF THE LAST filter_length SAMPLES ARE SUMMED (RUNNING
+#   SUMS, ONE ADD AND ONE SUBTRACT PER SAMPLE), THE HEADING OF THE SUM IS THE CIRCULAR MEAN HEADING
+# - HYSTERESIS: THE DISPLAYED POINT ONLY MOVES ONCE THE HEADING IS hysteresis DEGREES PAST THE SECTOR EDGE
+#
+# THE HEADING IS FILTERED OVER filter_length / sample_rate SECONDS, LONGER IS STEADIER BUT LAGS MORE.
+#
+# SAMPLE TIMING IS CHECKED AGAINST THE SCHEDULE: SLOTS THAT PASSED WITH NO SAMPLE AT ALL ARE DROPPED, A
+# SAMPLE MORE THAN HALF AN INTERVAL AFTER ITS SLOT IS LATE.
+
+from array import array
+
+from hamgps.compass import comp_point, full_turn, sector, sector_half, sector_size
+
+# READINGS ARE STORED IN TENTHS OF A MICROTESLA, HEADING OFFSETS MUST USE THE SAME SCALE
+mag_scale = 10
+
+# LSM303DLH OUTPUT DATA RATES (HZ, CRA_REG_M DO BITS)
+mag_rates = ((0.75, 0), (1.5, 1), (3.0, 2), (7.5, 3), (15.0, 4), (30.0, 5), (75.0, 6), (220.0, 7))
+
+
+# SLOWEST OUTPUT DATA RATE AT OR ABOVE THE SAMPLE RATE
+
+
+def mag_rate_code(sample_rate):
+    for rate, code in mag_rates:
+        if rate >= sample_rate:
+            return code
+
+    return mag_rates[-1][1]
+
+
+def median(values, scratch, count):
+    for i in range(count):
+        value = values[i]
+        j = i
+
+        while j and scratch[j - 1] > value:
+            scratch[j] = scratch[j - 1]
+            j -= 1
+
+        scratch[j] = value
+
+    return scratch[count // 2]
+
+
+class mag_sampler:
+    def __init__(self, device, comp_heading, sample_rate=15, filter_length=8, median_length=3, hysteresis=3):
+        self._device = device
+        self._heading = comp_heading
+        self._interval = 1 / sample_rate
+        self._hysteresis = int(hysteresis * 100)
+
+        device.mag_rate = mag_rate_code(sample_rate)
+
+        self._median_length = median_length
+        self._raw_x = array('h', [0] * median_length)
+        self._raw_y = array('h', [0] * median_length)
+        self._scratch = array('h', [0] * median_length)
+        self._raw_pos = 0
+        self._raw_count = 0
+
+        self._filter_length = filter_length
+        self._filtered_x = array('h', [0] * filter_length)
+        self._filtered_y = array('h', [0] * filter_length)
+        self._filter_pos = 0
+        self._filter_count = 0
+        self._sum_x = 0
+        self._sum_y = 0
+
+        self._next = None
+        self._sector = -1
+
+        self.samples = 0
+        self.late = 0
+        self.dropped = 0
+
+    def sample(self, now):
+        interval = self._interval
+
+        if self._next is None:
+            self._next = now
+
+        behind = now - self._next
+
+        if behind >= interval:
+            missed = int(behind / interval)
+            self.dropped += missed
+            self._next += missed * interval
+            behind -= missed * interval
+
+        if behind >= interval / 2:
+            self.late += 1
+
+        self._next += interval
+
+        x, y, _ = self._device.magnetic
+        self.samples += 1
+
+        # MEDIAN OF THE LAST median_length READINGS
+        pos = self._raw_pos
+        self._raw_x[pos] = int(x * mag_scale)
+        self._raw_y[pos] = int(y * mag_scale)
+        self._raw_pos = (pos + 1) % self._median_length
+
+        if self._raw_count < self._median_length:
+            self._raw_count += 1
+
+        x = median(self._raw_x, self._scratch, self._raw_count) if self._raw_count == self._median_length else self._raw_x[pos]
+        y = median(self._raw_y, self._scratch, self._raw_count) if self._raw_count == self._median_length else self._raw_y[pos]
+
+        # RUNNING SUM OF THE LAST filter_length DESPIKED VECTORS
+        pos = self._filter_pos
+
+        if self._filter_count == self._filter_length:
+            self._sum_x -= self._filtered_x[pos]
+            self._sum_y -= self._filtered_y[pos]
+        else:
+            self._filter_count += 1
+
+        self._filtered_x[pos] = x
+        self._filtered_y[pos] = y
+        self._sum_x += x
+        self._sum_y += y
+        self._filter_pos = (pos + 1) % self._filter_length
+
+    # FILTERED HEADING IN HUNDREDTHS OF A DEGREE, -1 BEFORE THE FIRST SAMPLE OR FOR A ZERO VECTOR
+
+    @property
+    def centidegrees(self):
+        count = self._filter_count
+
+        if not count:
+            return -1
+
+        return self._heading.centidegrees(self._sum_x / count, self._sum_y / count)
+
+    # COMPASS POINT WITH HYSTERESIS AT THE SECTOR EDGES
+
+    @property
+    def direction(self):
+        angle = self.centidegrees
+
+        if angle < 0:
+            self._sector = -1
+            return '---'
+
+        new_sector = sector(angle)
+
+        if self._sector >= 0 and new_sector != self._sector:
+            offset = (angle - self._sector * sector_size) % full_turn
+
+            if offset > full_turn // 2:
+                offset = full_turn - offset
+
+            if offset <= sector_half + self._hysteresis:
+                new_sector = self._sector
+
+        self._sector = new_sector
+        return comp_point[new_sector]
+
+    def report(self):
+        return ['compass samples {}, late {}, dropped {}'.format(self.samples, self.late, self.dropped)]
@@ -0,0 +1,450 @@
+# HAM RADIO GPS - STREAMING NMEA PARSER
+#
+# REPLACES adafruit_gps.GPS FOR THE RMC AND GGA SENTENCES CODE.PY KEEPS ENABLED, WITHOUT ALLOCATING:
+#
+# - UART BYTES ARE READ WITH readinto() INTO A PREALLOCATED RECEIVE BUFFER (THE UART TIMEOUT IS SET TO
+#   ZERO SO A READ RETURNS WHAT HAS ARRIVED INSTEAD OF WAITING TO FILL THE BUFFER)
+# - SENTENCES ARE FOUND ONE BYTE AT A TIME AND COPIED INTO A PREALLOCATED LINE BUFFER, SO A SENTENCE
+#   SPLIT ACROSS TWO READS NEEDS NO JOINING. THE XOR CHECKSUM IS KEPT AS THE BYTES ARE COPIED AND
+#   COMPARED WITH THE *hh SUFFIX, FIELD BOUNDARIES ARE RECORDED IN A PREALLOCATED ARRAY
+# - ONLY THE FIELDS THE DISPLAY USES ARE DECODED, AS SCALED INTEGERS, INTO A PREALLOCATED array SLOT
+#   TABLE. NOTHING IS SPLIT, SLICED OR CONVERTED TO str / float WHILE PARSING
+#
+# THE ATTRIBUTES CODE.PY READS (latitude, longitude, altitude_m, speed_knots, track_angle_deg,
+# satellites, timestamp_utc, has_fix) ARE PROPERTIES THAT SCALE THE SLOTS WHEN READ. timestamp_utc IS
+# BUILT ONCE PER NEW TIME AND CACHED, AS rtc.set_time_source() READS IT ON EVERY time.time() CALL.
+#
+# FOR timesync.py EVERY BYTE READ IS COUNTED IN bytes_read. A VALID RMC (THE FIRST SENTENCE OF EACH
+# EPOCH) BUMPS time_mark AND KEEPS WHERE IN THAT COUNT ITS CHECKSUM ENDED (time_pos), ITS LENGTH FROM THE
+# $ (time_len) AND THE FRACTION OF THE SECOND IN ITS TIME FIELD (time_nanos).
+
+import time
+
+from array import array
+
+# RECEIVE BUFFER AND LONGEST NMEA SENTENCE ($ TO *, NMEA 0183 ALLOWS 82 CHARACTERS INCLUDING CR LF)
+rx_size = 128
+line_size = 88
+max_fields = 24
+
+# SLOT INDEXES
+slot_lat = 0        # MICRODEGREES
+slot_lon = 1        # MICRODEGREES
+slot_alt = 2        # DECIMETERS
+slot_speed = 3      # 1/1000 KNOT
+slot_track = 4      # 1/100 DEGREE
+slot_sats = 5
+slot_year = 6
+slot_month = 7
+slot_day = 8
+slot_hour = 9
+slot_minute = 10
+slot_second = 11
+slot_quality = 12
+slot_valid = 13     # VALID_* BITS
+slot_count = 14
+
+valid_pos = 0x01
+valid_alt = 0x02
+valid_speed = 0x04
+valid_track = 0x08
+valid_sats = 0x10
+valid_date = 0x20
+valid_time = 0x40
+
+# PARSER STATES
+state_idle = 0
+state_body = 1
+state_cs_hi = 2
+state_cs_lo = 3
+
+# FIELD VALUE FOR AN EMPTY OR MALFORMED FIELD
+no_value = -1
+
+
+def hex_value(byte):
+    if 48 <= byte <= 57:
+        return byte - 48
+
+    if 65 <= byte <= 70:
+        return byte - 55
+
+    if 97 <= byte <= 102:
+        return byte - 87
+
+    return -1
+
+
+class nmea_reader:
+    def __init__(self, uart):
+        self._uart = uart
+        uart.timeout = 0
+
+        self._rx = bytearray(rx_size)
+        self._line = bytearray(line_size)
+        self._commas = array('H', [0] * max_fields)
+        self._slots = array('l', [0] * slot_count)
+
+        self._state = state_idle
+        self._length = 0
+        self._fields = 0
+        self._checksum = 0
+        self._cs_hi = 0
+        self._updated = False
+
+        self._time_key = -1
+        self._timestamp = time.struct_time((0, 0, 0, 0, 0, 0, 0, 0, -1))
+
+        self.sentences = 0
+        self.bad_checksums = 0
+        self.overlong = 0
+
+        self._pos = 0
+        self.bytes_read = 0
+        self.time_mark = 0
+        self.time_pos = 0
+        self.time_len = 0
+        self.time_nanos = 0
+
+    # READ EVERYTHING WAITING ON THE UART, RETURNS TRUE IF AN RMC OR GGA SENTENCE WAS DECODED
+
+    def update(self):
+        uart = self._uart
+        rx = self._rx
+        self._updated = False
+
+        while True:
+            count = uart.readinto(rx)
+
+            if not count:
+                break
+
+            self._scan(count)
+            self.bytes_read += count
+
+            if count < rx_size:
+                break
+
+        return self._updated
+
+    def _scan(self, count):
+        rx = self._rx
+        line = self._line
+        commas = self._commas
+        state = self._state
+        length = self._length
+        fields = self._fields
+        checksum = self._checksum
+        i = 0
+
+        while i < count:
+            byte = rx[i]
+            i += 1
+
+            if byte == 36:
+                state = state_body
+                length = 0
+                fields = 0
+                checksum = 0
+            elif state == state_body:
+                if byte == 42:
+                    state = state_cs_hi
+                elif byte < 32 or length >= line_size:
+                    if length >= line_size:
+                        self.overlong += 1
+
+                    state = state_idle
+                else:
+                    line[length] = byte
+                    checksum ^= byte
+
+                    if byte == 44 and fields < max_fields:
+                        commas[fields] = length
+                        fields += 1
+
+                    length += 1
+            elif state == state_cs_hi:
+                self._cs_hi = hex_value(byte)
+                state = state_cs_lo
+            elif state == state_cs_lo:
+                state = state_idle
+
+                if self._cs_hi < 0 or (self._cs_hi << 4 | hex_value(byte)) != checksum:
+                    self.bad_checksums += 1
+                else:
+                    self._length = length
+                    self._fields = fields
+                    self._pos = i
+                    self._sentence()
+
+        self._state = state
+        self._length = length
+        self._fields = fields
+        self._checksum = checksum
+
+    # SENTENCE TYPE IS AFTER THE TWO CHARACTER TALKER ID (GP, GN, GL ...)
+
+    def _sentence(self):
+        line = self._line
+
+        if self._fields < 1 or self._commas[0] != 5:
+            return
+
+        self.sentences += 1
+
+        if line[2] == 82 and line[3] == 77 and line[4] == 67:
+            self._rmc()
+        elif line[2] == 71 and line[3] == 71 and line[4] == 65:
+            self._gga()
+
+    # START AND END (EXCLUSIVE) OF FIELD n, FIELD 0 IS THE SENTENCE TYPE
+
+    def _start(self, n):
+        return self._commas[n - 1] + 1
+
+    def _end(self, n):
+        if n < self._fields:
+            return self._commas[n]
+
+        return self._length
+
+    # UNSIGNED INTEGER VALUE OF line[start:end] SCALED BY 10 ** decimals, EXTRA DECIMALS ARE TRUNCATED
+
+    def _fixed(self, start, end, decimals):
+        line = self._line
+        value = 0
+        seen = False
+        places = -1
+
+        while start < end:
+            byte = line[start]
+            start += 1
+
+            if 48 <= byte <= 57:
+                if places >= decimals:
+                    continue
+
+                value = value * 10 + byte - 48
+                seen = True
+
+                if places >= 0:
+                    places += 1
+            elif byte == 46 and places < 0:
+                places = 0
+            else:
+                return no_value
+
+        if not seen:
+            return no_value
+
+        if places < 0:
+            places = 0
+
+        while places < decimals:
+            value *= 10
+            places += 1
+
+        return value
+
+    def _two_digits(self, pos):
+        line = self._line
+        return (line[pos] - 48) * 10 + line[pos + 1] - 48
+
+    # LATITUDE / LONGITUDE FIELD ddmm.mmmmm / dddmm.mmmmm PLUS HEMISPHERE FIELD, IN MICRODEGREES
+
+    def _degrees(self, n, degree_digits, negative):
+        start = self._start(n)
+        end = self._end(n)
+
+        if end - start < degree_digits + 2 or self._end(n + 1) <= self._start(n + 1):
+            return None
+
+        degrees = self._fixed(start, start + degree_digits, 0)
+        minutes = self._fixed(start + degree_digits, end, 5)
+
+        if degrees < 0 or minutes < 0:
+            return None
+
+        value = degrees * 1000000 + (minutes * 10 + 30) // 60
+
+        if self._line[self._start(n + 1)] == negative:
+            value = -value
+
+        return value
+
+    def _time(self, n):
+        start = self._start(n)
+
+        if self._end(n) - start < 6:
+            return False
+
+        slots = self._slots
+        slots[slot_hour] = self._two_digits(start)
+        slots[slot_minute] = self._two_digits(start + 2)
+        slots[slot_second] = self._two_digits(start + 4)
+        return True
+
+    # RMC - TIME, STATUS, LAT, N/S, LON, E/W, SPEED, TRACK, DATE
+
+    def _rmc(self):
+        if self._fields < 9:
+            return
+
+        slots = self._slots
+        valid = slots[slot_valid]
+        timed = self._time(1)
+
+        if timed:
+            valid |= valid_time
+
+        start = self._start(9)
+        dated = self._end(9) - start >= 6
+
+        if dated:
+            slots[slot_day] = self._two_digits(start)
+            slots[slot_month] = self._two_digits(start + 2)
+            slots[slot_year] = 2000 + self._two_digits(start + 4)
+            valid |= valid_date
+
+        if self._end(2) > self._start(2) and self._line[self._start(2)] == 65:
+            if slots[slot_quality] == 0:
+                slots[slot_quality] = 1
+        else:
+            slots[slot_quality] = 0
+
+        lat = self._degrees(3, 2, 83)
+        lon = self._degrees(5, 3, 87)
+
+        if lat is not None and lon is not None:
+            slots[slot_lat] = lat
+            slots[slot_lon] = lon
+            valid |= valid_pos
+
+        speed = self._fixed(self._start(7), self._end(7), 3)
+
+        if speed >= 0:
+            slots[slot_speed] = speed
+            valid |= valid_speed
+
+        track = self._fixed(self._start(8), self._end(8), 2)
+
+        if track >= 0:
+            slots[slot_track] = track
+            valid |= valid_track
+
+        slots[slot_valid] = valid
+        self._updated = True
+
+        # A VALID RMC WITH ITS DATE AND TIME MARKS THE EPOCH FOR timesync.py, FRACTION FROM ss.ss
+        if slots[slot_quality] and timed and dated:
+            millis = self._fixed(self._start(1) + 4, self._end(1), 3)
+            self.time_mark += 1
+            self.time_pos = self.bytes_read + self._pos
+            self.time_len = self._length + 4
+            self.time_nanos = millis % 1000 * 1000000 if millis > 0 else 0
+
+    # GGA - TIME, LAT, N/S, LON, E/W, QUALITY, SATELLITES, HDOP, ALTITUDE
+
+    def _gga(self):
+        if self._fields < 10:
+            return
+
+        slots = self._slots
+        valid = slots[slot_valid]
+
+        if self._time(1):
+            valid |= valid_time
+
+        lat = self._degrees(2, 2, 83)
+        lon = self._degrees(4, 3, 87)
+
+        if lat is not None and lon is not None:
+            slots[slot_lat] = lat
+            slots[slot_lon] = lon
+            valid |= valid_pos
+
+        quality = self._fixed(self._start(6), self._end(6), 0)
+        slots[slot_quality] = quality if quality > 0 else 0
+
+        sats = self._fixed(self._start(7), self._end(7), 0)
+
+        if sats >= 0:
+            slots[slot_sats] = sats
+            valid |= valid_sats
+
+        start = self._start(9)
+        end = self._end(9)
+
+        if end > start:
+            negative = self._line[start] == 45
+            alt = self._fixed(start + negative, end, 1)
+
+            if alt >= 0:
+                slots[slot_alt] = -alt if negative else alt
+                valid |= valid_alt
+
+        slots[slot_valid] = valid
+        self._updated = True
+
+    def _slot(self, slot, flag, scale):
+        if self._slots[slot_valid] & flag:
+            return self._slots[slot] / scale
+
+        return None
+
+    @property
+    def has_fix(self):
+        return self._slots[slot_quality] >= 1
+
+    @property
+    def fix_quality(self):
+        return self._slots[slot_quality]
+
+    @property
+    def latitude(self):
+        return self._slot(slot_lat, valid_pos, 1000000)
+
+    @property
+    def longitude(self):
+        return self._slot(slot_lon, valid_pos, 1000000)
+
+    @property
+    def altitude_m(self):
+        return self._slot(slot_alt, valid_alt, 10)
+
+    @property
+    def speed_knots(self):
+        return self._slot(slot_speed, valid_speed, 1000)
+
+    @property
+    def track_angle_deg(self):
+        return self._slot(slot_track, valid_track, 100)
+
+    @property
+    def satellites(self):
+        if self._slots[slot_valid] & valid_sats:
+            return self._slots[slot_sats]
+
+        return None
+
+    # STRUCT_TIME IS REBUILT ONLY WHEN THE DATE OR TIME HAS CHANGED SINCE THE LAST READ
+
+    @property
+    def timestamp_utc(self):
+        slots = self._slots
+
+        if not slots[slot_valid] & valid_date:
+            return self._timestamp
+
+        key = ((slots[slot_day] * 24 + slots[slot_hour]) * 60 + slots[slot_minute]) * 60 + slots[slot_second]
+
+        if key != self._time_key:
+            self._time_key = key
+            self._timestamp = time.struct_time((slots[slot_year], slots[slot_month], slots[slot_day], slots[slot_hour], slots[slot_minute], slots[slot_second], 0, 0, -1))
+
+        return self._timestamp
+
+    # FOR rtc.set_time_source()
+    @property
+    def datetime(self):
+        return self.timestamp_utc
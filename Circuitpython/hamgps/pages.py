@@ -0,0 +1,79 @@
+# HAM RADIO GPS - PAGE MANAGER
+#
+# EACH PAGE IS ITS OWN GROUP, BUILT ONCE AT BOOT AND KEPT. ONLY THE VISIBLE PAGE IS ATTACHED TO THE
+# DISPLAY, SO A SWITCH IS ONE disp.show() AND A FULL SCREEN touch(), THE NEXT FRAME DRAWS THE NEW PAGE.
+# NOTHING IS BUILT OR FORMATTED DURING THE SWITCH ITSELF.
+#
+# THE TASKS THAT FILL A PAGE (ITS PRODUCERS) ASK active(name) BEFORE FORMATTING ANYTHING AND SKIP THE
+# WORK WHILE THE PAGE IS HIDDEN. A PRODUCER KEEPS THE LAST VALUES IT WROTE (fmt.number_field, THE CLOCK
+# ENGINE, last_* IN THE DISPLAY TASK), SO WHEN ITS PAGE IS SHOWN AGAIN IT ONLY REWRITES WHAT CHANGED WHILE
+# IT WAS HIDDEN.
+#
+# A PAGE CAN KEEP THE PRODUCERS OF OTHER PAGES RUNNING (runs), THE DEBUG PAGE DOES THIS FOR THE MAIN
+# SCREEN SO THE PROFILER STILL TIMES THE MAIN SCREEN PIPELINE. on_show(visible) IS CALLED WHEN A PAGE IS
+# SHOWN OR HIDDEN. PAGES ADDED WITH cycle=False (LOW BATTERY) ARE ONLY SHOWN BY NAME, step() SKIPS THEM.
+
+
+class page_manager:
+    def __init__(self, disp, frame):
+        self._disp = disp
+        self._frame = frame
+        self._pages = []
+        self._cycle = []
+        self._active = ()
+
+        self.name = None
+        self.switches = 0
+
+    def add(self, name, group, on_show=None, runs=(), cycle=True):
+        if self._find(name) is not None:
+            raise ValueError('page {} already added'.format(name))
+
+        self._pages.append((name, group, on_show, (name,) + tuple(runs)))
+
+        if cycle:
+            self._cycle.append(name)
+
+    # TRUE WHILE THE PRODUCERS OF PAGE name SHOULD RUN
+
+    def active(self, name):
+        return name in self._active
+
+    def show(self, name):
+        if name == self.name:
+            return
+
+        page = self._find(name)
+
+        if page is None:
+            raise ValueError('unknown page {}'.format(name))
+
+        old = self._find(self.name)
+        self._disp.show(page[1])
+        self._frame.touch(0, 0, self._disp.width, self._disp.height)
+
+        self.name = name
+        self._active = page[3]
+        self.switches += 1
+
+        if old is not None and old[2] is not None:
+            old[2](False)
+
+        if page[2] is not None:
+            page[2](True)
+
+    # NEXT (count > 0) OR PREVIOUS (count < 0) PAGE, WRAPPING AROUND
+
+    def step(self, count=1):
+        index = self._cycle.index(self.name) if self.name in self._cycle else 0
+        self.show(self._cycle[(index + count) % len(self._cycle)])
+
+    def _find(self, name):
+        for page in self._pages:
+            if page[0] == name:
+                return page
+
+        return None
+
+    def report(self):
+        return ['pages {}, showing {}, {} switches'.format(len(self._pages), self.name, self.switches)]
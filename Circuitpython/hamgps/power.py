@@ -0,0 +1,176 @@
+# HAM RADIO GPS - POWER PROFILES AND RUNTIME ESTIMATE
+#
+# A PROFILE PICKS THREE THINGS:
+#
+# - RECEIVER POWER SAVE: CFG-PM2 (CYCLIC TRACKING, ONE UPDATE PER NAVIGATION PERIOD) FOLLOWED BY CFG-RXM
+#   POWER SAVE MODE, THE RF FRONT END IS ONLY ON FOR SHORT BURSTS ONCE THE RECEIVER IS TRACKING
+# - NAVIGATION PERIOD WHEN STATIONARY (CFG-RATE), WHEN MOVING IT IS THE LINK RATE (SEE link.py).
+#   STATIONARY MEANS SLOWER THAN stationary_knots FOR stationary_secs, FASTER THAN moving_knots SWITCHES
+#   BACK STRAIGHT AWAY
+# - MCU LIGHT SLEEP BETWEEN SCHEDULED TASKS (SEE scheduler.py)
+#
+# COMMANDS ARE QUEUED ON THE UBX TRANSPORT, NOTHING HERE WAITS FOR THE RECEIVER.
+#
+# THE BACKLIGHT IS DIMMED AFTER dim_after SECONDS WITHOUT A BUTTON PRESS.
+#
+# bat_level TURNS THE BATTERY ADC READING INTO A PERCENTAGE.
+#
+# CURRENT DRAW IS ESTIMATED FROM ROUGH PER-PART FIGURES (mA AT THE BATTERY, BELOW), THE BACKLIGHT DUTY
+# CYCLE AND THE MEASURED SHARE OF TIME THE MCU SPENT IN LIGHT SLEEP. WITH THE DEFAULT PROFILE AND HALF
+# BRIGHTNESS IT COMES TO ~125 mA, THE 29 HOURS MEASURED ON THE 3,600 MAH CELL.
+
+import struct
+
+# PROFILE: RECEIVER POWER SAVE, NAVIGATION PERIOD WHEN STATIONARY IN MS (0 = SAME AS MOVING), MCU LIGHT
+# SLEEP
+power_profiles = {
+    'normal': (False, 0, False),
+    'saver': (False, 5000, True),
+    'max': (True, 10000, True),
+}
+
+# ESTIMATED CURRENT IN mA
+gps_continuous_ma = 45
+gps_tracking_ma = 30
+gps_backup_ma = 6
+mcu_run_ma = 22
+mcu_sleep_ma = 9
+display_ma = 12
+backlight_ma = 80
+board_ma = 6
+
+# CFG-PM2 FLAGS: UPDATE EPHEMERIS, CYCLIC TRACKING MODE
+pm2_flags = 0x00029000
+
+# SEARCH PERIOD WHEN THE RECEIVER HAS LOST ITS FIX IN POWER SAVE MODE, MS
+pm2_search_period = 10000
+
+
+# CYCLIC TRACKING UPDATES AT MOST ONCE A SECOND, FASTER NAVIGATION RATES STILL GET ONE UPDATE A SECOND
+
+
+def pm2_payload(period_ms):
+    return struct.pack('<BBBBIIIIHH20x', 0x01, 0x00, 0x00, 0x00, pm2_flags, max(period_ms, 1000), pm2_search_period, 0, 0, 0)
+
+
+# BATTERY PERCENTAGE FROM THE ADC VALUE, curve IS bat_curve IN CODE.PY
+
+
+def bat_level(adc_value, curve):
+    bat_percent = 0
+
+    for percent in range(10, 1, -1):
+        if adc_value <= curve[percent] and adc_value > curve[percent - 1]:
+            bat_percent = percent * 10
+            break
+
+    return bat_percent
+
+
+class power_manager:
+    def __init__(self, transport, clock, profile='normal', dim_after=0, capacity_mah=3600, period_ms=1000, stationary_knots=1.0, moving_knots=2.0, stationary_secs=60):
+        if profile not in power_profiles:
+            raise ValueError('unknown power profile {}'.format(profile))
+
+        self._transport = transport
+        self._clock = clock
+        self.power_save, self._stationary_ms, self.light_sleep = power_profiles[profile]
+        self.profile = profile
+        self._moving_ms = period_ms
+        self._stationary_ms = max(self._stationary_ms, period_ms)
+
+        self._dim_after = dim_after
+        self._capacity_mah = capacity_mah
+        self._stationary_knots = stationary_knots
+        self._moving_knots = moving_knots
+        self._stationary_secs = stationary_secs
+        self._slow_since = None
+
+        self.period_ms = 0
+        self.stationary = False
+        self.dimmed = False
+        self.last_activity = clock.monotonic()
+        self.rate_changes = 0
+        self.current_ma = 0.0
+
+        # CFG-RXM IS ALWAYS SENT, THE RECEIVER MAY STILL BE IN POWER SAVE FROM AN EARLIER PROFILE
+        self._set_period(self._moving_ms)
+        self._transport.send(0x06, 0x11, bytes([0x08, 0x01 if self.power_save else 0x00]))
+
+    def _set_period(self, period_ms):
+        self.period_ms = period_ms
+        self._transport.send(0x06, 0x08, struct.pack('<HHH', period_ms, 1, 1))
+
+        # IN POWER SAVE MODE THE RECEIVER UPDATES ONCE PER CFG-PM2 PERIOD, KEEP IT WITH THE NAVIGATION RATE
+        if self.power_save:
+            self._transport.send(0x06, 0x3B, pm2_payload(period_ms))
+
+    # NEW NAVIGATION PERIOD WHEN MOVING (THE LINK FELL BACK TO A LOWER RATE)
+
+    def set_moving_period(self, period_ms):
+        self._moving_ms = period_ms
+        self._stationary_ms = max(self._stationary_ms, period_ms)
+
+        if not self.stationary:
+            self.rate_changes += 1
+            self._set_period(period_ms)
+
+    # BUTTON PRESS, RETURNS TRUE IF THE BACKLIGHT WAS DIMMED (THE PRESS ONLY WAKES IT)
+
+    def activity(self, now):
+        self.last_activity = now
+
+        if self.dimmed:
+            self.dimmed = False
+            return True
+
+        return False
+
+    # CALLED ONCE A SECOND WITH THE CURRENT SPEED (NONE WITHOUT A FIX), RETURNS TRUE WHEN THE BACKLIGHT
+    # SHOULD BE DIMMED NOW
+
+    def update(self, now, speed_knots):
+        if speed_knots is not None:
+            if speed_knots >= self._moving_knots:
+                self._slow_since = None
+
+                if self.stationary:
+                    self.stationary = False
+                    self.rate_changes += 1
+                    self._set_period(self._moving_ms)
+            elif speed_knots < self._stationary_knots:
+                if self._slow_since is None:
+                    self._slow_since = now
+                elif not self.stationary and now - self._slow_since >= self._stationary_secs:
+                    self.stationary = True
+
+                    if self._stationary_ms != self._moving_ms:
+                        self.rate_changes += 1
+                        self._set_period(self._stationary_ms)
+
+        if self._dim_after and not self.dimmed and now - self.last_activity >= self._dim_after:
+            self.dimmed = True
+            return True
+
+        return False
+
+    # ESTIMATED HOURS LEFT FROM THE BATTERY PERCENTAGE, BACKLIGHT DUTY CYCLE (0 - 65535) AND SHARE OF TIME
+    # THE MCU SPENT IN LIGHT SLEEP, -1 UNTIL THE BATTERY HAS BEEN READ
+
+    def hours_remaining(self, bat_percent, backlight_duty, sleep_share):
+        if self.power_save:
+            # TRACKING BURSTS ONCE A SECOND, BACKUP CURRENT IN BETWEEN AT LONGER PERIODS
+            gps_ma = gps_backup_ma + (gps_tracking_ma - gps_backup_ma) * 1000 / max(self.period_ms, 1000)
+        else:
+            gps_ma = gps_continuous_ma
+
+        mcu_ma = mcu_run_ma * (1 - sleep_share) + mcu_sleep_ma * sleep_share
+        self.current_ma = gps_ma + mcu_ma + display_ma + backlight_ma * backlight_duty / 65535 + board_ma
+
+        if bat_percent < 0:
+            return -1
+
+        return self._capacity_mah * bat_percent / 100 / self.current_ma
+
+    def report(self):
+        return ['power {}, period {} ms{}, {:.1f} mA, {} rate changes'.format(self.profile, self.period_ms, ' (stationary)' if self.stationary else '', self.current_ma, self.rate_changes)]
@@ -0,0 +1,131 @@
+# HAM RADIO GPS - HOT PATH PROFILER
+#
+# STAGES ARE THE SCHEDULER TASKS NAMED IN task_names (THE GPS DRAIN, COMPASS SAMPLE, BATTERY READ), WHICH
+# THE SCHEDULER TIMES ON EVERY RUN ANYWAY, AND STAGES INSIDE A TASK (CLOCK ENGINE, LABEL WRITES, DISPLAY
+# REFRESH) TIMED WITH start() / stop().
+#
+# update() IS CALLED ONCE PER WINDOW (A SCHEDULER TASK). IT TURNS THE RUNS SINCE THE LAST CALL INTO MIN / MEAN / MAX MS
+# PER STAGE, THE LOOP RATE (RUNS OF loop_name PER SECOND), FRAMES PER SECOND, UART BYTES PER SECOND, GC
+# RUNS AND FREE HEAP (SEE heap.py) AND STARTS A NEW WINDOW. lines IS THE TEXT FOR THE DEBUG PAGE,
+# telemetry() IS THE SAME AS ONE COMPACT LINE FOR THE SERIAL CONSOLE.
+#
+# THE PROFILER IS ON WHILE THE DEBUG PAGE IS SHOWN OR SERIAL TELEMETRY IS ON. OFF, start() RETURNS 0,
+# stop() RETURNS STRAIGHT AWAY AND update() DOES NOTHING, WHAT IS LEFT IS A FEW COMPARES PER TASK RUN IN
+# THE SCHEDULER.
+
+from hamgps.scheduler import task_stats
+
+page_lines = 10
+
+
+class profiler:
+    def __init__(self, clock, tasks, transport, frame, heap, task_names, stage_names, loop_name='display', serial=False):
+        self._clock = clock
+        self._tasks = tasks
+        self._transport = transport
+        self._frame = frame
+        self._heap = heap
+        self._task_names = task_names
+        self._loop_name = loop_name
+
+        self._stages = None
+        self._loop = None
+        self._start_ns = 0
+        self._bytes = 0
+        self._frames = 0
+        self._collections = 0
+
+        self.sub_stages = [task_stats(name, 0) for name in stage_names]
+        self.page = False
+        self.serial = serial
+        self.enabled = serial
+        self.windows = 0
+        self.results = []
+        self.loop_hz = 0.0
+        self.frame_hz = 0.0
+        self.uart_rate = 0.0
+        self.gc_runs = 0
+        self.lines = [''] * page_lines
+
+    # STAGE TIMED OUTSIDE THE SCHEDULER, IN THE ORDER GIVEN BY stage_names
+
+    def stage(self, name):
+        for stats in self.sub_stages:
+            if stats.name == name:
+                return stats
+
+        raise ValueError('unknown profiler stage {}'.format(name))
+
+    def start(self):
+        return self._clock.monotonic_ns() if self.enabled else 0
+
+    def stop(self, stage, start):
+        if start:
+            stage.add(self._clock.monotonic_ns() - start)
+
+    # SHOW OR HIDE THE DEBUG PAGE, A NEW WINDOW STARTS WHEN THE PROFILER TURNS ON
+
+    def set_page(self, page):
+        self.page = page
+        enabled = page or self.serial
+
+        if enabled and not self.enabled:
+            self._new_window()
+
+        self.enabled = enabled
+
+    def _new_window(self):
+        if self._stages is None:
+            self._stages = [stats for name in self._task_names for stats in self._tasks.stats if stats.name == name] + self.sub_stages
+            self._loop = [stats for stats in self._tasks.stats if stats.name == self._loop_name]
+
+        for stats in self._stages + self._loop:
+            stats.reset_window()
+
+        self._start_ns = self._clock.monotonic_ns()
+        self._bytes = self._transport.bytes_in
+        self._frames = self._frame.frames
+        self._collections = self._heap.collections
+
+    # CLOSE THE WINDOW, RETURNS TRUE WHEN lines AND results ARE NEW
+
+    def update(self):
+        if not self.enabled:
+            return False
+
+        if self._stages is None:
+            self._new_window()
+            return False
+
+        elapsed = (self._clock.monotonic_ns() - self._start_ns) / 1000000000
+
+        if elapsed <= 0:
+            return False
+
+        self.results = [(stats.name, stats.window_runs, stats.window_min_ns / 1000000, stats.window_ns / stats.window_runs / 1000000 if stats.window_runs else 0, stats.window_max_ns / 1000000)
+                        for stats in self._stages]
+        self.loop_hz = self._loop[0].window_runs / elapsed if self._loop else 0
+        self.frame_hz = (self._frame.frames - self._frames) / elapsed
+        self.uart_rate = (self._transport.bytes_in - self._bytes) / elapsed
+        self.gc_runs = self._heap.collections - self._collections
+        self.windows += 1
+
+        lines = ['stage     min  mean   max']
+
+        for name, runs, low, mean, high in self.results:
+            lines.append('{:7s}{:6.2f}{:6.2f}{:6.2f}'.format(name, low, mean, high) if runs else '{:7s}     -     -     -'.format(name))
+
+        lines.append('loop {:5.1f} hz fps {:4.1f}'.format(self.loop_hz, self.frame_hz))
+        lines.append('uart {:6.0f} bytes/s'.format(self.uart_rate))
+        lines.append('heap {:6d} gc {:3d}'.format(self._heap.free, self.gc_runs) if self._heap.enabled else 'heap -')
+        self.lines = (lines + [''] * page_lines)[:page_lines]
+
+        self._new_window()
+        return True
+
+    # ONE LINE: prof STAGE=MIN/MEAN/MAX (MS, - WITHOUT RUNS) ... hz=LOOP fps=FRAMES uart=BYTES/S free=HEAP gc=RUNS
+
+    def telemetry(self):
+        stages = ' '.join('{}={:.2f}/{:.2f}/{:.2f}'.format(name, low, mean, high) if runs else '{}=-'.format(name) for name, runs, low, mean, high in self.results)
+        heap = 'free={} gc={}'.format(self._heap.free, self.gc_runs) if self._heap.enabled else 'free=- gc=-'
+        return 'prof {} hz={:.1f} fps={:.1f} uart={:.0f} {}'.format(stages, self.loop_hz, self.frame_hz, self.uart_rate, heap)
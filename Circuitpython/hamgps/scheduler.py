@@ -0,0 +1,175 @@
+# HAM RADIO GPS - COOPERATIVE TASK SCHEDULER
+#
+# RUNS EACH STEP FUNCTION AS ITS OWN ASYNCIO TASK AT ITS OWN RATE. A STEP MUST NOT BLOCK, IT DOES ONE
+# SLICE OF WORK AND RETURNS, THE TASK THEN SLEEPS UNTIL ITS NEXT DEADLINE SO THE OTHER TASKS CAN RUN.
+# DEADLINES ADVANCE BY A FIXED INTERVAL, A TASK THAT FALLS BEHIND SKIPS THE MISSED RUNS RATHER THAN
+# RUNNING BACK TO BACK TO CATCH UP. A STEP THAT HAS TO RUN AT AN EXACT TIME (THE CLOCK REPAINT ON THE GPS
+# SECOND, SEE timesync.py) RETURNS ITS NEXT DEADLINE AS A monotonic_ns() TIME INSTEAD OF None.
+#
+# EVERY RUN IS TIMED WITH clock.monotonic_ns(), task_stats KEEPS THE RUN COUNT, BUSY TIME, WORST RUN
+# AND HOW OFTEN THE TASK STARTED MORE THAN ONE INTERVAL LATE. IT ALSO KEEPS RUNS, BUSY TIME, BEST AND
+# WORST RUN SINCE THE LAST reset_window() FOR THE PROFILER (SEE profiler.py).
+#
+# WITH LIGHT SLEEP ON, A TASK THAT FINISHES LOOKS AT EVERY TASK'S NEXT DEADLINE. WHEN NOTHING IS DUE
+# FOR AT LEAST min_sleep SECONDS THE MCU LIGHT SLEEPS UNTIL JUST BEFORE THE EARLIEST ONE INSTEAD OF
+# IDLING IN THE EVENT LOOP.
+#
+# REQUIRES THE asyncio AND adafruit_ticks LIBRARIES FROM THE CIRCUITPYTHON BUNDLE IN /lib.
+
+import asyncio
+
+
+class task_stats:
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval_ns = int(interval * 1000000000)
+        self.runs = 0
+        self.busy_ns = 0
+        self.max_ns = 0
+        self.late = 0
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_runs = 0
+        self.window_ns = 0
+        self.window_min_ns = 0
+        self.window_max_ns = 0
+
+    # ONE TIMED RUN, FROM THE SCHEDULER OR A PROFILER STAGE TIMED OUTSIDE IT
+
+    def add(self, busy):
+        self.runs += 1
+        self.busy_ns += busy
+
+        if busy > self.max_ns:
+            self.max_ns = busy
+
+        if busy > self.window_max_ns:
+            self.window_max_ns = busy
+
+        if busy < self.window_min_ns or not self.window_runs:
+            self.window_min_ns = busy
+
+        self.window_runs += 1
+        self.window_ns += busy
+
+
+class scheduler:
+    def __init__(self, clock):
+        self._clock = clock
+        self._steps = []
+        self._start_ns = 0
+        self._deadlines = []
+        self._sleep = None
+        self._min_sleep_ns = 0
+        self._share_ns = 0
+        self._share_slept_ns = 0
+        self.stats = []
+        self.running = True
+        self.slept_ns = 0
+
+    # ADD A TASK THAT CALLS step() EVERY interval SECONDS (OR AT THE DEADLINE IT RETURNS), THE FIRST CALL
+    # IS delay SECONDS AFTER run()
+
+    def every(self, name, interval, step, delay=0):
+        self.stats.append(task_stats(name, interval))
+        self._steps.append((step, int(delay * 1000000000)))
+        self._deadlines.append(0)
+
+    def stop(self):
+        self.running = False
+
+    # light_sleep(secs) IS CALLED WHEN NO TASK IS DUE FOR min_sleep SECONDS, NONE TURNS IT OFF
+
+    def set_light_sleep(self, light_sleep, min_sleep=0.005):
+        self._sleep = light_sleep
+        self._min_sleep_ns = int(min_sleep * 1000000000)
+
+    # SHARE OF THE TIME SPENT IN LIGHT SLEEP SINCE THE LAST CALL
+
+    def sleep_share(self):
+        now = self._clock.monotonic_ns()
+        elapsed = now - self._share_ns
+        slept = self.slept_ns - self._share_slept_ns
+        self._share_ns = now
+        self._share_slept_ns = self.slept_ns
+        return slept / elapsed if elapsed > 0 else 0.0
+
+    def _light_sleep(self):
+        monotonic_ns = self._clock.monotonic_ns
+        start = monotonic_ns()
+        idle = min(self._deadlines) - start
+
+        if idle < self._min_sleep_ns:
+            return
+
+        # WAKE A LITTLE EARLY, THE EVENT LOOP STILL HAS TO RUN THE TASK
+        self._sleep((idle - self._min_sleep_ns // 2) / 1000000000)
+        self.slept_ns += monotonic_ns() - start
+
+    async def _periodic(self, index, stats, step, delay):
+        monotonic_ns = self._clock.monotonic_ns
+        interval = stats.interval_ns
+        deadline = monotonic_ns() + delay
+        self._deadlines[index] = deadline
+
+        if delay:
+            await asyncio.sleep(delay / 1000000000)
+
+        while self.running:
+            start = monotonic_ns()
+
+            if start - deadline > interval:
+                stats.late += 1
+
+            next_deadline = step()
+
+            stats.add(monotonic_ns() - start)
+
+            if next_deadline is not None:
+                deadline = next_deadline
+            else:
+                deadline += interval
+
+                if deadline < start:
+                    deadline = start + interval
+
+            self._deadlines[index] = deadline
+
+            if self._sleep is not None:
+                self._light_sleep()
+
+            wait = deadline - monotonic_ns()
+            await asyncio.sleep(wait / 1000000000 if wait > 0 else 0)
+
+    async def run(self):
+        self._start_ns = self._clock.monotonic_ns()
+        self._share_ns = self._start_ns
+        tasks = []
+
+        for i in range(len(self._steps)):
+            step, delay = self._steps[i]
+            tasks.append(asyncio.create_task(self._periodic(i, self.stats[i], step, delay)))
+
+        await asyncio.gather(*tasks)
+
+    # PER-TASK TIMING: RUNS, RUNS PER SECOND, MEAN AND WORST RUN IN MS, SHARE OF CPU, LATE STARTS
+
+    def report(self):
+        elapsed = self._clock.monotonic_ns() - self._start_ns
+        lines = ['task         runs    hz   mean ms   max ms   cpu %  late']
+
+        for stats in self.stats:
+            rate = stats.runs * 1000000000 / elapsed if elapsed else 0
+            mean = stats.busy_ns / stats.runs / 1000000 if stats.runs else 0
+            share = stats.busy_ns * 100 / elapsed if elapsed else 0
+            lines.append('{:10s} {:6d} {:5.1f} {:9.3f} {:8.3f} {:7.2f} {:5d}'.format(stats.name, stats.runs, rate, mean, stats.max_ns / 1000000, share, stats.late))
+
+        if self._sleep is not None:
+            lines.append('light sleep {:.1f} %'.format(self.slept_ns * 100 / elapsed if elapsed else 0))
+
+        return lines
+
+    def print_report(self):
+        for line in self.report():
+            print(line)
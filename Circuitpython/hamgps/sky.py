@@ -0,0 +1,358 @@
+# HAM RADIO GPS - SATELLITE SKY VIEW
+#
+# UBX NAV-SAT LISTS EVERY SATELLITE THE RECEIVER KNOWS ABOUT: GNSS, SV NUMBER, C/N0 (dBHz), ELEVATION,
+# AZIMUTH AND WHETHER IT IS USED IN THE FIX. IT IS POLLED THROUGH THE ubx_transport (NOT ENABLED AS A
+# PERIODIC MESSAGE), ONLY WHILE THE SKY PAGE IS SHOWN, SO IT COSTS NO SERIAL TRAFFIC THE REST OF THE TIME.
+#
+# nav_sat IS THE TRANSPORT'S SINK FOR THE RESPONSE: THE BYTES ARE DECODED AS THEY ARRIVE, 12 BYTES PER
+# SATELLITE, INTO PREALLOCATED arrays. THERE ARE TWO SETS, THE NEW FRAME FILLS THE SPARE SET AND THEY
+# ARE SWAPPED ONLY WHEN THE CHECKSUM IS GOOD, SO A BAD FRAME NEVER SHOWS. UP TO max_sats ARE KEPT.
+#
+# sky_page DRAWS A POLAR PLOT (ZENITH IN THE MIDDLE, HORIZON ON THE OUTER RING, NORTH UP) AND ONE C/N0 BAR
+# PER TRACKED SATELLITE. THE RINGS ARE DRAWN ONCE AT BOOT INTO THEIR OWN BITMAP, THE SATELLITES ARE SQUARES
+# ON A SECOND BITMAP ON TOP OF IT (INDEX 0 TRANSPARENT). update() ONLY ERASES AND REDRAWS THE SQUARES AND
+# BARS THAT CHANGED, SO displayio ONLY PUSHES THOSE PIXELS.
+
+import math
+
+from array import array
+
+nav_sat_class = 0x01
+nav_sat_id = 0x35
+
+# PAYLOAD HEADER (iTOW, VERSION, NUMBER OF SATELLITES, RESERVED) AND BYTES PER SATELLITE
+nav_sat_header = 8
+nav_sat_record = 12
+
+# FLAGS: SATELLITE USED FOR NAVIGATION
+flag_used = 0x08
+
+# C/N0 dBHz AT OR ABOVE WHICH A SATELLITE IS DRAWN AS MEDIUM / STRONG, AND AT WHICH A BAR IS FULL HEIGHT
+cno_medium = 25
+cno_strong = 35
+cno_full = 50
+
+# PLOT COLORS: RINGS, WEAK, MEDIUM, STRONG
+ring_color = 0x404040
+signal_colors = (0xFF0000, 0xFFFF00, 0x00FF00)
+
+
+# FRAME BYTES (SYNC, HEADER, PAYLOAD, CHECKSUM) OF A NAV-SAT RESPONSE LISTING sats SATELLITES
+
+
+def frame_len(sats):
+    return 8 + nav_sat_header + nav_sat_record * sats
+
+
+class nav_sat:
+    def __init__(self, max_sats=32):
+        self.max_sats = max_sats
+        self._spare = self._arrays()
+        self._record = bytearray(nav_sat_record)
+        self._check = bytearray(2)
+        self._length = 0
+        self._pos = 0
+        self._listed = 0
+        self._cs_a = 0
+        self._cs_b = 0
+
+        self.gnss, self.sv, self.cno, self.elev, self.azim, self.used = self._arrays()
+        self.count = 0
+        self.frames = 0
+        self.bad_frames = 0
+        self.frame_bytes = 0
+
+    def _arrays(self):
+        size = self.max_sats
+        return [array('B', [0] * size), array('B', [0] * size), array('B', [0] * size), array('b', [0] * size), array('h', [0] * size), array('B', [0] * size)]
+
+    # NEW RESPONSE, frame[2:6] IS CLASS, ID AND LENGTH. REFUSES A PAYLOAD THAT IS NOT WHOLE RECORDS
+
+    def start(self, frame, length):
+        if length < nav_sat_header or (length - nav_sat_header) % nav_sat_record:
+            return False
+
+        cs_a = 0
+        cs_b = 0
+
+        for i in range(2, 6):
+            cs_a = (cs_a + frame[i]) & 255
+            cs_b = (cs_b + cs_a) & 255
+
+        self._cs_a = cs_a
+        self._cs_b = cs_b
+        self._length = length
+        self._pos = 0
+        self._listed = (length - nav_sat_header) // nav_sat_record
+        return True
+
+    def feed(self, data, start, count):
+        length = self._length
+        record = self._record
+        pos = self._pos
+        cs_a = self._cs_a
+        cs_b = self._cs_b
+
+        for i in range(start, start + count):
+            byte = data[i]
+
+            if pos >= length:
+                self._check[pos - length] = byte
+                pos += 1
+                continue
+
+            cs_a = (cs_a + byte) & 255
+            cs_b = (cs_b + cs_a) & 255
+
+            if pos >= nav_sat_header:
+                offset = (pos - nav_sat_header) % nav_sat_record
+                record[offset] = byte
+
+                if offset == nav_sat_record - 1:
+                    self._store((pos - nav_sat_header) // nav_sat_record)
+
+            pos += 1
+
+        self._pos = pos
+        self._cs_a = cs_a
+        self._cs_b = cs_b
+
+    def _store(self, n):
+        if n >= self.max_sats:
+            return
+
+        record = self._record
+        gnss, sv, cno, elev, azim, used = self._spare
+        gnss[n] = record[0]
+        sv[n] = record[1]
+        cno[n] = record[2]
+        elev[n] = record[3] - 256 if record[3] > 127 else record[3]
+        value = record[4] | (record[5] << 8)
+        azim[n] = value - 65536 if value > 32767 else value
+        used[n] = 1 if record[8] & flag_used else 0
+
+    # END OF THE RESPONSE, THE NEW SET IS SHOWN IF THE CHECKSUM IS GOOD
+
+    def end(self):
+        if self._pos != self._length + 2 or self._check[0] != self._cs_a or self._check[1] != self._cs_b:
+            self.bad_frames += 1
+            return False
+
+        current = [self.gnss, self.sv, self.cno, self.elev, self.azim, self.used]
+        self.gnss, self.sv, self.cno, self.elev, self.azim, self.used = self._spare
+        self._spare = current
+        self.count = min(self._listed, self.max_sats)
+        self.frames += 1
+        self.frame_bytes = self._length + 8
+        return True
+
+    def report(self):
+        return ['nav-sat {} frames, {} bad, {} satellites, {} bytes'.format(self.frames, self.bad_frames, self.count, self.frame_bytes)]
+
+
+# 0 = NOT DRAWN, 1 - 3 = WEAK, MEDIUM, STRONG
+
+
+def signal_level(cno):
+    if not cno:
+        return 0
+
+    if cno >= cno_strong:
+        return 3
+
+    return 2 if cno >= cno_medium else 1
+
+
+class sky_page:
+    def __init__(self, layout, sats, color, plot_size=180, bar_step=8, dot_size=5):
+        disp = layout.disp
+        self._disp = disp
+        self._sats = sats
+        self._frames = -1
+        self._dot = dot_size
+
+        # TITLE ON THE FIRST ROW, PLOT AND BARS CENTERED IN WHAT IS LEFT BELOW IT
+        top = layout.y(1) - layout.char_height // 2
+        self._plot_x = (disp.width - plot_size - plot_size * 2 // 3) // 2
+        self._plot_y = top + (disp.height - top - plot_size) // 2
+        self._size = plot_size
+        self._radius = (plot_size - dot_size) // 2
+        self._bar_x = self._plot_x + plot_size + bar_step
+        self._bar_step = bar_step
+        self._bars = min(sats.max_sats, (disp.width - self._bar_x) // bar_step)
+
+        self.title = layout.label(' ' * 20, color, 0, 0, 0, 'sky_title')
+
+        self._rings, rings_grid = disp.bitmap(plot_size, plot_size, (0x000000, ring_color), self._plot_x, self._plot_y, name='sky_rings')
+        self._plot, plot_grid = disp.bitmap(plot_size, plot_size, (0x000000,) + signal_colors, self._plot_x, self._plot_y, True, 'sky_plot')
+        self._bar_map, bar_grid = disp.bitmap(self._bars * bar_step, plot_size, (0x000000,) + signal_colors, self._bar_x, self._plot_y, name='sky_bars')
+        self._draw_rings()
+
+        # WHAT IS DRAWN NOW: SQUARE POSITION (-1 = NONE) AND LEVEL PER SATELLITE, HEIGHT AND LEVEL PER BAR
+        self._dot_x = array('h', [-1] * sats.max_sats)
+        self._dot_y = array('h', [-1] * sats.max_sats)
+        self._dot_level = array('B', [0] * sats.max_sats)
+        self._dot_used = array('B', [0] * sats.max_sats)
+        self._changed = bytearray(sats.max_sats)
+        self._bar_height = array('h', [0] * self._bars)
+        self._bar_level = array('B', [0] * self._bars)
+
+        self.group = disp.group()
+
+        for element in (self.title, rings_grid, plot_grid, bar_grid):
+            self.group.append(element)
+
+    # HORIZON, 30 AND 60 DEGREE RINGS AND THE NORTH - SOUTH / EAST - WEST LINES, ONCE
+
+    def _draw_rings(self):
+        rings = self._rings
+        center = self._size // 2
+
+        for ring in (self._radius, self._radius * 2 // 3, self._radius // 3):
+            steps = max(8, int(ring * 2 * math.pi))
+
+            for i in range(steps):
+                angle = 2 * math.pi * i / steps
+                rings[center + int(round(ring * math.sin(angle))), center - int(round(ring * math.cos(angle)))] = 1
+
+        for i in range(center - self._radius, center + self._radius + 1):
+            rings[center, i] = 1
+            rings[i, center] = 1
+
+    # REDRAW WHAT CHANGED SINCE THE LAST RESPONSE, THE CHANGED AREAS ARE TOUCHED ON frame
+
+    def update(self, frame):
+        sats = self._sats
+
+        if sats.frames == self._frames:
+            return False
+
+        self._frames = sats.frames
+        count = sats.count
+        used = 0
+        tracked = 0
+
+        for i in range(count):
+            if sats.cno[i]:
+                tracked += 1
+
+            used += sats.used[i]
+
+        frame.text(self.title, 'Sky {:2d} sats {:2d} used'.format(tracked, used))
+        self._update_dots(frame, count)
+        self._update_bars(frame, count)
+        return True
+
+    def _update_dots(self, frame, count):
+        sats = self._sats
+        disp = self._disp
+        changed = self._changed
+        center = self._size // 2
+        dot = self._dot
+        erased = []
+
+        # ERASE EVERY SQUARE THAT MOVED, CHANGED OR WENT AWAY
+        for i in range(sats.max_sats):
+            x = y = -1
+            level = 0
+
+            if i < count and 0 <= sats.elev[i] <= 90:
+                level = signal_level(sats.cno[i])
+
+            if level:
+                distance = self._radius * (90 - sats.elev[i]) / 90
+                angle = math.radians(sats.azim[i])
+                x = center + int(distance * math.sin(angle)) - dot // 2
+                y = center - int(distance * math.cos(angle)) - dot // 2
+
+            old_x = self._dot_x[i]
+            old_y = self._dot_y[i]
+            changed[i] = old_x != x or old_y != y or self._dot_level[i] != level or (i < count and self._dot_used[i] != sats.used[i])
+
+            if not changed[i]:
+                continue
+
+            if old_x >= 0:
+                disp.fill(self._plot, old_x, old_y, old_x + dot, old_y + dot, 0)
+                frame.touch(self._plot_x + old_x, self._plot_y + old_y, dot, dot)
+                erased.append((old_x, old_y))
+
+            self._dot_x[i] = x
+            self._dot_y[i] = y
+            self._dot_level[i] = level
+            self._dot_used[i] = sats.used[i] if i < count else 0
+
+        # DRAW THE NEW SQUARES AND ANY OLD ONE AN ERASED SQUARE OVERLAPPED, USED SATELLITES ARE FILLED
+        for i in range(sats.max_sats):
+            x = self._dot_x[i]
+            y = self._dot_y[i]
+
+            if x < 0:
+                continue
+
+            if not changed[i]:
+                for old_x, old_y in erased:
+                    if abs(old_x - x) < dot and abs(old_y - y) < dot:
+                        changed[i] = 1
+                        break
+
+                if not changed[i]:
+                    continue
+
+            level = self._dot_level[i]
+
+            if self._dot_used[i]:
+                disp.fill(self._plot, x, y, x + dot, y + dot, level)
+            else:
+                disp.fill(self._plot, x, y, x + dot, y + 1, level)
+                disp.fill(self._plot, x, y + dot - 1, x + dot, y + dot, level)
+                disp.fill(self._plot, x, y, x + 1, y + dot, level)
+                disp.fill(self._plot, x + dot - 1, y, x + dot, y + dot, level)
+
+            frame.touch(self._plot_x + x, self._plot_y + y, dot, dot)
+
+    # ONE BAR PER TRACKED SATELLITE IN LIST ORDER, THE BARS LEFT OVER ARE EMPTIED
+
+    def _update_bars(self, frame, count):
+        sats = self._sats
+        bar = 0
+
+        for i in range(count):
+            if bar >= self._bars:
+                break
+
+            if sats.cno[i]:
+                self._draw_bar(frame, bar, sats.cno[i])
+                bar += 1
+
+        for bar in range(bar, self._bars):
+            self._draw_bar(frame, bar, 0)
+
+    # ONLY THE ROWS THAT CHANGED ARE WRITTEN, THE WHOLE BAR WHEN ITS COLOR CHANGED
+
+    def _draw_bar(self, frame, bar, cno):
+        disp = self._disp
+        bars = self._bar_map
+        size = self._size
+        width = self._bar_step - 2
+        height = min(cno, cno_full) * size // cno_full
+        level = signal_level(cno)
+        old_height = self._bar_height[bar]
+        x = bar * self._bar_step
+
+        if level != self._bar_level[bar]:
+            disp.fill(bars, x, size - old_height, x + width, size, 0)
+            disp.fill(bars, x, size - height, x + width, size, level)
+            top = size - max(height, old_height)
+        elif height > old_height:
+            disp.fill(bars, x, size - height, x + width, size - old_height, level)
+            top = size - height
+        elif height < old_height:
+            disp.fill(bars, x, size - old_height, x + width, size - height, 0)
+            top = size - old_height
+        else:
+            return
+
+        self._bar_height[bar] = height
+        self._bar_level[bar] = level
+        frame.touch(self._bar_x + x, self._plot_y + top, width, size - top)
@@ -0,0 +1,235 @@
+# HAM RADIO GPS - STARTUP SEQUENCER
+#
+# THE BN-880 KEEPS ITS PORT AND MESSAGE SETTINGS IN BATTERY BACKED RAM, SO AFTER A BATTERY SWAP IT IS
+# USUALLY STILL AT THE LINK BAUD RATE WITH ONLY THE WANTED MESSAGES ENABLED. gps_setup CHECKS THAT FIRST
+# AND ONLY SENDS WHAT IS MISSING:
+#
+# - PROBE:     OPEN THE UART AT THE LINK BAUD RATE (38400, 115200 FOR HIGH RATE NAVIGATION) AND POLL
+#              CFG-PRT, THEN AT 38400. NO ANSWER AT ALL MEANS THE RECEIVER IS AT 9600
+# - BAUD:      AT THE BAUD RATE FOUND SEND CFG-PRT (TWICE, LIKE BEFORE), THEN REOPEN THE UART AT THE LINK
+#              BAUD RATE
+# - CHECK:     POLL CFG-MSG FOR EACH MESSAGE AND COMPARE ITS UART1 RATE WITH THE WANTED RATE
+# - CONFIGURE: SET ONLY THE MESSAGES WHOSE RATE IS WRONG, WAIT FOR ACK-ACK
+#
+# COMMANDS GO THROUGH A ubx_transport, step() NEVER WAITS: IT LETS THE TRANSPORT SEND OR MATCH WHAT HAS
+# ARRIVED AND RETURNS, SO CODE.PY STEPS IT WHILE THE SPLASH IS SHOWN AND THE FONT LOADS. EACH REPLY HAS
+# A TIMEOUT AND A BOUNDED NUMBER OF TRIES, A RECEIVER THAT NEVER ANSWERS CANNOT HANG THE BOOT. THE
+# TRANSPORT IS THEN HANDED TO THE GPS READER IN PLACE OF THE UART.
+#
+# boot_timeline RECORDS HOW LONG EACH PHASE OF THE BOOT TOOK, PRINTED TO THE SERIAL CONSOLE.
+
+from hamgps.ubx import ubx_message, ubx_transport
+
+default_baud = 38400
+factory_baud = 9600
+
+# MESSAGE CLASS / ID
+msg_gga = (0xF0, 0x00)
+msg_gll = (0xF0, 0x01)
+msg_gsa = (0xF0, 0x02)
+msg_gsv = (0xF0, 0x03)
+msg_rmc = (0xF0, 0x04)
+msg_vtg = (0xF0, 0x05)
+msg_nav_pvt = (0x01, 0x07)
+msg_nav_sat = (0x01, 0x35)
+
+# SETUP STATES
+state_probe = 0
+state_baud = 1
+state_check = 2
+state_configure = 3
+state_done = 4
+
+
+# CFG-PRT FOR UART1: 8N1, baud, UBX + NMEA + RTCM IN, UBX + NMEA OUT
+
+
+def prt_payload(baud):
+    return bytes([0x01, 0x00, 0x00, 0x00, 0xD0, 0x08, 0x00, 0x00]) + baud.to_bytes(4, 'little') + bytes([0x07, 0x00, 0x03, 0x00, 0x00, 0x00, 0x00, 0x00])
+
+
+# (MESSAGE, UART1 RATE) FOR A GPS MODE
+# ENABLING MORE MESSAGES THAN NEEDED CAN CAUSE SERIAL BUFFER OVERRUNS AND DEVICE LOCKUPS
+# NAV-SAT IS ONLY EVER POLLED (SKY PAGE), ITS PERIODIC OUTPUT STAYS OFF
+
+
+def wanted_rates(gps_mode):
+    rates = [(msg_gll, 0), (msg_gsa, 0), (msg_gsv, 0), (msg_vtg, 0), (msg_nav_sat, 0)]
+
+    if gps_mode == 'ubx':
+        rates += [(msg_rmc, 0), (msg_gga, 0), (msg_nav_pvt, 1)]
+    else:
+        rates += [(msg_nav_pvt, 0), (msg_rmc, 1), (msg_gga, 1)]
+
+    return rates
+
+
+class gps_setup:
+    def __init__(self, gps_port, clock, gps_mode, baud=default_baud, buffer_size=256, reply_timeout=0.2, probe_tries=3, send_tries=4):
+        self._port = gps_port
+        self._clock = clock
+        self._rates = wanted_rates(gps_mode)
+        self._baud = baud
+        self._buffer_size = buffer_size
+        self._probe_tries = probe_tries
+        self._probe_bauds = [baud] if baud == default_baud else [baud, default_baud]
+        self._from_baud = factory_baud
+        self._state = state_probe
+        self._polls = []
+        self._sets = []
+        self._baud_writes = 0
+        self._baud_deadline = 0
+
+        self.transport = ubx_transport(self._open(baud), clock, reply_timeout, send_tries)
+        self._probe = self.transport.poll(0x06, 0x00, b'\x01', tries=probe_tries)
+        self.done = False
+        self.baud_changed = False
+        self.checked = 0
+        self.changed = 0
+        self.failed = 0
+
+    # ADVANCE THE SETUP AS FAR AS IT CAN GO WITHOUT WAITING, RETURNS TRUE ONCE IT IS FINISHED
+
+    def step(self):
+        if self.done:
+            return True
+
+        transport = self.transport
+        transport.service()
+
+        # NO READER IS RUNNING YET, THE NMEA TEXT THAT PASSED THROUGH IS NOT NEEDED
+        transport.discard()
+
+        if self._state == state_probe:
+            if not self._probe.done:
+                return False
+
+            probe_baud = self._probe_bauds.pop(0)
+
+            if self._probe.ok and probe_baud == self._baud:
+                self._check()
+            elif self._probe.ok:
+                self._from_baud = probe_baud
+                self._state = state_baud
+            elif self._probe_bauds:
+                transport.set_uart(self._open(self._probe_bauds[0]))
+                self._probe = transport.poll(0x06, 0x00, b'\x01', tries=self._probe_tries)
+                return False
+            else:
+                self._state = state_baud
+
+        if self._state == state_baud and not self._baud_change():
+            return False
+
+        if self._state == state_check:
+            if not self._polls[-1].done:
+                return False
+
+            for (key, rate), poll in zip(self._rates, self._polls):
+                if poll.ok:
+                    self.checked += 1
+
+                # NO ANSWER TO THE POLL, SET THE RATE ANYWAY
+                if not poll.ok or poll.payload[3] != rate:
+                    self._sets.append(transport.send(0x06, 0x01, bytes([key[0], key[1], 0x00, rate, 0x00, 0x00, 0x00, 0x00])))
+
+            self._state = state_configure
+
+        if self._sets and not self._sets[-1].done:
+            return False
+
+        for command in self._sets:
+            if command.ok:
+                self.changed += 1
+            else:
+                self.failed += 1
+
+        self._state = state_done
+        self.done = True
+        return True
+
+    # POLL EVERY MESSAGE RATE, THE TRANSPORT SENDS THEM ONE AFTER ANOTHER
+
+    def _check(self):
+        for key, rate in self._rates:
+            self._polls.append(self.transport.poll(0x06, 0x01, bytes(key)))
+
+        self._state = state_check
+
+    def _open(self, baud):
+        return self._port.open(baud, receiver_buffer_size=self._buffer_size)
+
+    # RECEIVER IS AT ANOTHER BAUD RATE: SEND CFG-PRT TWICE, THEN LISTEN AT THE LINK BAUD RATE ONCE IT HAS
+    # GONE OUT
+
+    def _baud_change(self):
+        now = self._clock.monotonic()
+
+        if self._baud_writes and now < self._baud_deadline:
+            return False
+
+        if self._baud_writes < 2:
+            if not self._baud_writes:
+                self.transport.set_uart(self._open(self._from_baud))
+
+            self.transport.write(ubx_message(0x06, 0x00, prt_payload(self._baud)))
+            self._baud_writes += 1
+            self._baud_deadline = now + 0.1
+            return False
+
+        self.transport.set_uart(self._open(self._baud))
+        self.baud_changed = True
+        self._check()
+        return True
+
+    def report(self):
+        if self.baud_changed:
+            port = 'baud set from {} to {}'.format(self._from_baud, self._baud)
+        else:
+            port = 'port at {}'.format(self._baud)
+
+        return ['gps setup {}, {} messages checked, {} set, {} failed'.format(port, self.checked, self.changed, self.failed)] + self.transport.report()
+
+
+# TIME SPENT IN EACH BOOT PHASE, MEASURED FROM start (monotonic() IS 0 AT POWER UP ON THE BOARD)
+# WITH heap ON, EACH MARK ALSO COLLECTS AND RECORDS THE FREE HEAP (NEEDS gc.mem_free, THE COLLECT ADDS
+# A FEW MS PER PHASE SO LEAVE IT OFF FOR TIMING)
+
+
+class boot_timeline:
+    def __init__(self, clock, start=0.0, heap=False):
+        self._clock = clock
+        self._start = start
+        self._last = start
+        self._gc = None
+        self.phases = []
+
+        if heap:
+            import gc
+
+            if hasattr(gc, 'mem_free'):
+                self._gc = gc
+
+    def mark(self, name):
+        free = None
+
+        if self._gc is not None:
+            self._gc.collect()
+            free = self._gc.mem_free()
+
+        now = self._clock.monotonic()
+        self.phases.append((name, now - self._last, free))
+        self._last = now
+
+    def report(self):
+        lines = []
+
+        for name, secs, free in self.phases:
+            lines.append('boot {:12s} {:6d} ms'.format(name, int(secs * 1000)) + ('' if free is None else ' {:7d} free'.format(free)))
+
+        lines.append('boot {:12s} {:6d} ms'.format('total', int((self._last - self._start) * 1000)))
+        return lines
+
+    def print_report(self):
+        for line in self.report():
+            print(line)
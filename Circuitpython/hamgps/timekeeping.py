@@ -0,0 +1,184 @@
+# HAM RADIO GPS - CLOCK ENGINE
+#
+# FORMATS UTC TIME, UTC DATE, TIMEZONE TIME AND TIMEZONE DATE FOR THE DISPLAY.
+#
+# update() DOES NOTHING UNTIL THE INTEGER SECOND CHANGES. WHEN IT MOVES FORWARD BY ONE SECOND THE
+# BROKEN DOWN UTC AND TIMEZONE FIELDS ARE STEPPED FORWARD (SECOND, MINUTE, HOUR, DAY, MONTH, YEAR CARRY)
+# INSTEAD OF BEING CONVERTED FROM EPOCH SECONDS AGAIN. ANY OTHER JUMP, OR A CHANGE OF OFFSET, FALLS BACK
+# TO time.localtime(). THE OFFSET COMES FROM A tzrules.time_zone, WHICH ONLY LOOKS IT UP AGAIN WHEN THE
+# TIME LEAVES THE INTERVAL OF THE LAST LOOKUP.
+#
+# update() RETURNS A BITMASK OF THE STRINGS THAT CHANGED, ONLY THOSE STRINGS ARE REBUILT. THE TWO CLOCKS
+# CHANGE EVERY SECOND, THEIR DIGITS ARE WRITTEN INTO THE utc_clock AND tz_clock bytearrays IN PLACE,
+# utc_time AND tz_time ONLY BUILD A str WHEN THEY ARE READ.
+
+import time
+
+from hamgps.fmt import put_two
+
+# ARRAYS FOR DAY AND MONTH TEXT
+day_text = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN')
+month_text = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+month_days = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# CHANGE BITS RETURNED BY update()
+changed_utc_time = 0x01
+changed_utc_date = 0x02
+changed_tz_time = 0x04
+changed_tz_date = 0x08
+changed_tz_desc = 0x10
+
+# BROKEN DOWN TIME FIELDS
+field_year = 0
+field_month = 1
+field_day = 2
+field_hour = 3
+field_minute = 4
+field_second = 5
+field_wday = 6
+
+# HOW FAR A ONE SECOND STEP CARRIED
+carry_time = 1
+carry_date = 2
+
+
+def days_in_month(year, month):
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+
+    return month_days[month - 1]
+
+
+def format_date(fields):
+    return '{} {} {:02d}, {}'.format(day_text[fields[field_wday]], month_text[fields[field_month] - 1], fields[field_day], fields[field_year])
+
+
+# HH:MM:SS INTO AN 8 BYTE BUFFER
+
+
+def put_time(buffer, fields):
+    put_two(buffer, 0, fields[field_hour])
+    put_two(buffer, 3, fields[field_minute])
+    put_two(buffer, 6, fields[field_second])
+
+
+# STEP BROKEN DOWN FIELDS FORWARD ONE SECOND
+
+
+def step_second(fields):
+    fields[field_second] += 1
+
+    if fields[field_second] < 60:
+        return carry_time
+
+    fields[field_second] = 0
+    fields[field_minute] += 1
+
+    if fields[field_minute] < 60:
+        return carry_time
+
+    fields[field_minute] = 0
+    fields[field_hour] += 1
+
+    if fields[field_hour] < 24:
+        return carry_time
+
+    fields[field_hour] = 0
+    fields[field_wday] = (fields[field_wday] + 1) % 7
+    fields[field_day] += 1
+
+    if fields[field_day] > days_in_month(fields[field_year], fields[field_month]):
+        fields[field_day] = 1
+        fields[field_month] += 1
+
+        if fields[field_month] > 12:
+            fields[field_month] = 1
+            fields[field_year] += 1
+
+    return carry_date
+
+
+def set_fields(fields, secs):
+    time_tuple = time.localtime(secs)
+
+    for i in range(7):
+        fields[i] = time_tuple[i]
+
+
+class clock_engine:
+    def __init__(self, zone):
+        self._zone = zone
+
+        self._secs = None
+        self._utc = [0] * 7
+        self._tz = [0] * 7
+        self._offset = None
+
+        self.dst_active = False
+        self.utc_clock = bytearray(b'00:00:00')
+        self.utc_date = ''
+        self.tz_clock = bytearray(b'00:00:00')
+        self.tz_date = ''
+        self.tz_desc = ''
+        self.full_updates = 0
+        self.step_updates = 0
+
+    @property
+    def utc_time(self):
+        return str(self.utc_clock, 'ascii')
+
+    @property
+    def tz_time(self):
+        return str(self.tz_clock, 'ascii')
+
+    # RETURNS THE CHANGE BITS FOR THE STRINGS THAT ARE DIFFERENT FROM THE LAST CALL
+
+    def update(self, secs):
+        secs = int(secs)
+
+        if secs == self._secs:
+            return 0
+
+        step = self._secs is not None and secs == self._secs + 1
+        self._secs = secs
+
+        zone = self._zone
+        offset = zone.at(secs)
+        changed = 0
+
+        if zone.name != self.tz_desc:
+            self.dst_active = zone.dst
+            self.tz_desc = zone.name
+            changed |= changed_tz_desc
+
+        if step and offset == self._offset:
+            self.step_updates += 1
+            utc_carry = step_second(self._utc)
+            tz_carry = step_second(self._tz)
+        else:
+            self.full_updates += 1
+            self._offset = offset
+            set_fields(self._utc, secs)
+            set_fields(self._tz, secs + offset)
+            utc_carry = carry_date
+            tz_carry = carry_date
+
+        put_time(self.utc_clock, self._utc)
+        put_time(self.tz_clock, self._tz)
+        changed |= changed_utc_time | changed_tz_time
+
+        if utc_carry == carry_date:
+            utc_date = format_date(self._utc)
+
+            if utc_date != self.utc_date:
+                self.utc_date = utc_date
+                changed |= changed_utc_date
+
+        if tz_carry == carry_date:
+            tz_date = format_date(self._tz)
+
+            if tz_date != self.tz_date:
+                self.tz_date = tz_date
+                changed |= changed_tz_date
+
+        return changed
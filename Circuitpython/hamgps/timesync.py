@@ -0,0 +1,190 @@
+# HAM RADIO GPS - GPS TIME SYNC
+#
+# THE TIME IN AN RMC OR NAV-PVT IS THE TIME THE NAVIGATION EPOCH STARTED. THE MESSAGE ARRIVES LATER: THE
+# RECEIVER'S OWN OUTPUT DELAY, THEN ITS BYTES AT THE LINK BAUD RATE, THEN HOWEVER LONG THEY WAIT IN THE UART
+# UNTIL THE GPS TASK DRAINS IT. A CLOCK SET FROM THE DECODED TIME IS LATE BY ALL THREE.
+#
+# time_sync WORKS OUT WHEN THE EPOCH STARTED ON THE monotonic_ns() CLOCK. THE READERS (nmea.py, ubx.py)
+# COUNT EVERY BYTE THEY READ AND MARK WHERE IN THAT COUNT THE FIRST MESSAGE OF AN EPOCH ENDED.
+# drained() IS CALLED AFTER EVERY DRAIN OF THE UART AND BOUNDS WHEN THAT LAST BYTE ARRIVED:
+#
+# - NO LATER THAN THE END OF THIS DRAIN, LESS ONE BYTE TIME FOR EVERY BYTE READ AFTER IT
+# - NO EARLIER THAN THE START OF THE LAST DRAIN, PLUS ONE BYTE TIME FOR EVERY BYTE READ UP TO IT BUT THE
+#   FIRST (THE LAST DRAIN READ EVERYTHING THAT HAD ARRIVED WHEN IT STARTED, THE FIRST BYTE AFTER IT MAY
+#   ALREADY HAVE BEEN ON THE WIRE THEN, THE REST CAME NO FASTER THAN THE BAUD RATE)
+# - WHEN IT WAS NOT YET WAITING AT THE START OF THIS DRAIN, NO EARLIER THAN THAT START PLUS ONE BYTE TIME
+#   FOR EVERY BYTE UP TO IT BEYOND THE FIRST ONE NOT WAITING (A DRAIN THAT STARTS IN THE MIDDLE OF A
+#   MESSAGE KEEPS READING AS IT ARRIVES)
+#
+# LESS THE MESSAGE LENGTH AND delay EACH EPOCH GIVES A RANGE FOR THE OFFSET FROM MONOTONIC TO GPS TIME.
+# THE RANGES OF window EPOCHS ARE INTERSECTED AND THE MIDDLE OF WHAT IS LEFT BECOMES THE OFFSET, A DRAIN
+# IN THE MIDDLE OF AN EPOCH'S BURST PINS ONE END TO WITHIN A BYTE TIME. RANGES THAT DO NOT OVERLAP (A TIME
+# STEP, A POLL RESPONSE SENT AHEAD OF THE MESSAGE) START THE WINDOW AGAIN.
+#
+# A MESSAGE THAT ARRIVES ON ITS OWN (NAV-PVT) IS DRAINED AT THE SAME PHASE OF THE GPS TASK EVERY EPOCH, SO
+# THE RANGES WOULD NOT NARROW. probe_ns() GIVES THE GPS TASK AN EXTRA DRAIN AT THE MOMENT THE MESSAGE IS
+# DUE TO END BY THE CURRENT ESTIMATE. THAT DRAIN LANDS JUST BEFORE OR JUST AFTER THE END AND TIGHTENS ONE
+# SIDE OF THE RANGE, THE NEXT EPOCH PROBES THE MIDDLE OF WHAT IS LEFT.
+#
+# THE MONOTONIC CLOCK AND THE RTC BOTH RUN FROM THE 32 KHZ CRYSTAL. ITS DRIFT AGAINST GPS (drift_ppb,
+# POSITIVE WHEN THE CRYSTAL IS FAST) IS THE CHANGE IN OFFSET OVER drift_span SECONDS OR MORE, THE OFFSET IS
+# CARRIED FORWARD WITH IT BETWEEN WINDOWS.
+#
+# ALL TIMES ARE INTEGER NS, A FLOAT CANNOT HOLD A UNIX TIME TO THE MS ON THE BOARD.
+
+import time
+
+# NS PER SECOND / BITS PER UART BYTE (START, 8 DATA, STOP)
+second_ns = 1000000000
+byte_bits = 10
+
+
+class time_sync:
+    def __init__(self, baud, delay=0, window=8, drift_span=60):
+        self._byte_ns = byte_bits * second_ns // baud
+        self._delay_ns = int(delay * second_ns)
+        self._window = window
+        self._drift_span_ns = drift_span * second_ns
+
+        # LAST DRAIN: READER BYTE COUNT, START TIME, TIME MARK
+        self._pos = 0
+        self._drained_ns = None
+        self._mark = None
+
+        # LAST EPOCH TIME, EPOCH SPACING AND HOW LONG AFTER ITS START THE MESSAGE ENDED
+        self._epoch_ns = 0
+        self._period_ns = 0
+        self._lead_ns = 0
+
+        # OFFSET RANGE OF THE WINDOW BEING COLLECTED
+        self._lo = 0
+        self._hi = 0
+        self._count = 0
+
+        # OFFSET FROM THE LAST WINDOW AND WHEN IT WAS TAKEN, THE FIRST OFFSET OF THE DRIFT SPAN
+        self._ref_ns = 0
+        self._offset_ns = 0
+        self._anchor_ns = None
+        self._anchor_offset_ns = 0
+
+        self.valid = False
+        self.drift_ppb = 0
+        self.spread_ns = 0
+        self.step_ns = 0
+        self.samples = 0
+        self.windows = 0
+        self.restarts = 0
+        self.rtc_sets = 0
+
+    # AFTER THE GPS TASK HAS DRAINED THE UART, gps IS THE READER, THE DRAIN RAN FROM start_ns TO now_ns
+    # AND waiting BYTES HAD ARRIVED WHEN IT STARTED
+
+    def drained(self, gps, start_ns, waiting, now_ns):
+        pos = gps.bytes_read
+
+        if gps.time_mark != self._mark and self._drained_ns is not None and self._mark is not None:
+            byte_ns = self._byte_ns
+            epoch_ns = time.mktime(gps.timestamp_utc) * second_ns + gps.time_nanos
+            lead_ns = gps.time_len * byte_ns + self._delay_ns
+            latest = now_ns - (pos - gps.time_pos) * byte_ns - lead_ns
+            fresh = gps.time_pos - self._pos
+            earliest = self._drained_ns + (fresh - 1) * byte_ns
+
+            if fresh > waiting:
+                earliest = max(earliest, start_ns + (fresh - waiting - 1) * byte_ns)
+
+            earliest -= lead_ns
+
+            if epoch_ns > self._epoch_ns:
+                self._period_ns = epoch_ns - self._epoch_ns
+
+            self._epoch_ns = epoch_ns
+            self._lead_ns = lead_ns
+            self._sample(epoch_ns - latest, epoch_ns - earliest, now_ns)
+
+        self._pos = pos
+        self._drained_ns = start_ns
+        self._mark = gps.time_mark
+
+    def _sample(self, lo, hi, now_ns):
+        self.samples += 1
+
+        if self._count and (lo > self._hi or hi < self._lo):
+            self.restarts += 1
+            self._count = 0
+
+        if self._count:
+            self._lo = max(self._lo, lo)
+            self._hi = min(self._hi, hi)
+        else:
+            self._lo = lo
+            self._hi = hi
+
+        self._count += 1
+
+        if self._count < self._window and self.valid:
+            return
+
+        # FIRST WINDOW IS TAKEN FROM THE FIRST EPOCH SO THE CLOCK IS RIGHT STRAIGHT AWAY
+        offset = (self._lo + self._hi) // 2
+
+        if self.valid:
+            self.step_ns = offset - self.offset(now_ns)
+
+        self._ref_ns = now_ns
+        self._offset_ns = offset
+        self.spread_ns = self._hi - self._lo
+        self.valid = True
+        self.windows += 1
+
+        # THE FIRST EPOCH ON ITS OWN CAN BE A WIDE RANGE, ONLY FULL WINDOWS MEASURE THE DRIFT
+        if self._count >= self._window:
+            self._count = 0
+            self._drift(now_ns, offset)
+
+    def _drift(self, now_ns, offset):
+        if self._anchor_ns is None or now_ns - self._anchor_ns >= 8 * self._drift_span_ns:
+            self._anchor_ns = now_ns
+            self._anchor_offset_ns = offset
+        elif now_ns - self._anchor_ns >= self._drift_span_ns:
+            self.drift_ppb = (self._anchor_offset_ns - offset) * second_ns // (now_ns - self._anchor_ns)
+
+    # WHEN THE NEXT EPOCH'S MESSAGE IS DUE TO END, IF THAT IS WITHIN within_ns OF now_ns
+
+    def probe_ns(self, now_ns, within_ns):
+        if not self.valid or not self._period_ns:
+            return None
+
+        offset = (self._lo + self._hi) // 2 if self._count else self.offset(now_ns)
+        due = self._epoch_ns + self._period_ns - offset + self._lead_ns
+
+        if now_ns < due <= now_ns + within_ns:
+            return due
+
+        return None
+
+    # OFFSET FROM MONOTONIC TO GPS TIME AT now_ns, CARRIED FORWARD BY THE DRIFT
+
+    def offset(self, now_ns):
+        return self._offset_ns - (now_ns - self._ref_ns) * self.drift_ppb // second_ns
+
+    # GPS TIME IN NS AND THE WHOLE SECOND AT MONOTONIC now_ns
+
+    def now_ns(self, now_ns):
+        return now_ns + self.offset(now_ns)
+
+    def second(self, now_ns):
+        return self.now_ns(now_ns) // second_ns
+
+    # MONOTONIC TIME THE FIRST GPS SECOND AFTER now_ns STARTS
+
+    def boundary_ns(self, now_ns):
+        offset = self.offset(now_ns)
+        return ((now_ns + offset) // second_ns + 1) * second_ns - offset
+
+    def report(self):
+        if not self.valid:
+            return ['time sync waiting, {} samples'.format(self.samples)]
+
+        return ['time sync +-{:.2f} ms, last step {:+.2f} ms, drift {:+.2f} ppm, {} samples, {} windows, {} restarts, rtc set {}'.format(
+            self.spread_ns / 2000000, self.step_ns / 1000000, self.drift_ppb / 1000, self.samples, self.windows, self.restarts, self.rtc_sets)]
@@ -0,0 +1,253 @@
+# HAM RADIO GPS - TRACK LOGGER
+#
+# ONE FIXED SIZE 24 BYTE RECORD PER track_interval SECONDS OF GPS TIME:
+#
+#   TIME (EPOCH SECONDS), LATITUDE / LONGITUDE (1E-7 DEGREE), ALTITUDE (METERS), SPEED (1/100 KNOT),
+#   TRACK (1/100 DEGREE), SATELLITES, FIX QUALITY, 6 CHARACTER GRID SQUARE INDEX (SEE grid.py)
+#
+# RECORDS ARE PACKED WITH struct.pack_into() STRAIGHT INTO A PREALLOCATED RING OF 512 BYTE PAGES. EACH
+# PAGE STARTS WITH AN 8 BYTE HEADER (MAGIC, VERSION, RECORD COUNT, PAGE SEQUENCE) AND HOLDS UP TO 21
+# RECORDS, SO EVERY PAGE CAN BE READ ON ITS OWN AND A PAGE TORN BY A POWER CUT ONLY LOSES ITSELF.
+#
+# FULL PAGES ARE WRITTEN TO FLASH IN ONE BATCH EVERY flush_interval SECONDS (THE PAGE BEING FILLED IS
+# CLOSED AND WRITTEN WITH THEM) OR AS SOON AS THE RING IS DOWN TO ONE FREE PAGE. WRITES ARE WHOLE PAGES
+# AT PAGE ALIGNED FILE OFFSETS, THE FILE IS OPENED, APPENDED AND CLOSED FOR EACH BATCH.
+#
+# EACH POWER UP STARTS A NEW FILE /tracks/trkNNNNN.bin, A FILE IS ALSO STARTED EVERY file_bytes. WHEN A
+# NEW FILE WOULD MAKE MORE THAN max_files THE OLDEST IS DELETED, WHICH CAPS THE FLASH USED AND SPREADS
+# THE WRITES OVER THE FREE SPACE.
+#
+# CIRCUITPY IS ONLY WRITABLE FROM CODE.PY IF boot.py REMOUNTED IT. THE LOGGER CREATES ITS FILE WHEN IT
+# STARTS, IF THAT OR A LATER WRITE FAILS IT TURNS ITSELF OFF AND report() SAYS WHY.
+#
+# add() ONLY PACKS A RECORD. flush() DOES THE FLASH WRITE AND IS RUN FROM ITS OWN TASK WHEN due() SAYS
+# SO, NEVER FROM THE GPS DRAIN.
+
+import struct
+
+from hamgps.grid import square_index
+
+page_size = 512
+page_magic = b'HGTK'
+page_version = 1
+
+# MAGIC, VERSION, RECORDS IN THE PAGE, PAGE SEQUENCE
+page_format = '<4sBBH'
+page_header_size = 8
+
+# TIME, LAT, LON, ALTITUDE, SPEED, TRACK, SATELLITES, FIX QUALITY, GRID SQUARE
+record_format = '<IiihHHBBI'
+record_size = 24
+page_records = (page_size - page_header_size) // record_size
+
+# FIELD VALUES FOR DATA THE RECEIVER DID NOT GIVE
+no_altitude = -32768
+no_value = 0xFFFF
+no_satellites = 255
+
+file_prefix = 'trk'
+file_suffix = '.bin'
+
+
+def file_name(number):
+    return '{}{:05d}{}'.format(file_prefix, number, file_suffix)
+
+
+# NUMBER OF A TRACK FILE NAME, -1 FOR ANY OTHER FILE
+
+
+def file_number(name):
+    if not name.startswith(file_prefix) or not name.endswith(file_suffix):
+        return -1
+
+    digits = name[len(file_prefix):-len(file_suffix)]
+    return int(digits) if digits.isdigit() else -1
+
+
+class track_logger:
+    def __init__(self, storage, clock, directory='/tracks', interval=1, flush_interval=60, pages=4, file_bytes=262144, max_files=8):
+        if pages < 2:
+            raise ValueError('track buffer needs at least 2 pages')
+
+        if file_bytes < page_size:
+            raise ValueError('track files must hold at least one page')
+
+        self._storage = storage
+        self._clock = clock
+        self._directory = directory
+        self._interval = interval
+        self._flush_interval = flush_interval
+        self._pages = pages
+        self._file_pages = file_bytes // page_size
+        self._max_files = max_files
+
+        self._buffer = bytearray(pages * page_size)
+        self._view = memoryview(self._buffer)
+        self._head = 0
+        self._tail = 0
+        self._full = 0
+        self._count = 0
+        self._sequence = 0
+        self._last_secs = -1
+        self._next_flush = clock.monotonic() + flush_interval
+
+        self._number = 0
+        self._path = None
+        self._file_pages_used = 0
+
+        self.enabled = True
+        self.error = None
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self.flush_ns = 0
+        self.flush_max_ns = 0
+        self.files = 0
+
+        try:
+            self._new_file()
+        except OSError as error:
+            self._fail(error)
+
+    def _fail(self, error):
+        self.enabled = False
+        self.error = 'read-only' if error.args and error.args[0] == 30 else repr(error)
+
+    def _list(self):
+        numbers = []
+
+        for name in self._storage.listdir(self._directory):
+            number = file_number(name)
+
+            if number >= 0:
+                numbers.append(number)
+
+        numbers.sort()
+        return numbers
+
+    # START THE NEXT FILE, DELETING THE OLDEST ONES SO AT MOST max_files ARE LEFT
+
+    def _new_file(self):
+        if self._path is None:
+            try:
+                self._storage.mkdir(self._directory)
+            except OSError:
+                pass
+
+            numbers = self._list()
+            self._number = numbers[-1] + 1 if numbers else 0
+        else:
+            self._number += 1
+            numbers = self._list()
+
+        while len(numbers) >= self._max_files:
+            self._storage.remove('{}/{}'.format(self._directory, file_name(numbers.pop(0))))
+
+        self._path = '{}/{}'.format(self._directory, file_name(self._number))
+        self._file_pages_used = 0
+        self.files += 1
+
+        with self._storage.open(self._path, 'wb'):
+            pass
+
+    # PACK ONE RECORD FOR THE CURRENT FIX, secs IS THE GPS TIME IN EPOCH SECONDS. FIXES LESS THAN interval
+    # SECONDS AFTER THE LAST RECORD ARE SKIPPED
+
+    def add(self, secs, gps):
+        if not self.enabled or secs - self._last_secs < self._interval:
+            return
+
+        latitude = gps.latitude
+        longitude = gps.longitude
+
+        if latitude is None or longitude is None:
+            return
+
+        if self._full == self._pages:
+            self.dropped += 1
+            return
+
+        self._last_secs = secs
+        altitude = gps.altitude_m
+        speed = gps.speed_knots
+        track = gps.track_angle_deg
+        satellites = gps.satellites
+
+        offset = self._tail * page_size + page_header_size + self._count * record_size
+        struct.pack_into(record_format, self._buffer, offset, int(secs), int(latitude * 10000000), int(longitude * 10000000),
+                         no_altitude if altitude is None else max(-32767, min(32767, int(altitude))),
+                         no_value if speed is None else min(no_value - 1, int(speed * 100)),
+                         no_value if track is None else int(track * 100) % 36000,
+                         no_satellites if satellites is None else min(satellites, no_satellites - 1),
+                         min(gps.fix_quality, 255), square_index(latitude, longitude))
+
+        self.records += 1
+        self._count += 1
+
+        if self._count == page_records:
+            self._close_page()
+
+    def _close_page(self):
+        struct.pack_into(page_format, self._buffer, self._tail * page_size, page_magic, page_version, self._count, self._sequence & 0xFFFF)
+        self._sequence += 1
+        self._count = 0
+        self._full += 1
+        self._tail = (self._tail + 1) % self._pages
+
+    # TRUE WHEN flush() HAS WORK TO DO: THE RING IS DOWN TO ONE FREE PAGE OR THE FLUSH INTERVAL IS UP
+
+    def due(self, now):
+        if not self.enabled:
+            return False
+
+        if self._full >= self._pages - 1:
+            return True
+
+        return now >= self._next_flush and (self._full or self._count)
+
+    # WRITE EVERY FULL PAGE (AND THE PAGE BEING FILLED) IN ONE BATCH PER FILE
+
+    def flush(self):
+        self._next_flush = self._clock.monotonic() + self._flush_interval
+
+        if not self.enabled:
+            return
+
+        if self._count and self._full < self._pages:
+            self._close_page()
+
+        start = self._clock.monotonic_ns()
+
+        try:
+            while self._full:
+                if self._file_pages_used == self._file_pages:
+                    self._new_file()
+
+                # PAGES UP TO THE END OF THE RING OR THE END OF THE FILE, WHICHEVER COMES FIRST
+                pages = min(self._full, self._pages - self._head, self._file_pages - self._file_pages_used)
+
+                with self._storage.open(self._path, 'ab') as track_file:
+                    track_file.write(self._view[self._head * page_size:(self._head + pages) * page_size])
+
+                self._head = (self._head + pages) % self._pages
+                self._full -= pages
+                self._file_pages_used += pages
+                self.bytes_written += pages * page_size
+        except OSError as error:
+            self._fail(error)
+            return
+
+        elapsed = self._clock.monotonic_ns() - start
+        self.flushes += 1
+        self.flush_ns += elapsed
+
+        if elapsed > self.flush_max_ns:
+            self.flush_max_ns = elapsed
+
+    def report(self):
+        if not self.enabled:
+            return ['track off ({}), {} records, {} bytes written'.format(self.error, self.records, self.bytes_written)]
+
+        mean = self.flush_ns / self.flushes / 1000000 if self.flushes else 0
+        return ['track {}, {} records, {} dropped, {} bytes written, {} flushes mean {:.1f} ms max {:.1f} ms'.format(self._path, self.records, self.dropped, self.bytes_written, self.flushes, mean, self.flush_max_ns / 1000000)]
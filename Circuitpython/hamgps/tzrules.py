@@ -0,0 +1,282 @@
+# HAM RADIO GPS - POSIX TZ RULES
+#
+# A ZONE IS GIVEN AS A POSIX TZ STRING, THE SAME FORMAT AS THE TZ ENVIRONMENT VARIABLE:
+#
+#   EST5EDT,M3.2.0,M11.1.0              US EASTERN
+#   CET-1CEST,M3.5.0,M10.5.0/3          CENTRAL EUROPE
+#   ACST-9:30ACDT,M10.1.0,M4.1.0/3      SOUTH AUSTRALIA, HALF HOUR OFFSET, DST OVER NEW YEAR
+#   <+0545>-5:45                        NEPAL, NO DST
+#
+# STANDARD NAME, ITS OFFSET WEST OF UTC ([+-]hh[:mm[:ss]], SO EAST IS NEGATIVE), THEN OPTIONALLY THE DST
+# NAME, ITS OFFSET (DEFAULT ONE HOUR AHEAD OF STANDARD) AND THE START AND END RULES. A RULE IS Mm.w.d (DAY d,
+# 0 = SUNDAY, OF WEEK w, 5 = LAST, OF MONTH m), Jn (DAY 1 - 365, FEB 29 NEVER COUNTED) OR n (DAY 0 - 365),
+# WITH AN OPTIONAL /time (DEFAULT 02:00:00, MAY BE NEGATIVE OR PAST 24). START IS IN STANDARD TIME, END IN
+# DST. A DST NAME WITHOUT RULES GETS THE US RULES. A STRING THAT DOES NOT PARSE RAISES ValueError.
+#
+# THE STRING IS PARSED ONCE. time_zone.at() COMPILES THE RULES FOR THE UTC YEAR BEING SHOWN INTO A SORTED
+# TABLE OF UTC TRANSITION TIMES (THE YEARS EITHER SIDE TOO, SO DST THAT RUNS OVER NEW YEAR IS RIGHT) AND
+# KEEPS THE INTERVAL THE LAST TIME FELL IN. A TIME IN THE SAME INTERVAL IS ONE COMPARISON, ANOTHER
+# INTERVAL IS A BINARY SEARCH OF THE TABLE, ANOTHER YEAR COMPILES THE TABLE AGAIN.
+
+import time
+
+# US RULES FOR A DST NAME WITHOUT ANY
+default_rules = ',M3.2.0,M11.1.0'
+
+# DEFAULT TRANSITION TIME, SECONDS AFTER LOCAL MIDNIGHT
+default_time = 7200
+
+# RULE KINDS
+rule_julian = 0
+rule_day = 1
+rule_month = 2
+
+
+# DAYS FROM 1970-01-01 TO year-month-day, PROLEPTIC GREGORIAN
+
+
+def days_from_civil(year, month, day):
+    if month <= 2:
+        year -= 1
+
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    return era * 146097 + year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year - 719468
+
+
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+# NAME AT text[i], ALPHABETIC OR <QUOTED>, RETURNS (NAME, NEXT INDEX)
+
+
+def _name(text, i):
+    if text.startswith('<', i):
+        end = text.find('>', i)
+
+        if end < 0:
+            raise ValueError('unterminated <> zone name in ' + text)
+
+        return text[i + 1:end], end + 1
+
+    end = i
+
+    while end < len(text) and text[end].isalpha():
+        end += 1
+
+    if end - i < 3:
+        raise ValueError('zone name needs 3 or more letters in ' + text)
+
+    return text[i:end], end
+
+
+# [+-]hh[:mm[:ss]] AT text[i] IN SECONDS, RETURNS (SECONDS, NEXT INDEX)
+
+
+def _clock(text, i):
+    sign = 1
+
+    if text.startswith('-', i):
+        sign = -1
+        i += 1
+    elif text.startswith('+', i):
+        i += 1
+
+    secs = 0
+    scale = 3600
+
+    while scale:
+        end = i
+
+        while end < len(text) and text[end].isdigit():
+            end += 1
+
+        if end == i:
+            raise ValueError('expected a number at {} in {}'.format(i, text))
+
+        secs += int(text[i:end]) * scale
+        i = end
+
+        if scale == 1 or not text.startswith(':', i):
+            break
+
+        scale //= 60
+        i += 1
+
+    return sign * secs, i
+
+
+def _number(text, i, low, high):
+    end = i
+
+    while end < len(text) and text[end].isdigit():
+        end += 1
+
+    if end == i or not low <= int(text[i:end]) <= high:
+        raise ValueError('expected {} - {} at {} in {}'.format(low, high, i, text))
+
+    return int(text[i:end]), end
+
+
+# ONE START / END RULE AT text[i], RETURNS ((KIND, A, B, C, TIME), NEXT INDEX)
+
+
+def _rule(text, i):
+    if text.startswith('M', i):
+        month, i = _number(text, i + 1, 1, 12)
+
+        if not text.startswith('.', i):
+            raise ValueError('expected Mm.w.d in ' + text)
+
+        week, i = _number(text, i + 1, 1, 5)
+
+        if not text.startswith('.', i):
+            raise ValueError('expected Mm.w.d in ' + text)
+
+        day, i = _number(text, i + 1, 0, 6)
+        rule = [rule_month, month, week, day]
+    elif text.startswith('J', i):
+        day, i = _number(text, i + 1, 1, 365)
+        rule = [rule_julian, day, 0, 0]
+    else:
+        day, i = _number(text, i, 0, 365)
+        rule = [rule_day, day, 0, 0]
+
+    secs = default_time
+
+    if text.startswith('/', i):
+        secs, i = _clock(text, i + 1)
+
+    rule.append(secs)
+    return tuple(rule), i
+
+
+# LOCAL MIDNIGHT OF THE RULE'S DAY IN year AS DAYS FROM 1970-01-01
+
+
+def rule_days(rule, year):
+    kind, a, b, c, _ = rule
+    new_year = days_from_civil(year, 1, 1)
+
+    if kind == rule_julian:
+        return new_year + a - 1 + (is_leap(year) and a >= 60)
+
+    if kind == rule_day:
+        return new_year + a
+
+    # DAY c OF WEEK b, 1970-01-01 WAS A THURSDAY (4)
+    first = days_from_civil(year, a, 1)
+    day = first + (c - (first + 4)) % 7 + (b - 1) * 7
+    month_end = days_from_civil(year + (a == 12), a % 12 + 1, 1)
+
+    while day >= month_end:
+        day -= 7
+
+    return day
+
+
+class time_zone:
+    def __init__(self, spec):
+        self.spec = spec
+        self.std_name, i = _name(spec, 0)
+        std_west, i = _clock(spec, i)
+        self.std_offset = -std_west
+        self.dst_name = None
+        self.dst_offset = self.std_offset
+        self._rules = None
+
+        if i < len(spec):
+            self.dst_name, i = _name(spec, i)
+            self.dst_offset = self.std_offset + 3600
+
+            if i < len(spec) and spec[i] != ',':
+                dst_west, i = _clock(spec, i)
+                self.dst_offset = -dst_west
+
+            if i == len(spec):
+                spec += default_rules
+
+            if not spec.startswith(',', i):
+                raise ValueError('expected ,start,end rules in ' + spec)
+
+            start, i = _rule(spec, i + 1)
+
+            if not spec.startswith(',', i):
+                raise ValueError('expected ,start,end rules in ' + spec)
+
+            end, i = _rule(spec, i + 1)
+
+            if i != len(spec):
+                raise ValueError('unexpected text after the rules in ' + spec)
+
+            self._rules = (start, end)
+
+        # COMPILED TABLE: UTC YEAR [BEGIN, END), TRANSITION TIMES AND WHETHER DST STARTS AT EACH
+        self._year_begin = 0
+        self._year_end = -1
+        self._times = []
+        self._dst = []
+
+        # INTERVAL OF THE LAST LOOKUP [since, until) AND THE ZONE IN FORCE DURING IT
+        self.since = 0
+        self.until = -1
+        self.offset = self.std_offset
+        self.name = self.std_name
+        self.dst = False
+        self.compiles = 0
+
+    # UTC TRANSITIONS OF year AS (TIME, DST) PAIRS
+
+    def _transitions(self, year):
+        start, end = self._rules
+        start_secs = rule_days(start, year) * 86400 + start[4] - self.std_offset
+        end_secs = rule_days(end, year) * 86400 + end[4] - self.dst_offset
+        return [(start_secs, True), (end_secs, False)]
+
+    def _compile(self, year):
+        self.compiles += 1
+        self._year_begin = days_from_civil(year, 1, 1) * 86400
+        self._year_end = days_from_civil(year + 1, 1, 1) * 86400
+
+        if self._rules is None:
+            return
+
+        table = sorted(self._transitions(year - 1) + self._transitions(year) + self._transitions(year + 1))
+        self._times = [entry[0] for entry in table]
+        self._dst = [entry[1] for entry in table]
+
+    # ZONE IN FORCE AT UTC secs, SETS offset (SECONDS EAST OF UTC), name, dst, since AND until
+
+    def at(self, secs):
+        if self.since <= secs < self.until:
+            return self.offset
+
+        if not self._year_begin <= secs < self._year_end:
+            self._compile(time.localtime(secs)[0])
+
+        times = self._times
+        low = 0
+        high = len(times)
+
+        # FIRST TRANSITION AFTER secs
+        while low < high:
+            middle = (low + high) // 2
+
+            if times[middle] <= secs:
+                low = middle + 1
+            else:
+                high = middle
+
+        if times:
+            dst = self._dst[low - 1] if low else not self._dst[0]
+        else:
+            dst = False
+
+        self.since = max(times[low - 1], self._year_begin) if low else self._year_begin
+        self.until = min(times[low], self._year_end) if low < len(times) else self._year_end
+        self.dst = dst
+        self.offset = self.dst_offset if dst else self.std_offset
+        self.name = self.dst_name if dst else self.std_name
+        return self.offset
@@ -0,0 +1,681 @@
+# HAM RADIO GPS - UBX BINARY PROTOCOL
+#
+# NAV-PVT DECODER FOR THE U-BLOX 8 RECEIVER IN THE BN-880. WHEN NMEA OUTPUT IS TURNED OFF AND NAV-PVT
+# IS ENABLED THE RECEIVER SENDS ONE 100 BYTE FRAME PER FIX (6 BYTE HEADER, 92 BYTE PAYLOAD, 2 BYTE
+# CHECKSUM) INSTEAD OF ~150 BYTES OF RMC + GGA TEXT. ALL FIELDS ARE READ AT FIXED OFFSETS WITH A SINGLE
+# struct.unpack_from() CALL, NOTHING IS SPLIT OR CONVERTED FROM TEXT.
+#
+# nav_pvt EXPOSES THE SAME ATTRIBUTES CODE.PY READS FROM adafruit_gps.GPS SO EITHER CAN BE USED. FOR
+# timesync.py IT ALSO COUNTS THE BYTES IT READS AND MARKS EACH FRAME WITH A FULLY RESOLVED TIME LIKE
+# nmea_reader MARKS AN RMC (time_mark, time_pos, time_len, time_nanos FROM THE nano FIELD).
+#
+# ubx_transport SITS BETWEEN THE UART AND THE READER (nmea_reader, nav_pvt OR adafruit_gps.GPS) AND
+# SENDS QUEUED UBX COMMANDS WITHOUT BLOCKING:
+#
+# - ONE COMMAND IS IN FLIGHT AT A TIME, ITS ACK-ACK / ACK-NAK (OR POLL RESPONSE) IS FOUND BY A FRAME
+#   SCANNER RUNNING OVER THE LIVE BYTE STREAM AND MATCHED BY CLASS AND ID
+# - EVERYTHING ELSE (NMEA TEXT, NAV-PVT AND OTHER FRAMES) IS KEPT IN ORDER IN A PASSTHROUGH BUFFER THE
+#   READER DRAINS FIRST, NOTHING THE READER NEEDS IS THROWN AWAY
+# - A COMMAND WITH NO ANSWER IS SENT AGAIN AFTER timeout, timeout * backoff, timeout * backoff ^ 2 ...
+#   UNTIL ITS TRIES RUN OUT
+# - A POLL WITH A sink (NAV-SAT, SEE sky.py) HAS ITS RESPONSE STREAMED INTO THE SINK AS IT ARRIVES
+#   INSTEAD OF COLLECTED, SO A RESPONSE OF ANY LENGTH NEEDS NO FRAME BUFFER. sink.start(frame, length)
+#   GETS THE 6 BYTE HEADER AND MAY REFUSE THE FRAME, sink.feed(data, start, count) THE PAYLOAD AND
+#   CHECKSUM BYTES, sink.end() CHECKS THE CHECKSUM
+#
+# WITH NOTHING QUEUED THE SCANNER IS OFF AND THE READER READS THE UART DIRECTLY.
+
+import struct
+import time
+
+# NAV-PVT FRAME
+nav_pvt_class = 0x01
+nav_pvt_id = 0x07
+nav_pvt_payload_len = 92
+nav_pvt_frame_len = 100
+
+# YEAR, MONTH, DAY, HOUR, MIN, SEC, VALID, NANO, FIX TYPE, FLAGS, NUM SV, LON, LAT, HMSL, GROUND SPEED,
+# HEADING UNPACKED FROM FRAME OFFSET 10 (PAYLOAD OFFSET 4)
+nav_pvt_format = '<HBBBBBB4xiBBxBii4xi20xii'
+nav_pvt_offset = 10
+
+# VALID FLAGS (VALID DATE + VALID TIME, PLUS FULLY RESOLVED) AND FIX FLAGS (GNSS FIX OK)
+valid_date_time = 0x03
+valid_resolved = 0x07
+flag_fix_ok = 0x01
+
+# KNOTS PER MM/S
+knots_per_mms = 1 / 514.444
+
+# ACK CLASS AND IDS, CFG CLASS (CFG POLLS ARE ANSWERED WITH THE RESPONSE FOLLOWED BY ACK-ACK)
+ack_class = 0x05
+ack_id = 0x01
+nak_id = 0x00
+cfg_class = 0x06
+
+# COMMAND STATES
+command_queued = 0
+command_sent = 1
+command_ack = 2
+command_nak = 3
+command_timeout = 4
+
+# LARGEST FRAME THE SCANNER COLLECTS (ACKS AND POLL RESPONSES), LONGER ONES ARE PASSED THROUGH
+scan_frame_len = 72
+
+# LONGEST PAYLOAD THE RECEIVER SENDS THIS FIRMWARE (NAV-SAT, 8 + 12 BYTES FOR EACH OF UP TO 255 SATELLITES),
+# A LONGER LENGTH IS A CORRUPT HEADER AND IS NOT SKIPPED
+max_payload_len = 3068
+
+
+# FLETCHER CHECKSUM OF A UBX FRAME BODY (CLASS, ID, LENGTH AND PAYLOAD) PASSED AS A memoryview
+
+
+def ubx_checksum(view):
+    cs_a = 0
+    cs_b = 0
+
+    for byte in view:
+        cs_a = (cs_a + byte) & 255
+        cs_b = (cs_b + cs_a) & 255
+
+    return cs_a, cs_b
+
+
+# CHECK A UBX CHECKSUM IN PLACE, buf[2:end - 2] IS CLASS, ID, LENGTH AND PAYLOAD
+
+
+def checksum_ok(buf, end):
+    cs_a, cs_b = ubx_checksum(memoryview(buf)[2:end - 2])
+    return cs_a == buf[end - 2] and cs_b == buf[end - 1]
+
+
+# BUILD A UBX FRAME: SYNC CHARACTERS, CLASS, ID, LITTLE ENDIAN LENGTH, PAYLOAD AND CHECKSUM
+
+
+def ubx_message(msg_class, msg_id, payload=b''):
+    end = len(payload) + 8
+    frame = bytearray(end)
+    frame[0] = 0xB5
+    frame[1] = 0x62
+    frame[2] = msg_class
+    frame[3] = msg_id
+    frame[4] = len(payload) & 255
+    frame[5] = len(payload) >> 8
+    frame[6:end - 2] = payload
+    frame[end - 2], frame[end - 1] = ubx_checksum(memoryview(frame)[2:end - 2])
+    return frame
+
+
+class nav_pvt:
+    def __init__(self, uart):
+        self._uart = uart
+        self._frame = bytearray(nav_pvt_frame_len)
+        self._view = memoryview(self._frame)
+        self._have = 0
+        self._skip = 0
+
+        self.timestamp_utc = time.struct_time((0, 0, 0, 0, 0, 0, 0, 0, -1))
+        self.latitude = None
+        self.longitude = None
+        self.altitude_m = None
+        self.speed_knots = None
+        self.track_angle_deg = None
+        self.satellites = None
+        self.fix_quality = 0
+        self.fix_type = 0
+        self.frames = 0
+        self.bad_frames = 0
+
+        self.bytes_read = 0
+        self.time_mark = 0
+        self.time_pos = 0
+        self.time_len = nav_pvt_frame_len
+        self.time_nanos = 0
+
+    @property
+    def has_fix(self):
+        return self.fix_quality >= 1
+
+    # FOR rtc.set_time_source()
+    @property
+    def datetime(self):
+        return self.timestamp_utc
+
+    # READ WHATEVER HAS ARRIVED, RETURNS TRUE WHEN A COMPLETE NAV-PVT FRAME WAS DECODED
+    # READS ONLY WHAT IS WAITING SO IT NEVER BLOCKS ON THE UART TIMEOUT
+
+    def update(self):
+        uart = self._uart
+        frame = self._frame
+        view = self._view
+
+        while True:
+            waiting = uart.in_waiting
+
+            if not waiting:
+                return False
+
+            # DISCARD OTHER UBX MESSAGES (ACK, POLL RESPONSES) A CHUNK AT A TIME
+            if self._skip:
+                count = uart.readinto(view[0:min(self._skip, waiting, nav_pvt_frame_len)])
+                self.bytes_read += count
+                self._skip -= count
+                continue
+
+            # COLLECT AND CHECK THE 6 BYTE HEADER
+            if self._have < 6:
+                count = uart.readinto(view[self._have:self._have + min(6 - self._have, waiting)])
+                self.bytes_read += count
+                self._have += count
+
+                if self._have < 6:
+                    continue
+
+                if frame[0] != 0xB5 or frame[1] != 0x62:
+                    self._resync()
+                    continue
+
+                length = frame[4] | (frame[5] << 8)
+
+                # LOOK FOR THE NEXT SYNC CHARACTER INSTEAD OF THROWING AWAY UP TO 64 KB OF FIXES
+                if length > max_payload_len:
+                    self._resync()
+                    continue
+
+                if frame[2] != nav_pvt_class or frame[3] != nav_pvt_id or length != nav_pvt_payload_len:
+                    self._skip = length + 2
+                    self._have = 0
+
+                continue
+
+            # COLLECT THE PAYLOAD AND CHECKSUM
+            count = uart.readinto(view[self._have:self._have + min(nav_pvt_frame_len - self._have, waiting)])
+            self.bytes_read += count
+            self._have += count
+
+            if self._have < nav_pvt_frame_len:
+                continue
+
+            self._have = 0
+
+            if not checksum_ok(frame, nav_pvt_frame_len):
+                self.bad_frames += 1
+                continue
+
+            self._decode()
+            return True
+
+    # HEADER DID NOT START WITH THE SYNC CHARACTERS, KEEP ANY LATER 0xB5 AND WHAT FOLLOWS IT
+
+    def _resync(self):
+        frame = self._frame
+
+        for i in range(1, self._have):
+            if frame[i] == 0xB5:
+                count = self._have - i
+                frame[0:count] = frame[i:self._have]
+                self._have = count
+                return
+
+        self._have = 0
+
+    def _decode(self):
+        (year, month, day, hour, minute, second, valid, nano, fix_type, flags, num_sv,
+         lon, lat, h_msl, g_speed, head_mot) = struct.unpack_from(nav_pvt_format, self._frame, nav_pvt_offset)
+
+        self.frames += 1
+        self.fix_type = fix_type
+
+        if (valid & valid_date_time) == valid_date_time:
+            self.timestamp_utc = time.struct_time((year, month, day, hour, minute, second, 0, 0, -1))
+
+        # THE FRAME ENDS AT THE LAST BYTE READ
+        if (valid & valid_resolved) == valid_resolved:
+            self.time_mark += 1
+            self.time_pos = self.bytes_read
+            self.time_nanos = nano
+
+        if (flags & flag_fix_ok) and fix_type >= 2:
+            self.fix_quality = 1
+            self.latitude = lat * 1e-7
+            self.longitude = lon * 1e-7
+            self.altitude_m = h_msl / 1000
+            self.speed_knots = g_speed * knots_per_mms
+            self.track_angle_deg = head_mot * 1e-5
+            self.satellites = num_sv
+        else:
+            self.fix_quality = 0
+            self.satellites = num_sv
+
+
+# ONE QUEUED COMMAND OR POLL. done IS SET ONCE IT HAS BEEN ACKED, NAKED OR HAS RUN OUT OF TRIES, A POLL
+# KEEPS THE RESPONSE PAYLOAD IN payload
+
+
+class ubx_command:
+    def __init__(self, msg_class, msg_id, payload, poll, timeout, tries, sink=None):
+        self.msg_class = msg_class
+        self.msg_id = msg_id
+        self.sink = sink
+        self.message = ubx_message(msg_class, msg_id, payload)
+        self.request = bytes(payload)
+        self.poll = poll
+        self.timeout = timeout
+        self.max_tries = tries
+        self.tries = 0
+        self.deadline = 0
+        self.state = command_queued
+        self.payload = None
+
+    @property
+    def done(self):
+        return self.state >= command_ack
+
+    @property
+    def ok(self):
+        return self.state == command_ack
+
+
+class ubx_transport:
+    def __init__(self, uart, clock, timeout=0.25, tries=4, backoff=2, buffer_size=512):
+        self._uart = uart
+        self._clock = clock
+        self._timeout = timeout
+        self._tries = tries
+        self._backoff = backoff
+        self._queue = []
+
+        # PASSTHROUGH BUFFER, BYTES pass_start - pass_end ARE WAITING FOR THE READER
+        self._pass = bytearray(buffer_size)
+        self._pass_view = memoryview(self._pass)
+        self._pass_start = 0
+        self._pass_end = 0
+
+        # SCANNER: PARTIAL FRAME, BYTES STILL TO COPY THROUGH FROM A FRAME NOBODY IS WAITING FOR
+        self._frame = bytearray(scan_frame_len)
+        self._have = 0
+        self._need = 0
+        self._through = 0
+        self._sinking = 0
+        self._rx = bytearray(64)
+        self._rx_view = memoryview(self._rx)
+
+        self.bytes_in = 0
+        self.sent = 0
+        self.retries = 0
+        self.acks = 0
+        self.naks = 0
+        self.timeouts = 0
+        self.overflow = 0
+
+    # NEW UART (BAUD RATE CHANGE), ANYTHING BUFFERED FROM THE OLD ONE IS DROPPED
+
+    def set_uart(self, uart):
+        self._uart = uart
+        self._pass_start = self._pass_end = 0
+        self._have = self._through = self._sinking = 0
+
+    def send(self, msg_class, msg_id, payload=b'', timeout=None, tries=None):
+        return self._add(msg_class, msg_id, payload, False, timeout, tries)
+
+    # POLL REQUEST, THE RESPONSE HAS THE SAME CLASS AND ID AND ITS PAYLOAD STARTS WITH THE POLL PAYLOAD
+
+    def poll(self, msg_class, msg_id, payload=b'', timeout=None, tries=None, sink=None):
+        return self._add(msg_class, msg_id, payload, True, timeout, tries, sink)
+
+    def _add(self, msg_class, msg_id, payload, poll, timeout, tries, sink=None):
+        command = ubx_command(msg_class, msg_id, payload, poll, self._timeout if timeout is None else timeout, self._tries if tries is None else tries, sink)
+        self._queue.append(command)
+        self.service()
+        return command
+
+    @property
+    def idle(self):
+        return not self._queue
+
+    # SCAN WHAT HAS ARRIVED, SEND THE NEXT COMMAND, RESEND OR GIVE UP ON ONE WHOSE DEADLINE HAS PASSED
+
+    def service(self):
+        uart = self._uart
+
+        while self._queue:
+            waiting = uart.in_waiting
+
+            if not waiting:
+                break
+
+            count = uart.readinto(self._rx_view[0:min(waiting, len(self._rx))])
+
+            if not count:
+                break
+
+            self.bytes_in += count
+            self._scan(count)
+
+        while self._queue:
+            command = self._queue[0]
+            now = self._clock.monotonic()
+
+            if command.state == command_sent and now < command.deadline:
+                break
+
+            if command.state == command_sent and command.payload is not None:
+                # CFG POLL ANSWERED, ITS ACK NEVER CAME
+                self._finish(command_ack)
+                continue
+
+            if command.tries >= command.max_tries:
+                self.timeouts += 1
+                self._finish(command_timeout)
+                continue
+
+            if command.tries:
+                self.retries += 1
+
+            uart.write(command.message)
+            command.deadline = now + command.timeout * self._backoff ** command.tries
+            command.tries += 1
+            command.state = command_sent
+            self.sent += 1
+            break
+
+    def _finish(self, state):
+        command = self._queue.pop(0)
+        command.state = state
+
+        if state == command_ack:
+            self.acks += 1
+        elif state == command_nak:
+            self.naks += 1
+
+        # A POLL THAT TIMED OUT WHILE ITS RESPONSE WAS STREAMING INTO ITS SINK, THE REST OF THE FRAME GOES TO
+        # THE READER LIKE ANY OTHER FRAME (THE NEXT COMMAND HAS NO SINK TO FEED)
+        if self._sinking:
+            self._through += self._sinking
+            self._sinking = 0
+
+        # NOTHING LEFT TO WAIT FOR, HAND ANY PARTIAL FRAME TO THE READER AND STOP SCANNING
+        if not self._queue:
+            self._keep(self._frame, 0, self._have)
+            self._have = 0
+            self._through = 0
+            self._sinking = 0
+
+    def _scan(self, count):
+        rx = self._rx
+        frame = self._frame
+        i = 0
+
+        while i < count:
+            if self._through:
+                take = min(self._through, count - i)
+                self._keep(rx, i, take)
+                self._through -= take
+                i += take
+                continue
+
+            if self._sinking:
+                take = min(self._sinking, count - i)
+                command = self._queue[0]
+                command.sink.feed(rx, i, take)
+                self._sinking -= take
+                i += take
+
+                # A BAD CHECKSUM LEAVES THE POLL WAITING, IT IS SENT AGAIN AFTER ITS TIMEOUT
+                if not self._sinking and command.sink.end():
+                    self._finish(command_ack)
+
+                    if not self._queue:
+                        return self._keep(rx, i, count - i)
+
+                continue
+
+            have = self._have
+
+            if not have:
+                start = i
+
+                while i < count and rx[i] != 0xB5:
+                    i += 1
+
+                self._keep(rx, start, i - start)
+
+                if i < count:
+                    frame[0] = 0xB5
+                    self._have = 1
+                    i += 1
+
+                continue
+
+            byte = rx[i]
+
+            if have == 1 and byte != 0x62:
+                self._keep(frame, 0, 1)
+                self._have = 0
+                continue
+
+            frame[have] = byte
+            have += 1
+            i += 1
+
+            if have == 6:
+                length = frame[4] | (frame[5] << 8)
+
+                if length > max_payload_len:
+                    self._keep(frame, 0, 6)
+                    have = 0
+                elif self._sink_wanted(frame, length):
+                    self._sinking = length + 2
+                    have = 0
+                elif length + 8 <= scan_frame_len and self._wanted(frame[2], frame[3]):
+                    self._need = length + 8
+                else:
+                    self._keep(frame, 0, 6)
+                    self._through = length + 2
+                    have = 0
+            elif have > 6 and have == self._need:
+                self._have = 0
+                self._frame_done(have)
+                have = 0
+
+            self._have = have
+
+            if not self._queue:
+                return self._keep(rx, i, count - i)
+
+    def _wanted(self, msg_class, msg_id):
+        if msg_class == ack_class:
+            return True
+
+        command = self._queue[0] if self._queue else None
+        return command is not None and command.poll and command.msg_class == msg_class and command.msg_id == msg_id
+
+    # RESPONSE TO A POLL WITH A SINK THAT TAKES IT
+
+    def _sink_wanted(self, frame, length):
+        command = self._queue[0] if self._queue else None
+
+        if command is None or command.sink is None or command.state != command_sent:
+            return False
+
+        return command.msg_class == frame[2] and command.msg_id == frame[3] and command.sink.start(frame, length)
+
+    def _frame_done(self, end):
+        frame = self._frame
+
+        if not checksum_ok(frame, end):
+            self._keep(frame, 0, end)
+            return
+
+        command = self._queue[0]
+
+        if command.state != command_sent:
+            return
+
+        if frame[2] == ack_class:
+            # ACK OF SOMETHING ELSE (OR A POLL ACK BEFORE ITS RESPONSE) IS DROPPED
+            if end != 10 or frame[6] != command.msg_class or frame[7] != command.msg_id:
+                return
+
+            if frame[3] == nak_id:
+                self._finish(command_nak)
+            elif frame[3] == ack_id and (not command.poll or command.payload is not None):
+                self._finish(command_ack)
+
+            return
+
+        request = command.request
+
+        if end - 8 < len(request) or frame[6:6 + len(request)] != request:
+            return
+
+        command.payload = bytes(frame[6:end - 2])
+
+        if command.msg_class != cfg_class:
+            self._finish(command_ack)
+
+    # APPEND count BYTES OF data FROM start TO THE PASSTHROUGH BUFFER
+
+    def _keep(self, data, start, count):
+        if count <= 0:
+            return
+
+        buf = self._pass
+
+        if self._pass_end + count > len(buf) and self._pass_start:
+            waiting = self._pass_end - self._pass_start
+            buf[0:waiting] = buf[self._pass_start:self._pass_end]
+            self._pass_start = 0
+            self._pass_end = waiting
+
+        room = len(buf) - self._pass_end
+
+        if count > room:
+            self.overflow += count - room
+            count = room
+
+        buf[self._pass_end:self._pass_end + count] = data[start:start + count]
+        self._pass_end += count
+
+    # UART INTERFACE FOR THE READER, BUFFERED BYTES FIRST, THEN THE UART ITSELF ONCE NOTHING IS QUEUED
+
+    @property
+    def timeout(self):
+        return self._uart.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._uart.timeout = value
+
+    @property
+    def in_waiting(self):
+        if self._queue:
+            self.service()
+
+        waiting = self._pass_end - self._pass_start
+
+        if self._queue:
+            return waiting
+
+        return waiting + self._uart.in_waiting
+
+    def readinto(self, buf, nbytes=None):
+        if self._queue:
+            self.service()
+
+        waiting = self._pass_end - self._pass_start
+
+        if not waiting:
+            if self._queue:
+                return None
+
+            if nbytes is None:
+                count = self._uart.readinto(buf)
+            else:
+                count = self._uart.readinto(memoryview(buf)[0:nbytes])
+
+            if count:
+                self.bytes_in += count
+
+            return count
+
+        count = min(len(buf) if nbytes is None else nbytes, waiting)
+        buf[0:count] = self._pass_view[self._pass_start:self._pass_start + count]
+        self._pass_start += count
+
+        if self._pass_start == self._pass_end:
+            self._pass_start = self._pass_end = 0
+
+        return count
+
+    def read(self, nbytes=None):
+        if nbytes is None:
+            nbytes = self.in_waiting
+
+        buf = bytearray(nbytes)
+        count = self.readinto(buf, nbytes)
+
+        if not count:
+            return None
+
+        return bytes(buf[0:count])
+
+    def readline(self):
+        if self._queue:
+            self.service()
+
+        start = self._pass_start
+        end = self._pass_end
+
+        if start == end:
+            if self._queue:
+                return None
+
+            line = self._uart.readline()
+
+            if line:
+                self.bytes_in += len(line)
+
+            return line
+
+        newline = self._pass.find(b'\n', start, end)
+
+        if newline < 0:
+            line = bytes(self._pass[start:end])
+            self._pass_start = self._pass_end = 0
+
+            if self._queue:
+                return line
+
+            rest = self._uart.readline()
+
+            if not rest:
+                return line
+
+            self.bytes_in += len(rest)
+            return line + rest
+
+        line = bytes(self._pass[start:newline + 1])
+        self._pass_start = newline + 1
+
+        if self._pass_start == self._pass_end:
+            self._pass_start = self._pass_end = 0
+
+        return line
+
+    def write(self, data):
+        return self._uart.write(data)
+
+    # DROP WHAT IS WAITING IN THE PASSTHROUGH BUFFER (BEFORE A READER IS RUNNING)
+
+    def discard(self):
+        self._pass_start = self._pass_end = 0
+
+    def reset_input_buffer(self):
+        self._pass_start = self._pass_end = 0
+        self._have = self._through = self._sinking = 0
+        self._uart.reset_input_buffer()
+
+    def report(self):
+        return ['ubx sent {}, retries {}, ack {}, nak {}, timeout {}, passthrough overflow {}'.format(self.sent, self.retries, self.acks, self.naks, self.timeouts, self.overflow)]
@@ -0,0 +1,153 @@
+# HAM RADIO GPS - SCREEN LAYOUT
+#
+# THE SCREEN IS LAID OUT IN CHARACTER CELLS: COLUMN c STARTS AT c * char_width, ROW r IS AT
+# char_start + r * (char_height + line_space) PLUS ONE line_gap FOR EACH BLOCK ABOVE IT (UTC, LOCAL TIME,
+# POSITION, MOTION, SATELLITES).
+#
+# main_screen BUILDS EVERY LABEL AND FIELD OF THE MAIN DISPLAY INTO ITS OWN group, CODE.PY SHOWS IT ONCE
+# THE BOOT MESSAGES ARE DONE AND UPDATES THE FIELDS BY NAME. text_page IS A COLUMN OF LINES (STATUS AND
+# DEBUG PAGES), message_page ONE CENTERED MESSAGE. EACH PAGE IS ITS OWN group FOR pages.page_manager.
+# NUMERIC FIELDS ARE GLYPH FIELDS WHEN AN ATLAS IS GIVEN, OTHERWISE LABELS.
+#
+# battery_colors() IS ONLY NEEDED AT BOOT. IT IMPORTS adafruit_fancyled, BUILDS THE GAUGE COLORS AND
+# release() DROPS THE LIBRARY FROM sys.modules AGAIN SO THE GC CAN TAKE ITS RAM BACK.
+
+import gc
+import sys
+
+# SCREEN WIDTH IN CHARACTERS
+columns = 26
+
+
+# FORGET A MODULE (AND ITS SUBMODULES) IMPORTED ONLY FOR BOOT, THE NEXT IMPORT LOADS IT AGAIN
+
+
+def release(name):
+    for module in [module for module in sys.modules if module == name or module.startswith(name + '.')]:
+        del sys.modules[module]
+
+    # A SUBMODULE IS ALSO AN ATTRIBUTE OF ITS PACKAGE
+    dot = name.rfind('.')
+
+    if dot > 0 and name[:dot] in sys.modules and hasattr(sys.modules[name[:dot]], name[dot + 1:]):
+        delattr(sys.modules[name[:dot]], name[dot + 1:])
+
+    gc.collect()
+
+
+# ONE PACKED RGB COLOR PER BATTERY PERCENT, RED - ORANGE - YELLOW - GREEN
+
+
+def battery_colors(steps=100):
+    import adafruit_fancyled.adafruit_fancyled as fancy
+
+    palette = fancy.expand_gradient([(0.0, 0xFF0000), (0.25, 0xFF7F00), (0.50, 0xFFFF00), (0.75, 0x00FF00)], steps)
+    colors = tuple(fancy.palette_lookup(palette, i / steps).pack() for i in range(steps))
+
+    del fancy
+    release('adafruit_fancyled')
+    return colors
+
+
+class cell_layout:
+    def __init__(self, disp, font, glyphs, char_width, char_height, char_start, line_space, line_gap):
+        self.disp = disp
+        self.font = font
+        self.glyphs = glyphs
+        self.char_width = char_width
+        self.char_height = char_height
+        self.char_start = char_start
+        self.line_space = line_space
+        self.line_gap = line_gap
+
+    def y(self, row, gaps=0):
+        return self.char_start + (self.char_height + self.line_space) * row + self.line_gap * gaps
+
+    def label(self, text, color, column, row, gaps, name):
+        return self.disp.label(self.font, text, color, self.char_width * column, self.y(row, gaps), name)
+
+    def field(self, text, color, column, row, gaps, name):
+        if self.glyphs is not None:
+            return self.disp.glyph_field(self.glyphs, text, color, self.char_width * column, self.y(row, gaps), name)
+
+        return self.label(text, color, column, row, gaps, name)
+
+    # TEXT CENTERED ACROSS THE SCREEN, row 0 IS THE MIDDLE LINE
+
+    def message(self, text, color, row=0):
+        x = int((self.disp.width - len(text) * self.char_width) / 2)
+        return self.disp.label(self.font, text, color, x, int(self.disp.height / 2) + row * (self.char_height + 2), 'message_text')
+
+
+class main_screen:
+    def __init__(self, layout, bat_x, bat_y, grid_precision, clock_color, compass_color, date_color, gps_color, grid_color, location_color, sat_color):
+        self._layout = layout
+        disp = layout.disp
+        label = layout.label
+        field = layout.field
+
+        # BATTERY GAUGE AND HOURS REMAINING
+        self.bat_progress_bar = disp.progress_bar(disp.width - bat_x, 0, bat_x, bat_y, value=0, min_value=0, max_value=100, fill_color=0x000000, outline_color=0xFFFFFF, bar_color=0x00FF00)
+        self.bat_hours_text = label(' ' * 4, date_color, 19, 0, 0, 'bat_hours_text')
+
+        # TIME AND DATE
+        self.utc_clock_text = field(' ' * 8, clock_color, 0, 0, 0, 'utc_clock_text')
+        self.utc_clock_label = label('UTC', clock_color, 9, 0, 0, 'utc_clock_label')
+        self.utc_date_text = label(' ' * 16, date_color, 0, 1, 0, 'utc_date_text')
+        self.tz_clock_text = field(' ' * 8, clock_color, 0, 2, 1, 'tz_clock_text')
+        self.tz_clock_label = label('   ', clock_color, 9, 2, 1, 'tz_clock_label')
+        self.tz_date_text = label(' ' * 16, date_color, 0, 3, 1, 'tz_date_text')
+
+        # LATITUDE / LONGITUDE / GRID
+        self.lat_label = label('Lat:', location_color, 0, 4, 2, 'lat_label')
+        self.lat_text = field(' ' * 8, location_color, 6, 4, 2, 'lat_text')
+        self.grid_text = label(' ' * grid_precision, grid_color, columns - grid_precision, 4, 2, 'grid_text')
+        self.lon_label = label('Lon:', location_color, 0, 5, 2, 'lon_label')
+        self.lon_text = field(' ' * 9, location_color, 5, 5, 2, 'lon_text')
+        self.gps_update_text = label(' ', gps_color, 25, 5, 2, 'gps_update_text')
+
+        # ALTITUDE / SPEED / TRACK
+        self.alt_label = label('Alt:', location_color, 0, 6, 3, 'alt_label')
+        self.alt_ft_text = field(' ' * 5, location_color, 6, 6, 3, 'alt_ft_text')
+        self.alt_ft_label = label('FT', location_color, 12, 6, 3, 'alt_ft_label')
+        self.alt_m_text = field(' ' * 5, location_color, 19, 6, 3, 'alt_m_text')
+        self.alt_m_label = label('M', location_color, 25, 6, 3, 'alt_m_label')
+        self.speed_label = label('Spd:', location_color, 0, 7, 3, 'speed_label')
+        self.speed_text = field(' ' * 5, location_color, 6, 7, 3, 'speed_text')
+        self.track_label = label('Trk:', location_color, 13, 7, 3, 'track_label')
+        self.track_text = field(' ' * 5, location_color, 19, 7, 3, 'track_text')
+
+        # SATELLITES / COMPASS
+        self.sat_count_label = label('Satellites:', sat_color, 0, 8, 4, 'sat_count_label')
+        self.sat_count_text = field('  ', sat_color, 12, 8, 4, 'sat_count_text')
+        self.comp_text = label('   ', compass_color, 23, 8, 4, 'comp_text')
+
+        self.group = disp.group()
+
+        for element in (self.bat_progress_bar, self.bat_hours_text, self.utc_clock_text, self.utc_clock_label, self.utc_date_text, self.tz_clock_text, self.tz_clock_label,
+                        self.tz_date_text, self.lat_label, self.lat_text, self.grid_text, self.lon_label, self.lon_text, self.gps_update_text, self.alt_label, self.alt_ft_text,
+                        self.alt_ft_label, self.alt_m_text, self.alt_m_label, self.speed_label, self.speed_text, self.track_label, self.track_text, self.sat_count_label,
+                        self.sat_count_text, self.comp_text):
+            self.group.append(element)
+
+    # THE GRID SQUARE ENDS AT THE RIGHT EDGE WHATEVER ITS PRECISION
+
+    def move_grid(self, precision):
+        self.grid_text.x = self._layout.char_width * (columns - precision)
+
+
+class text_page:
+    def __init__(self, layout, lines, color, name='page_text'):
+        self.group = layout.disp.group()
+        self.text = []
+
+        for i in range(lines):
+            self.text.append(layout.label(' ', color, 0, i, 0, name))
+            self.group.append(self.text[i])
+
+
+class message_page:
+    def __init__(self, layout, text, color):
+        self.group = layout.disp.group()
+        self.text = layout.message(text, color)
+        self.group.append(self.text)
@@ -0,0 +1,766 @@
+# HAM RADIO GPS - PURE FUNCTION MICRO-BENCHMARKS
+#
+# TIMES THE PURE LOGIC CODE.PY RUNS, IMPORTED STRAIGHT FROM Circuitpython/hamgps UNDER CPYTHON (NONE OF
+# THESE MODULES IMPORT A HARDWARE MODULE):
+#
+#   grid.locator            (WAS calc_grid)         compass.heading         (WAS comp_degree / comp_direction)
+#   grid.grid_engine        (CACHED GRID SQUARE)    power.bat_level
+#   ubx.ubx_checksum                                timekeeping.clock_engine (WAS comp_date_time)
+#   tzrules.time_zone       (RANDOM TIMES, SEARCH AND NEW YEAR COMPILES)
+#   nmea.nmea_reader        (PER SENTENCE)          ubx.nav_pvt             (PER FRAME)
+#   fmt.number_field        (LATITUDE, 8.4, SEE Circuitpython/bench_fmt.py FOR ITS ALLOCATION ON THE BOARD)
+#   sky.nav_sat             (PER NAV-SAT RESPONSE, ONLY WHEN THE CAPTURE HAS ANY)
+#
+# INPUTS ARE RANDOM LAT / LON AND MAGNETOMETER READINGS FROM A FIXED SEED AND AN NMEA / UBX CORPUS, THE
+# SYNTHETIC CAPTURE THE SIMULATOR USES OR A RECORDED ONE (--capture).
+#
+# EVERY CASE IS FIRST CHECKED AGAINST A REFERENCE IMPLEMENTATION (THE ORIGINAL CODE.PY FUNCTIONS, THE
+# SIMULATOR'S CHECKSUM, time.gmtime(), THE C LIBRARY'S POSIX TZ RULES, THE HOST TRACK TOOL'S NMEA / UBX
+# DECODER) AND MAIDENHEAD LOCATORS
+# ARE ROUND TRIPPED THROUGH grid.decode(). A WRONG ANSWER FAILS THE RUN BEFORE ANYTHING IS TIMED.
+#
+# ns / call IS THE BEST OF --repeats RUNS OF --number CALLS (time.perf_counter_ns, LOOP INCLUDED).
+# ALLOCATIONS COME FROM tracemalloc: THE PEAK HEAP ABOVE THE STARTING POINT DURING ONE CALL AND THE HEAP
+# STILL HELD PER CALL AFTER --number CALLS. CPYTHON FREES OBJECTS AS SOON AS THEY ARE DROPPED, SO A CALL
+# THAT ALLOCATES AND FREES SHOWS UP IN THE PEAK ONLY (SEE Circuitpython/bench_nmea.py FOR gc.mem_alloc()
+# ON THE BOARD).
+#
+# --save WRITES THE RESULTS TO THE BASELINE FILE, --check COMPARES WITH IT AND EXITS 1 WHEN A CASE IS
+# SLOWER THAN THE BASELINE BY MORE THAN --threshold PERCENT OR ITS PEAK HEAP HAS GROWN. TIMINGS ONLY
+# COMPARE ON THE SAME MACHINE, SO THE BASELINE IS NOT KEPT IN THE REPOSITORY.
+#
+# EXAMPLES:
+#
+#   python Host/bench_suite.py
+#   python Host/bench_suite.py --save
+#   python Host/bench_suite.py --check --threshold 20
+#   python Host/bench_suite.py --capture drive.nmea --only nmea
+
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import sim_capture
+import track_tool
+
+host_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(host_dir), 'Circuitpython'))
+
+from hamgps import grid
+from hamgps import timekeeping
+from hamgps import tzrules
+from hamgps.compass import heading
+from hamgps.fmt import number_field
+from hamgps.nmea import nmea_reader
+from hamgps.power import bat_level
+from hamgps.sky import nav_sat
+from hamgps.ubx import command_ack, command_timeout, nav_pvt, ubx_checksum, ubx_message, ubx_transport
+
+default_baseline = os.path.join(host_dir, 'bench_baseline.json')
+
+# CODE.PY DEFAULTS
+bat_curve = (48500, 49600, 50900, 51400, 52000, 52900, 53900, 55900, 56900, 58000, 65535)
+timezone = 'CST6CDT,M3.2.0,M11.1.0'
+
+# ZONES THE CLOCK IS ALSO CHECKED IN: HALF AND QUARTER HOUR OFFSETS, SOUTHERN HEMISPHERE DST OVER NEW YEAR,
+# NEGATIVE AND PAST 24 HOUR TRANSITION TIMES, Jn AND n RULES (NOT DST ALL YEAR AS 0/0,J365/25, GLIBC LOOKS
+# THE RULES UP FOR THE UTC YEAR AND SHOWS STANDARD TIME FOR THE HOURS BEFORE THE START AT NEW YEAR)
+check_zones = (timezone, 'CET-1CEST,M3.5.0,M10.5.0/3', 'GMT0BST,M3.5.0/1,M10.5.0', 'ACST-9:30ACDT,M10.1.0,M4.1.0/3',
+               'NZST-12NZDT,M9.5.0,M4.1.0/3', '<+0545>-5:45', '<-03>3<-02>,M3.5.0/-2,M10.5.0/-1', 'IST-2IDT,M3.4.4/26,M10.5.0',
+               '<-0330>3:30<-0230>,J60/2,300/2')
+
+# LARGEST HEADING ERROR OF THE atan TABLE, DEGREES (SEE compass.py)
+heading_tolerance = 0.12
+
+
+# REFERENCE IMPLEMENTATIONS, AS THEY WERE IN CODE.PY
+
+
+def ref_calc_grid(latitude, longitude):
+    grid_lat_adj = latitude + 90
+    grid_lat_sq = grid.grid_upper[int(grid_lat_adj / 10)]
+    grid_lat_field = str(int(grid_lat_adj % 10))
+    grid_lat_rem = (grid_lat_adj - int(grid_lat_adj)) * 60
+    grid_lat_subsq = grid.grid_lower[int(grid_lat_rem / 2.5)]
+
+    grid_lon_adj = longitude + 180
+    grid_lon_sq = grid.grid_upper[int(grid_lon_adj / 20)]
+    grid_lon_field = str(int((grid_lon_adj / 2) % 10))
+    grid_lon_rem = (grid_lon_adj - int(grid_lon_adj / 2) * 2) * 60
+    grid_lon_subsq = grid.grid_lower[int(grid_lon_rem / 5)]
+
+    return grid_lon_sq + grid_lat_sq + grid_lon_field + grid_lat_field + grid_lon_subsq + grid_lat_subsq
+
+
+def ref_comp_degree(x_axis, y_axis, offset_x, offset_y, declination, flip_x, flip_y, swap):
+    x_axis -= offset_x
+    y_axis -= offset_y
+
+    if flip_x:
+        x_axis *= -1
+
+    if flip_y:
+        y_axis *= -1
+
+    if swap:
+        x_axis, y_axis = y_axis, x_axis
+
+    if x_axis > 0 and y_axis == 0:
+        angle = declination
+    elif x_axis < 0 and y_axis == 0:
+        angle = 180 + declination
+    elif y_axis > 0:
+        angle = 90 - math.atan(x_axis / y_axis) * 180 / math.pi + declination
+    elif y_axis < 0:
+        angle = 270 - math.atan(x_axis / y_axis) * 180 / math.pi + declination
+    else:
+        return -1
+
+    return angle % 360
+
+
+ref_comp_angle = (11.25, 33.75, 56.25, 78.75, 101.25, 123.75, 146.25, 168.75, 191.25, 213.75, 236.25, 258.75, 281.25, 303.75, 326.25, 348.75)
+ref_comp_point = ('NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
+
+
+def ref_comp_direction(degrees):
+    if degrees == -1:
+        return '---'
+
+    if degrees < 11.25 or degrees >= 348.75:
+        return 'N'
+
+    for i in range(15):
+        if ref_comp_angle[i] <= degrees < ref_comp_angle[i] + 22.5:
+            return ref_comp_point[i]
+
+
+def ref_bat_level(adc_value, curve):
+    for percent in range(10, 1, -1):
+        if curve[percent - 1] < adc_value <= curve[percent]:
+            return percent * 10
+
+    return 0
+
+
+# LOCAL time.struct_time FOR EACH UTC SECOND IN A POSIX TZ ZONE, FROM THE C LIBRARY
+
+
+def ref_local_times(zone, seconds):
+    os.environ['TZ'] = zone
+    time.tzset()
+
+    try:
+        return [time.localtime(secs) for secs in seconds]
+    finally:
+        os.environ['TZ'] = 'UTC'
+        time.tzset()
+
+
+def ref_date_time(secs, local):
+    utc = time.gmtime(secs)
+    date_format = '%a %b %d, %Y'
+    return time.strftime('%H:%M:%S', utc), time.strftime(date_format, utc).upper(), time.strftime('%H:%M:%S', local), time.strftime(date_format, local).upper(), local.tm_zone
+
+
+# UTC SECONDS THE OFFSET OF zone CHANGES BETWEEN start AND end, FOUND FROM THE C LIBRARY
+
+
+def ref_transitions(zone, start, end, step):
+    seconds = list(range(start, end, step))
+    offsets = [local.tm_gmtoff for local in ref_local_times(zone, seconds)]
+    found = []
+
+    for i in range(1, len(seconds)):
+        if offsets[i] != offsets[i - 1]:
+            low, high = seconds[i - 1], seconds[i]
+
+            while high - low > 1:
+                middle = (low + high) // 2
+
+                if ref_local_times(zone, [middle])[0].tm_gmtoff == offsets[i]:
+                    high = middle
+                else:
+                    low = middle
+
+            found.append(high)
+
+    return found
+
+
+# IN-MEMORY UART, EACH read HANDS OVER THE NEXT FRAME OF THE CORPUS LIKE A UART POLLED AS DATA ARRIVES
+
+
+class memory_uart:
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+        self.data = b''
+        self.timeout = 0
+
+    def next_frame(self):
+        self.data = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def readinto(self, buf, nbytes=None):
+        count = min(len(buf), len(self.data))
+        buf[:count] = self.data[:count]
+        self.data = self.data[count:]
+        return count
+
+    def write(self, data):
+        return len(data)
+
+
+# CLOCK THE CHECKS SET BY HAND
+
+
+class step_clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+# INPUTS
+
+
+class corpus:
+    def __init__(self, seed, points, capture):
+        rand = random.Random(seed)
+        self.positions = [(rand.uniform(-89.9, 89.9), rand.uniform(-179.9, 179.9)) for _ in range(points)]
+        self.magnetic = [(rand.gauss(30.9, 40), rand.gauss(-20.5, 40)) for _ in range(points)]
+        self.batteries = [rand.randint(47000, 60000) for _ in range(points)]
+        self.start_secs = 1678600000 - points // 2
+
+        # A DRIVE: SMALL STEPS, THE GRID SQUARE ONLY CHANGES NOW AND THEN
+        lat, lon = 41.8781, -87.6298
+        self.drive = []
+
+        for _ in range(points):
+            lat += rand.uniform(0, 0.0002)
+            lon += rand.uniform(0, 0.0002)
+            self.drive.append((lat, lon))
+
+        epochs = sim_capture.load_capture(capture) if capture else sim_capture.synth_epochs(120)
+        self.nmea = [frame for epoch in epochs for key, frame in epoch if key in (sim_capture.key_nmea_rmc, sim_capture.key_nmea_gga)]
+        self.ubx = [frame for epoch in epochs for key, frame in epoch if key == sim_capture.key_nav_pvt]
+        self.sat = [frame for epoch in epochs for key, frame in epoch if key == sim_capture.key_nav_sat]
+        self.capture = capture
+
+
+# CORRECTNESS, EACH CHECK RETURNS A LIST OF FAILURES
+
+
+def check_grid(data):
+    failures = []
+
+    for lat, lon in data.positions:
+        if grid.locator(lat, lon) != ref_calc_grid(lat, lon):
+            failures.append('locator({}, {}) = {}, calc_grid {}'.format(lat, lon, grid.locator(lat, lon), ref_calc_grid(lat, lon)))
+
+        for precision in (6, 8, 10):
+            text = grid.locator(lat, lon, precision)
+            (center_lat, center_lon), (south, west, north, east) = grid.decode(text)
+
+            if not (south <= lat < north and west <= lon < east) or grid.locator(center_lat, center_lon, precision) != text:
+                failures.append('{} does not round trip ({}, {})'.format(text, lat, lon))
+
+        if grid.locator_from_square(grid.square_index(lat, lon)) != grid.locator(lat, lon):
+            failures.append('square index of ({}, {}) does not round trip'.format(lat, lon))
+
+    engine = grid.grid_engine(6)
+
+    for lat, lon in data.drive:
+        engine.update(lat, lon)
+
+        if engine.square != grid.locator(lat, lon):
+            failures.append('grid_engine {} at ({}, {}), locator {}'.format(engine.square, lat, lon, grid.locator(lat, lon)))
+
+    return failures
+
+
+def check_compass(data):
+    failures = []
+
+    for flip_x, flip_y, swap in ((False, False, False), (True, False, False), (False, True, True), (True, True, True)):
+        comp = heading(30.9, -20.5, -3.4, flip_x, flip_y, swap)
+
+        for x, y in data.magnetic:
+            expected = ref_comp_degree(x, y, 30.9, -20.5, -3.4, flip_x, flip_y, swap)
+            got = comp.degrees(x, y)
+            error = abs((got - expected + 180) % 360 - 180)
+
+            if error > heading_tolerance:
+                failures.append('heading({}, {}) = {}, comp_degree {}'.format(x, y, got, expected))
+
+            # NEAR A SECTOR BOUNDARY THE TABLE ERROR CAN PICK THE NEIGHBOURING POINT
+            if abs(expected % 22.5 - 11.25) > heading_tolerance and comp.direction(x, y) != ref_comp_direction(expected):
+                failures.append('direction({}, {}) = {}, comp_direction {}'.format(x, y, comp.direction(x, y), ref_comp_direction(expected)))
+
+    return failures
+
+
+def check_battery(data):
+    return ['bat_level({})'.format(value) for value in data.batteries + list(bat_curve) if bat_level(value, bat_curve) != ref_bat_level(value, bat_curve)]
+
+
+def check_checksum(data):
+    failures = []
+
+    for frame in data.ubx + [sim_capture.ubx_frame(0x06, 0x01, bytes(8))]:
+        if bytes(ubx_checksum(memoryview(frame)[2:-2])) != sim_capture.ubx_checksum(frame[2:-2]):
+            failures.append('checksum of {}'.format(frame[:6].hex()))
+
+    return failures
+
+
+def check_clock(data):
+    failures = []
+
+    for zone in check_zones:
+        engine = timekeeping.clock_engine(tzrules.time_zone(zone))
+
+        # ONE SECOND STEPS (THE DRIVE, AND ACROSS EVERY CHANGE OF OFFSET), THEN JUMPS EVERY 6 HOURS OVER THREE
+        # YEARS AND ACROSS NEW YEAR
+        seconds = [data.start_secs + i for i in range(len(data.positions))]
+
+        for change in ref_transitions(zone, 1672531200, 1767225600, 21600):
+            seconds += range(change - 3, change + 3)
+
+        seconds += [1672531200 + i * 21601 for i in range(4500)] + [1704088800 + i * 61 for i in range(200)]
+
+        for secs, local in zip(seconds, ref_local_times(zone, seconds)):
+            engine.update(secs)
+            got = (engine.utc_time, engine.utc_date, engine.tz_time, engine.tz_date, engine.tz_desc)
+
+            if got != ref_date_time(secs, local):
+                failures.append('{} clock at {}: {}, expected {}'.format(zone, secs, got, ref_date_time(secs, local)))
+
+    return failures
+
+
+# NUMBER FIELDS AGAINST str.format(), THE LAST DIGIT MAY DIFFER BY ONE (round() OF value * 10 ** decimals
+# AGAINST format() OF THE BINARY VALUE) AND -0.0 HAS NO SIGN
+
+
+def check_fmt(data):
+    failures = []
+    values = [(8, 4, lat) for lat, lon in data.positions] + [(9, 4, lon) for lat, lon in data.positions]
+    values += [(5, 1, value) for value in (0.0, 0.04, -0.04, 0.05, 99.95, 999.9, -99.9, 1e6)] + [(5, 0, value) for value in (0, 7, -42, 99999, -9999, -10000)]
+
+    for width, decimals, value in values:
+        field = number_field(width, decimals)
+        field.set(value)
+        expected = '{:.{}f}'.format(value, decimals) if decimals else str(int(value))
+
+        if len(expected) > width:
+            expected = '-' * width
+
+        got = field.text
+
+        if len(got) != width or got != got.rjust(width) or (expected.startswith('-' * width) != got.startswith('-' * width)):
+            failures.append('number_field({}, {}) of {} = {!r}, expected {!r}'.format(width, decimals, value, got, expected))
+        elif not got.startswith('-' * width) and abs(float(got) - float(expected)) > 1.01 * 10 ** -decimals:
+            failures.append('number_field({}, {}) of {} = {!r}, expected {!r}'.format(width, decimals, value, got, expected))
+
+    return failures
+
+
+# READER STATE AFTER EVERY FRAME AGAINST THE HOST TRACK TOOL'S DECODER (ON THE SAME FRAMES)
+
+
+def check_reader(reader_type, frames):
+    failures = []
+    handle, path = tempfile.mkstemp(suffix='.capture')
+
+    with os.fdopen(handle, 'wb') as capture_file:
+        capture_file.write(b''.join(frames))
+
+    try:
+        expected = [fix for fix in track_tool.capture_fixes(path, track_tool.counters()) if fix[track_tool.fix_lat] is not None]
+    finally:
+        os.remove(path)
+
+    uart = memory_uart(frames)
+    reader = reader_type(uart)
+    got = []
+
+    for _ in frames:
+        uart.next_frame()
+
+        if reader.update() and reader.has_fix and reader.latitude is not None and (not got or got[-1] != (reader.latitude, reader.longitude)):
+            got.append((reader.latitude, reader.longitude))
+
+    if len(got) != len(expected):
+        failures.append('{} fixes, expected {}'.format(len(got), len(expected)))
+
+    for (lat, lon), fix in zip(got, expected):
+        if abs(lat - fix[track_tool.fix_lat]) > 1e-6 or abs(lon - fix[track_tool.fix_lon]) > 1e-6:
+            failures.append('fix ({}, {}), expected ({}, {})'.format(lat, lon, fix[track_tool.fix_lat], fix[track_tool.fix_lon]))
+
+    return failures
+
+
+# A NON NAV-PVT HEADER WITH A CORRUPT LENGTH MUST NOT SWALLOW THE FRAMES AFTER IT
+
+
+def check_corrupt_header(frames):
+    uart = memory_uart([b'\xb5\x62\x01\x35\xff\xff'] + frames)
+    reader = nav_pvt(uart)
+    decoded = 0
+
+    for _ in range(len(frames) + 1):
+        uart.next_frame()
+        decoded += reader.update()
+
+    return [] if decoded == len(frames) else ['{} of {} frames decoded after a corrupt header'.format(decoded, len(frames))]
+
+
+# NAV-SAT RECORDS AGAINST struct.unpack OF THE SAME FRAME, A CORRUPTED COPY MUST BE REFUSED AND LEAVE THE
+# LAST GOOD SET IN PLACE
+
+
+def feed_sat(decoder, frame):
+    if not decoder.start(frame, len(frame) - 8):
+        return False
+
+    decoder.feed(frame, 6, len(frame) - 6)
+    return decoder.end()
+
+
+def check_sat(data):
+    failures = []
+    decoder = nav_sat(64)
+
+    for frame in data.sat:
+        if not feed_sat(decoder, frame):
+            failures.append('frame of {} bytes refused'.format(len(frame)))
+            continue
+
+        expected = [struct.unpack_from('<BBBbh2xI', frame, 14 + 12 * n) for n in range(frame[11])]
+        got = [(decoder.gnss[n], decoder.sv[n], decoder.cno[n], decoder.elev[n], decoder.azim[n], decoder.used[n]) for n in range(decoder.count)]
+
+        if got != [(gnss, sv, cno, elev, azim, 1 if flags & 0x08 else 0) for gnss, sv, cno, elev, azim, flags in expected]:
+            failures.append('records {}, expected {}'.format(got, expected))
+
+        corrupted = bytearray(frame)
+        corrupted[20] ^= 0xFF
+
+        if feed_sat(decoder, corrupted) or decoder.cno[0] != got[0][2]:
+            failures.append('corrupted frame accepted')
+
+    return failures
+
+
+# A NAV-SAT POLL (AS CODE.PY SENDS IT) THAT TIMES OUT PART WAY THROUGH ITS RESPONSE WITH A CFG-RATE QUEUED
+# BEHIND IT, THE REST OF THE RESPONSE MUST PASS THROUGH AND THE CFG-RATE ACK STILL BE MATCHED
+
+
+def check_sink_timeout(data):
+    frame = data.sat[0]
+    clock = step_clock()
+    uart = memory_uart([frame[:40], frame[40:] + ubx_message(0x05, 0x01, b'\x06\x08')])
+    transport = ubx_transport(uart, clock)
+    poll = transport.poll(0x01, 0x35, timeout=1.5, tries=1, sink=nav_sat(64))
+    rate = transport.send(0x06, 0x08, struct.pack('<HHH', 1000, 1, 1))
+
+    try:
+        clock.now = 1.45
+        uart.next_frame()
+        transport.service()
+        clock.now = 1.6
+        transport.service()
+        uart.next_frame()
+        transport.service()
+    except AttributeError as error:
+        return ['poll timed out during its response: {}'.format(error)]
+
+    if poll.state != command_timeout or rate.state != command_ack:
+        return ['poll state {}, CFG-RATE state {}, expected {} and {}'.format(poll.state, rate.state, command_timeout, command_ack)]
+
+    return []
+
+
+# CASES: NAME, CORRECTNESS CHECK, AND A FACTORY RETURNING run(n) THAT MAKES n CALLS
+
+
+def grid_locator_case(data, precision):
+    positions = data.positions
+    count = len(positions)
+
+    def run(n):
+        locator = grid.locator
+
+        for i in range(n):
+            lat, lon = positions[i % count]
+            locator(lat, lon, precision)
+
+    return run
+
+
+def grid_engine_case(data):
+    drive = data.drive
+    count = len(drive)
+    engine = grid.grid_engine(6)
+
+    def run(n):
+        update = engine.update
+
+        for i in range(n):
+            lat, lon = drive[i % count]
+            update(lat, lon)
+
+    return run
+
+
+def heading_case(data, method):
+    magnetic = data.magnetic
+    count = len(magnetic)
+    comp = heading(30.9, -20.5, -3.4)
+
+    def run(n):
+        call = getattr(comp, method)
+
+        for i in range(n):
+            x, y = magnetic[i % count]
+            call(x, y)
+
+    return run
+
+
+def battery_case(data):
+    values = data.batteries
+    count = len(values)
+
+    def run(n):
+        for i in range(n):
+            bat_level(values[i % count], bat_curve)
+
+    return run
+
+
+def checksum_case(data):
+    view = memoryview(data.ubx[-1])[2:-2]
+
+    def run(n):
+        for _ in range(n):
+            ubx_checksum(view)
+
+    return run
+
+
+def clock_case(data):
+    engine = timekeeping.clock_engine(tzrules.time_zone(timezone))
+    state = [data.start_secs]
+
+    def run(n):
+        secs = state[0]
+        update = engine.update
+
+        for i in range(n):
+            update(secs + i)
+
+        state[0] = secs + n
+
+    return run
+
+
+# OFFSETS AT RANDOM TIMES OVER 20 YEARS, EVERY CALL SEARCHES THE TABLE AND MOST COMPILE A NEW YEAR
+
+
+def zone_case(data):
+    zone = tzrules.time_zone(check_zones[3])
+    rand = random.Random(len(data.positions))
+    seconds = [rand.randrange(1262304000, 1893456000) for _ in data.positions]
+
+    def run(n):
+        at = zone.at
+
+        for i in range(n):
+            at(seconds[i % len(seconds)])
+
+    return run
+
+
+def number_case(data):
+    values = [lat for lat, lon in data.positions]
+    count = len(values)
+    field = number_field(8, 4)
+
+    def run(n):
+        set_value = field.set
+
+        for i in range(n):
+            set_value(values[i % count])
+
+    return run
+
+
+def reader_case(reader_type, frames):
+    uart = memory_uart(frames)
+    reader = reader_type(uart)
+
+    def run(n):
+        next_frame = uart.next_frame
+        update = reader.update
+
+        for _ in range(n):
+            next_frame()
+            update()
+
+    return run
+
+
+def sat_case(data):
+    frames = data.sat
+    count = len(frames)
+    decoder = nav_sat(32)
+
+    def run(n):
+        for i in range(n):
+            feed_sat(decoder, frames[i % count])
+
+    return run
+
+
+def build_cases(data):
+    sat_cases = [('sky.nav_sat', lambda: check_sat(data) + check_sink_timeout(data), lambda: sat_case(data))] if data.sat else []
+
+    return [
+        ('grid.locator 6', lambda: check_grid(data), lambda: grid_locator_case(data, 6)),
+        ('grid.locator 10', lambda: [], lambda: grid_locator_case(data, 10)),
+        ('grid.grid_engine', lambda: [], lambda: grid_engine_case(data)),
+        ('compass.centidegrees', lambda: check_compass(data), lambda: heading_case(data, 'centidegrees')),
+        ('compass.direction', lambda: [], lambda: heading_case(data, 'direction')),
+        ('power.bat_level', lambda: check_battery(data), lambda: battery_case(data)),
+        ('ubx.ubx_checksum', lambda: check_checksum(data), lambda: checksum_case(data)),
+        ('timekeeping.clock', lambda: check_clock(data), lambda: clock_case(data)),
+        ('tzrules.time_zone', lambda: [], lambda: zone_case(data)),
+        ('fmt.number_field', lambda: check_fmt(data), lambda: number_case(data)),
+        ('nmea.nmea_reader', lambda: check_reader(nmea_reader, data.nmea), lambda: reader_case(nmea_reader, data.nmea)),
+        ('ubx.nav_pvt', lambda: check_reader(nav_pvt, data.ubx) + check_corrupt_header(data.ubx), lambda: reader_case(nav_pvt, data.ubx)),
+    ] + sat_cases
+
+
+def measure(run, number, repeats):
+    run(number)
+    best = None
+
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        run(number)
+        elapsed = time.perf_counter_ns() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    run(1)
+    _, peak = tracemalloc.get_traced_memory()
+    run(number)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'ns_per_call': round(best / number, 1), 'peak_bytes': max(0, peak - start), 'held_bytes_per_call': round(max(0, held - start) / number, 2)}
+
+
+# REGRESSIONS AGAINST THE BASELINE: SLOWER BY MORE THAN threshold PERCENT, OR A LARGER PEAK HEAP
+
+
+def compare(results, baseline, threshold):
+    failures = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        before = baseline[name]
+
+        if result['ns_per_call'] > before['ns_per_call'] * (1 + threshold / 100):
+            failures.append('{}: {} ns per call, baseline {} (+{:.0f} %)'.format(name, result['ns_per_call'], before['ns_per_call'], (result['ns_per_call'] / before['ns_per_call'] - 1) * 100))
+
+        if result['peak_bytes'] > before['peak_bytes']:
+            failures.append('{}: peak heap {} bytes, baseline {}'.format(name, result['peak_bytes'], before['peak_bytes']))
+
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check and time the pure functions code.py runs')
+    parser.add_argument('--capture', help='recorded NMEA / UBX capture for the reader cases (default: synthetic)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the random lat / lon and magnetometer inputs')
+    parser.add_argument('--points', type=int, default=2000, help='random inputs per case')
+    parser.add_argument('--number', type=int, default=20000, help='calls per timing run')
+    parser.add_argument('--repeats', type=int, default=5, help='timing runs, the best is kept')
+    parser.add_argument('--only', help='run only the cases whose name contains this text')
+    parser.add_argument('--baseline', default=default_baseline, help='baseline results file')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--check', action='store_true', help='fail when a case has regressed against the baseline')
+    parser.add_argument('--threshold', type=float, default=25, help='allowed slowdown against the baseline in percent')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    options = parser.parse_args(argv)
+
+    # CIRCUITPYTHON HAS NO TIMEZONES, time.localtime() RETURNS UTC ON THE BOARD
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    data = corpus(options.seed, options.points, options.capture)
+    results = {}
+    failures = []
+
+    if not options.json:
+        print('case                    ns/call   peak bytes  held bytes/call')
+
+    for name, check, factory in build_cases(data):
+        if options.only and options.only not in name:
+            continue
+
+        wrong = check()
+
+        if wrong:
+            failures += ['{}: {}'.format(name, failure) for failure in wrong[:5]]
+            continue
+
+        result = measure(factory(), options.number, options.repeats)
+        results[name] = result
+
+        if not options.json:
+            print('{:22s} {:9.1f} {:12d} {:16.2f}'.format(name, result['ns_per_call'], result['peak_bytes'], result['held_bytes_per_call']))
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+
+    if options.check:
+        if not os.path.exists(options.baseline):
+            raise SystemExit('no baseline at {}, run with --save first'.format(options.baseline))
+
+        with open(options.baseline) as baseline_file:
+            failures += compare(results, json.load(baseline_file), options.threshold)
+
+    if options.save and not failures:
+        with open(options.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+
+    for failure in failures:
+        print('FAIL ' + failure)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
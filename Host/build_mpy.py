@@ -0,0 +1,102 @@
+# HAM RADIO GPS - PRECOMPILE THE FIRMWARE MODULES
+#
+# IMPORTING A .py ON THE BOARD COMPILES IT FIRST: THE SOURCE IS READ, PARSED AND TURNED INTO BYTECODE IN
+# RAM, WHICH TAKES TIME AT EVERY BOOT AND NEEDS FAR MORE HEAP WHILE IT RUNS THAN THE BYTECODE ITSELF. A
+# .mpy IS THAT BYTECODE ALREADY, THE IMPORT ONLY LOADS IT.
+#
+# mpy-cross COMPILES EVERY Circuitpython/hamgps/*.py INTO <out>/hamgps/*.mpy AND code.py / boot.py ARE
+# COPIED NEXT TO THEM AS THEY ARE (CIRCUITPYTHON ONLY RUNS code.py AND boot.py FROM SOURCE). mpy-cross
+# MUST BE THE RELEASE MATCHING THE CIRCUITPYTHON ON THE BOARD, AN .mpy FROM ANOTHER VERSION FAILS TO
+# IMPORT WITH "incompatible .mpy file".
+#
+# --deploy COPIES THE BUILD ONTO CIRCUITPY AND REMOVES THE hamgps/*.py THERE THAT NOW HAVE A .mpy, A .py
+# IS IMPORTED BEFORE A .mpy OF THE SAME NAME.
+#
+# EXAMPLES:
+#
+#   python Host/build_mpy.py
+#   python Host/build_mpy.py --mpy-cross ~/bin/mpy-cross-9.2.1 --deploy /media/CIRCUITPY
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+host_dir = os.path.dirname(os.path.abspath(__file__))
+source_dir = os.path.join(os.path.dirname(host_dir), 'Circuitpython')
+default_out = os.path.join(os.path.dirname(host_dir), 'build')
+
+# FILES CIRCUITPYTHON RUNS AS SOURCE
+source_files = ('code.py', 'boot.py')
+
+
+# COMPILE hamgps INTO out, RETURNS THE .mpy PATHS
+
+
+def build(mpy_cross, out):
+    package_out = os.path.join(out, 'hamgps')
+    os.makedirs(package_out, exist_ok=True)
+    built = []
+
+    for path in sorted(glob.glob(os.path.join(source_dir, 'hamgps', '*.py'))):
+        target = os.path.join(package_out, os.path.splitext(os.path.basename(path))[0] + '.mpy')
+
+        try:
+            result = subprocess.run([mpy_cross, '-o', target, '-s', 'hamgps/' + os.path.basename(path), path], capture_output=True, text=True)
+        except FileNotFoundError:
+            raise SystemExit('{} not found, install the mpy-cross matching the CircuitPython on the board '
+                             '(pip install mpy-cross or the build from circuitpython.org) or give its path with --mpy-cross'.format(mpy_cross))
+
+        if result.returncode:
+            raise SystemExit('{} failed on {}:\n{}'.format(mpy_cross, path, result.stderr.strip()))
+
+        built.append(target)
+
+    for name in source_files:
+        shutil.copyfile(os.path.join(source_dir, name), os.path.join(out, name))
+
+    return built
+
+
+# COPY THE BUILD TO THE BOARD AND REMOVE THE SOURCE MODULES IT REPLACES
+
+
+def deploy(out, built, drive):
+    package_drive = os.path.join(drive, 'hamgps')
+    os.makedirs(package_drive, exist_ok=True)
+
+    for path in built:
+        name = os.path.basename(path)
+        shutil.copyfile(path, os.path.join(package_drive, name))
+        source = os.path.join(package_drive, os.path.splitext(name)[0] + '.py')
+
+        if os.path.exists(source):
+            os.remove(source)
+
+    for name in source_files:
+        shutil.copyfile(os.path.join(out, name), os.path.join(drive, name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile the hamgps modules to .mpy with mpy-cross')
+    parser.add_argument('--mpy-cross', default='mpy-cross', help='mpy-cross executable (default: mpy-cross on the PATH)')
+    parser.add_argument('--out', default=default_out, help='build directory (default: build/ in the repository)')
+    parser.add_argument('--deploy', metavar='DIR', help='also copy the build to this CIRCUITPY drive')
+    options = parser.parse_args(argv)
+
+    built = build(options.mpy_cross, options.out)
+    size_py = sum(os.path.getsize(path) for path in glob.glob(os.path.join(source_dir, 'hamgps', '*.py')))
+    size_mpy = sum(os.path.getsize(path) for path in built)
+    print('{} modules compiled to {}, {} bytes of source, {} bytes of .mpy'.format(len(built), os.path.join(options.out, 'hamgps'), size_py, size_mpy))
+
+    if options.deploy:
+        deploy(options.out, built, options.deploy)
+        print('deployed to {}'.format(options.deploy))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
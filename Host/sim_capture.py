@@ -0,0 +1,239 @@
+# HAM RADIO GPS - SIMULATOR CAPTURES
+#
+# LOADS RECORDED NMEA / UBX BYTE STREAMS AND BUILDS SYNTHETIC ONES FOR THE HOST SIMULATOR.
+# A CAPTURE IS SPLIT INTO FRAMES (ONE NMEA SENTENCE OR ONE UBX MESSAGE EACH), EVERY FRAME IS
+# TAGGED WITH ITS UBX CLASS / ID (NMEA SENTENCES USE CLASS 0xF0, THE SAME IDS CFG-MSG USES)
+# AND THE FRAMES ARE GROUPED INTO ONE EPOCH PER NAVIGATION SOLUTION.
+
+import math
+import struct
+import time
+
+# NMEA SENTENCE IDS AS USED BY UBX CFG-MSG (CLASS 0xF0)
+nmea_ids = {b'GGA': 0x00, b'GLL': 0x01, b'GSA': 0x02, b'GSV': 0x03, b'RMC': 0x04, b'VTG': 0x05}
+
+# UBX MESSAGE KEYS
+key_nav_pvt = (0x01, 0x07)
+key_nav_sat = (0x01, 0x35)
+key_nmea_gga = (0xF0, 0x00)
+key_nmea_rmc = (0xF0, 0x04)
+
+# FRAMES THAT START A NEW NAVIGATION EPOCH, IN ORDER OF PREFERENCE
+epoch_keys = (key_nmea_rmc, key_nav_pvt, key_nmea_gga)
+
+
+# CALCULATE CHECKSUMS FOR UBX MESSAGES (CLASS, ID, LENGTH AND PAYLOAD)
+
+
+def ubx_checksum(msg):
+    cs_a = 0
+    cs_b = 0
+
+    for byte in msg:
+        cs_a = (cs_a + byte) & 255
+        cs_b = (cs_b + cs_a) & 255
+
+    return bytes((cs_a, cs_b))
+
+
+def ubx_frame(msg_class, msg_id, payload):
+    body = bytes((msg_class, msg_id)) + len(payload).to_bytes(2, 'little') + payload
+    return b'\xb5\x62' + body + ubx_checksum(body)
+
+
+def nmea_sentence(body):
+    checksum = 0
+
+    for byte in body.encode('ascii'):
+        checksum ^= byte
+
+    return ('$' + body + '*{:02X}\r\n'.format(checksum)).encode('ascii')
+
+
+# SPLIT A RAW BYTE STREAM INTO (KEY, FRAME) PAIRS, BYTES THAT ARE NEITHER NMEA NOR UBX ARE SKIPPED
+
+
+def split_frames(data):
+    pos = 0
+    end = len(data)
+
+    while pos < end:
+        byte = data[pos]
+
+        if byte == 0x24:
+            line_end = data.find(b'\n', pos)
+
+            if line_end < 0:
+                return
+
+            frame = bytes(data[pos:line_end + 1])
+            comma = frame.find(b',')
+            key = (0xF0, nmea_ids.get(frame[3:comma], 0xFF)) if comma > 3 else (0xF0, 0xFF)
+            yield key, frame
+            pos = line_end + 1
+        elif byte == 0xB5 and pos + 8 <= end and data[pos + 1] == 0x62:
+            length = data[pos + 4] | (data[pos + 5] << 8)
+            frame_end = pos + 8 + length
+
+            if frame_end > end:
+                return
+
+            yield (data[pos + 2], data[pos + 3]), bytes(data[pos:frame_end])
+            pos = frame_end
+        else:
+            pos += 1
+
+
+# GROUP FRAMES INTO EPOCHS, A NEW EPOCH STARTS EVERY TIME THE EPOCH KEY IS SEEN AGAIN
+
+
+def split_epochs(frames):
+    frames = list(frames)
+    keys = set(key for key, _ in frames)
+    start_key = None
+
+    for key in epoch_keys:
+        if key in keys:
+            start_key = key
+            break
+
+    epochs = []
+    epoch = []
+
+    for key, frame in frames:
+        if key == start_key and epoch:
+            epochs.append(epoch)
+            epoch = []
+
+        epoch.append((key, frame))
+
+    if epoch:
+        epochs.append(epoch)
+
+    return epochs
+
+
+def load_capture(path):
+    with open(path, 'rb') as capture_file:
+        data = capture_file.read()
+
+    return split_epochs(split_frames(data))
+
+
+def save_capture(path, epochs):
+    with open(path, 'wb') as capture_file:
+        for epoch in epochs:
+            for _, frame in epoch:
+                capture_file.write(frame)
+
+
+# UBX NAV-PVT PAYLOAD (92 BYTES, U-BLOX 8 PROTOCOL 18+)
+
+
+def nav_pvt_payload(tm, millis, fix, lat, lon, alt_m, speed_knots, track, sats):
+    speed_mm = int(speed_knots * 514.444)
+    vel_n = int(speed_mm * math.cos(math.radians(track)))
+    vel_e = int(speed_mm * math.sin(math.radians(track)))
+    itow = ((tm.tm_wday + 1) % 7 * 86400 + tm.tm_hour * 3600 + tm.tm_min * 60 + tm.tm_sec) * 1000 + millis
+    valid = 0x07 if fix else 0x03
+    fix_type = 3 if fix else 0
+    flags = 0x01 if fix else 0x00
+
+    return struct.pack('<IHBBBBBBIiBBBBiiiiIIiiiiiIIH6xihH',
+                       itow, tm.tm_year, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min, tm.tm_sec, valid,
+                       50, millis * 1000000, fix_type, flags, 0, sats if fix else 0,
+                       int(round(lon * 1e7)), int(round(lat * 1e7)), int(alt_m * 1000) - 34000, int(alt_m * 1000),
+                       2500, 4000, vel_n, vel_e, 0, speed_mm, int(track * 1e5), 400, 150000, 150,
+                       0, 0, 0)
+
+
+# UBX NAV-SAT PAYLOAD, sats ARE (GNSS, SV, C/N0, ELEVATION, AZIMUTH, USED)
+
+
+def nav_sat_payload(itow, sats):
+    payload = struct.pack('<IBB2x', itow, 1, len(sats))
+
+    for gnss, sv, cno, elev, azim, used in sats:
+        payload += struct.pack('<BBBbhhI', gnss, sv, cno, elev, azim, 0, (0x08 if used else 0) | (7 if cno else 1))
+
+    return payload
+
+
+def nmea_degrees(value, width):
+    value = abs(value)
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    return '{:0{}d}{:08.5f}'.format(degrees, width, minutes)
+
+
+# SYNTHETIC 1 HZ EPOCHS FOR A RECEIVER MOVING IN A STRAIGHT LINE
+# THE FIRST fix_delay EPOCHS HAVE NO FIX, EVERY EPOCH CARRIES ALL SIX DEFAULT NMEA SENTENCES, NAV-PVT AND
+# NAV-SAT (THE GSV SATELLITES, AZIMUTHS DRIFTING HALF A DEGREE A SECOND AND C/N0 WANDERING BY A FEW dBHz)
+
+
+# GPS TIME OF THE FIRST SYNTHETIC EPOCH
+synth_start = 1665400000
+
+# SV, ELEVATION, AZIMUTH, C/N0 OF THE SYNTHETIC SKY (SAME AS THE GSV SENTENCES) AND THE SVS IN THE FIX
+sky_sats = ((2, 45, 123, 38), (5, 30, 45, 35), (12, 60, 300, 41), (15, 10, 200, 22), (18, 25, 80, 30), (24, 70, 10, 44),
+            (25, 15, 250, 28), (29, 40, 160, 36), (31, 5, 330, 18), (40, 35, 190, 0), (41, 20, 220, 0))
+used_svs = (2, 5, 12, 15, 18, 24, 25, 29, 31)
+
+
+def synth_epochs(seconds, start_time=synth_start, lat=41.8781, lon=-87.6298, alt_m=181.0, speed_knots=12.0, track=45.0, sats=9, fix_delay=3, rate=1):
+    epochs = []
+    step = 1.0 / rate
+
+    for i in range(int(seconds * rate)):
+        secs = start_time + i * step
+        tm = time.gmtime(int(secs))
+        millis = int(round((secs - int(secs)) * 1000))
+        fix = i >= fix_delay * rate
+
+        if fix and i > fix_delay * rate:
+            dist_m = speed_knots * 0.514444 * step
+            lat += dist_m * math.cos(math.radians(track)) / 111320
+            lon += dist_m * math.sin(math.radians(track)) / (111320 * math.cos(math.radians(lat)))
+
+        hms = '{:02d}{:02d}{:02d}.{:02d}'.format(tm.tm_hour, tm.tm_min, tm.tm_sec, millis // 10)
+        dmy = '{:02d}{:02d}{:02d}'.format(tm.tm_mday, tm.tm_mon, tm.tm_year % 100)
+
+        if fix:
+            pos = '{},{},{},{}'.format(nmea_degrees(lat, 2), 'N' if lat >= 0 else 'S', nmea_degrees(lon, 3), 'E' if lon >= 0 else 'W')
+            rmc = 'GNRMC,{},A,{},{:.3f},{:.2f},{},,,A'.format(hms, pos, speed_knots, track, dmy)
+            vtg = 'GNVTG,{:.2f},T,,M,{:.3f},N,{:.3f},K,A'.format(track, speed_knots, speed_knots * 1.852)
+            gga = 'GNGGA,{},{},1,{:02d},0.90,{:.1f},M,-34.0,M,,'.format(hms, pos, sats, alt_m)
+            gsa = 'GNGSA,A,3,02,05,12,15,18,24,25,29,31,,,,1.60,0.90,1.32'
+            gll = 'GNGLL,{},{},A,A'.format(pos, hms)
+        else:
+            rmc = 'GNRMC,{},V,,,,,,,{},,,N'.format(hms, dmy)
+            vtg = 'GNVTG,,,,,,,,,N'
+            gga = 'GNGGA,{},,,,,0,00,99.99,,,,,,'.format(hms)
+            gsa = 'GNGSA,A,1,,,,,,,,,,,,,99.99,99.99,99.99'
+            gll = 'GNGLL,,,,,{},V,N'.format(hms)
+
+        gsv = ('GPGSV,3,1,11,02,45,123,38,05,30,045,35,12,60,300,41,15,10,200,22',
+               'GPGSV,3,2,11,18,25,080,30,24,70,010,44,25,15,250,28,29,40,160,36',
+               'GPGSV,3,3,11,31,05,330,18,40,35,190,,41,20,220,')
+
+        epoch = [(key_nmea_rmc, nmea_sentence(rmc)), ((0xF0, 0x05), nmea_sentence(vtg)),
+                 (key_nmea_gga, nmea_sentence(gga)), ((0xF0, 0x02), nmea_sentence(gsa))]
+
+        for sentence in gsv:
+            epoch.append(((0xF0, 0x03), nmea_sentence(sentence)))
+
+        epoch.append(((0xF0, 0x01), nmea_sentence(gll)))
+        epoch.append((key_nav_pvt, ubx_frame(0x01, 0x07, nav_pvt_payload(tm, millis, fix, lat, lon, alt_m, speed_knots, track, sats))))
+
+        itow = ((tm.tm_wday + 1) % 7 * 86400 + tm.tm_hour * 3600 + tm.tm_min * 60 + tm.tm_sec) * 1000 + millis
+        drift = int(i * step / 2)
+        sky = []
+
+        for n, (sv, elev, azim, cno) in enumerate(sky_sats):
+            cno = max(cno + (i + n) % 5 - 2, 0) if cno else 0
+            sky.append((0, sv, cno, elev, (azim + drift) % 360, fix and sv in used_svs))
+
+        epoch.append((key_nav_sat, ubx_frame(0x01, 0x35, nav_sat_payload(itow, sky))))
+        epochs.append(epoch)
+
+    return epochs
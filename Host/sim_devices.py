@@ -0,0 +1,772 @@
+# HAM RADIO GPS - SIMULATED DEVICES
+#
+# CPYTHON STAND-INS FOR THE DEVICES IN hamgps/hal.py. TIME IS VIRTUAL: SLEEPS AND BLOCKING UART READS
+# ADVANCE THE CLOCK INSTANTLY, HOST CPU TIME SPENT IN CODE.PY IS ADDED (SCALED BY cpu_scale TO
+# APPROXIMATE THE SAMD51). THE FIRMWARE'S MONOTONIC CLOCK AND RTC CAN RUN ppm FAST (NEGATIVE: SLOW)
+# AGAINST THE TRUE TIME THE RECEIVER SENDS ITS EPOCHS ON. THE GPS RECEIVER MODEL PLAYS A CAPTURE BACK AT THE CONFIGURED BAUD RATE,
+# ANSWERS UBX CFG COMMANDS AND DROPS BYTES WHEN THE UART RECEIVE BUFFER OVERFLOWS.
+
+import asyncio
+import bisect
+import calendar
+import math
+import os
+import random
+import selectors
+import time
+
+from sim_capture import key_nmea_gga, key_nmea_rmc, split_frames, ubx_frame
+
+
+class simulation_complete(Exception):
+    pass
+
+
+# VIRTUAL CLOCK
+
+
+class sim_clock:
+    def __init__(self, duration, cpu_scale=1.0, ppm=0.0):
+        self.duration = duration
+        self.cpu_scale = cpu_scale
+        self.rate = 1.0 + ppm * 1e-6
+        self.waited = 0.0
+        self.rtc_offset = 946684800.0
+        self.iterations = 0
+        self.first_tick = None
+        self.last_tick = None
+        self.host_start = time.perf_counter()
+
+    def now(self):
+        return self.waited + (time.perf_counter() - self.host_start) * self.cpu_scale
+
+    # TRUE TIME, ENDS THE RUN ONCE THE DURATION IS UP
+
+    def current(self):
+        now = self.now()
+
+        if now >= self.duration:
+            raise simulation_complete()
+
+        return now
+
+    def monotonic(self):
+        return self.current() * self.rate
+
+    def monotonic_ns(self):
+        return int(self.monotonic() * 1000000000)
+
+    def advance(self, secs):
+        if secs > 0:
+            self.waited += secs
+
+        return self.monotonic()
+
+    def sleep(self, secs):
+        self.advance(secs)
+
+    def light_sleep(self, secs):
+        self.advance(secs)
+
+    def time(self):
+        return int(self.rtc_offset + self.monotonic())
+
+    def tick(self):
+        now = self.monotonic()
+        self.iterations += 1
+        self.last_tick = now
+
+        if self.first_tick is None:
+            self.first_tick = now
+
+    def set_datetime(self, datetime):
+        self.rtc_offset = calendar.timegm(tuple(datetime)[:6] + (0, 0, 0)) - self.now() * self.rate
+
+    def set_time_source(self, source):
+        pass
+
+
+# ASYNCIO EVENT LOOP ON VIRTUAL TIME
+# THE LOOP READS sim_clock.now() AS ITS TIME. WHEN IT WOULD WAIT FOR THE NEXT TIMER THE SELECTOR ADVANCES
+# THE VIRTUAL CLOCK INSTEAD, THEN POLLS THE REAL SELECTOR WITHOUT BLOCKING.
+
+
+class sim_selector(selectors.DefaultSelector):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    # ONCE THE RUN IS OVER (simulation_complete RAISED) THE LOOP ONLY NEEDS TO CANCEL ITS TASKS, TIME STOPS
+
+    def select(self, timeout=None):
+        if self.clock.now() < self.clock.duration:
+            self.clock.advance(self.clock.duration if timeout is None else timeout)
+
+        return super().select(0)
+
+
+class sim_event_loop(asyncio.SelectorEventLoop):
+    def __init__(self, clock):
+        self.clock = clock
+        super().__init__(sim_selector(clock))
+
+    def time(self):
+        return self.clock.now()
+
+
+class sim_loop_policy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def new_event_loop(self):
+        return sim_event_loop(self.clock)
+
+
+# GPS RECEIVER MODEL
+# EPOCHS ARE SENT ONE NAVIGATION PERIOD APART (EPOCH n STARTS AT n * period, ITS FIRST BYTE LEAVES
+# output_delay LATER), BYTES LEAVE THE RECEIVER BACK TO BACK AT ITS BAUD RATE.
+# THE "WIRE" HOLDS EVERY BYTE EVER SENT, SEGMENTS RECORD WHEN EACH RUN OF BYTES STARTED AND ITS BYTE TIME.
+
+
+class sim_receiver:
+    def __init__(self, clock, epochs, state='factory', period=1.0, response_delay=0.0, output_delay=0.0):
+        self.clock = clock
+        self.epochs = epochs
+        self.period = period
+        self.response_delay = response_delay
+        self.output_delay = output_delay
+        self.next_epoch = 0
+        self.next_epoch_time = 0.0
+        self.epoch_count = 0
+
+        self.wire = bytearray()
+        self.seg_pos = []
+        self.seg_time = []
+        self.seg_byte_time = []
+        self.wire_end_time = 0.0
+
+        # (LAST WIRE POSITION OF EPOCH, ARRIVAL TIME OF THAT BYTE)
+        self.mark_pos = []
+        self.mark_time = []
+        self.mark_seen = []
+
+        self.rates = {}
+        self.ubx_handlers = {(0x06, 0x00): self.cfg_prt, (0x06, 0x01): self.cfg_msg, (0x06, 0x08): self.cfg_rate}
+        self.commands = {}
+
+        if state == 'factory':
+            self.baudrate = 9600
+
+            for msg_id in range(6):
+                self.rates[(0xF0, msg_id)] = 1
+        elif state == 'configured':
+            self.baudrate = 38400
+            self.rates[key_nmea_rmc] = 1
+            self.rates[key_nmea_gga] = 1
+        else:
+            self.baudrate = 38400
+
+            for epoch in epochs:
+                for key, _ in epoch:
+                    self.rates[key] = 1
+
+        self.latest = {}
+
+    def byte_time(self):
+        return 10.0 / self.baudrate
+
+    def send(self, data, start):
+        start = max(start, self.wire_end_time)
+        self.seg_pos.append(len(self.wire))
+        self.seg_time.append(start)
+        self.seg_byte_time.append(self.byte_time())
+        self.wire += data
+        self.wire_end_time = start + len(data) * self.byte_time()
+
+    # SEND EVERY EPOCH THAT HAS STARTED BY TIME t
+
+    def advance_to(self, t):
+        while self.next_epoch < len(self.epochs) and self.next_epoch_time + self.output_delay <= t:
+            data = bytearray()
+
+            for key, frame in self.epochs[self.next_epoch]:
+                self.latest[key] = frame
+                rate = self.rates.get(key, 0)
+
+                if rate and self.epoch_count % rate == 0:
+                    data += frame
+
+            if data:
+                self.send(data, self.next_epoch_time + self.output_delay)
+                self.mark_pos.append(len(self.wire) - 1)
+                self.mark_time.append(self.wire_end_time)
+                self.mark_seen.append(None)
+
+            self.next_epoch += 1
+            self.epoch_count += 1
+            self.next_epoch_time += self.period
+
+    def finished(self):
+        return self.next_epoch >= len(self.epochs)
+
+    def arrived(self, t):
+        index = bisect.bisect_right(self.seg_time, t) - 1
+
+        if index < 0:
+            return 0
+
+        seg_end = self.seg_pos[index + 1] if index + 1 < len(self.seg_pos) else len(self.wire)
+        count = int((t - self.seg_time[index]) / self.seg_byte_time[index] + 1e-9)
+        return min(seg_end, self.seg_pos[index] + count)
+
+    def arrival_time(self, pos):
+        index = bisect.bisect_right(self.seg_pos, pos) - 1
+        return self.seg_time[index] + (pos - self.seg_pos[index] + 1) * self.seg_byte_time[index]
+
+    # RECORD WHAT HAPPENED TO THE LAST BYTE OF EACH EPOCH IN WIRE RANGE [start, end)
+
+    def resolve(self, start, end, now, consumed):
+        index = bisect.bisect_left(self.mark_pos, start)
+
+        while index < len(self.mark_pos) and self.mark_pos[index] < end:
+            if self.mark_seen[index] is None:
+                self.mark_seen[index] = (now - self.mark_time[index]) if consumed else -1
+
+            index += 1
+
+    # UBX COMMANDS FROM THE HOST, IGNORED WHEN THE HOST UART IS AT THE WRONG BAUD RATE
+
+    def host_write(self, data, host_baud):
+        if host_baud != self.baudrate:
+            return
+
+        for key, frame in split_frames(data):
+            if frame[0] != 0xB5:
+                continue
+
+            self.commands[key] = self.commands.get(key, 0) + 1
+            payload = frame[6:-2]
+            handler = self.ubx_handlers.get(key)
+
+            if handler is not None:
+                handler(key, payload)
+            elif key[0] == 0x06:
+                self.ack(key, True)
+            elif not payload and key in self.latest:
+                self.respond(self.latest[key])
+
+    def respond(self, frame):
+        self.advance_to(self.clock.now())
+        self.send(frame, self.clock.now() + self.response_delay)
+
+    def ack(self, key, ok):
+        self.respond(ubx_frame(0x05, 0x01 if ok else 0x00, bytes(key)))
+
+    def cfg_prt(self, key, payload):
+        if len(payload) >= 20:
+            self.ack(key, True)
+            self.baudrate = int.from_bytes(payload[8:12], 'little')
+        else:
+            port = bytes((1, 0, 0, 0, 0xD0, 0x08, 0, 0)) + self.baudrate.to_bytes(4, 'little') + bytes((0x07, 0, 0x03, 0, 0, 0, 0, 0))
+            self.respond(ubx_frame(0x06, 0x00, port))
+            self.ack(key, True)
+
+    def cfg_msg(self, key, payload):
+        msg_key = (payload[0], payload[1])
+
+        if len(payload) == 2:
+            rate = self.rates.get(msg_key, 0)
+            self.respond(ubx_frame(0x06, 0x01, bytes((payload[0], payload[1], 0, rate, 0, 0, 0, 0))))
+        elif len(payload) == 3:
+            self.rates[msg_key] = payload[2]
+        else:
+            self.rates[msg_key] = payload[3]
+
+        self.ack(key, True)
+
+    def cfg_rate(self, key, payload):
+        if len(payload) >= 6:
+            self.period = int.from_bytes(payload[0:2], 'little') * int.from_bytes(payload[2:4], 'little') / 1000.0
+        else:
+            meas = int(self.period * 1000).to_bytes(2, 'little')
+            self.respond(ubx_frame(0x06, 0x08, meas + bytes((1, 0, 1, 0))))
+
+        self.ack(key, True)
+
+
+# HOST UART, ONE INSTANCE PER gps_port.open()
+
+
+class sim_uart:
+    def __init__(self, receiver, clock, baudrate, receiver_buffer_size, timeout):
+        self.receiver = receiver
+        self.clock = clock
+        self.baudrate = baudrate
+        self.buffer_size = receiver_buffer_size
+        self.timeout = timeout
+        self.buffer = bytearray()
+        self.chunks = []
+        self.bytes_read = 0
+        self.overrun_bytes = 0
+        self.garbled_bytes = 0
+        self.high_water = 0
+
+        now = clock.now()
+        receiver.advance_to(now)
+        self.rx_pos = receiver.arrived(now)
+
+    # MOVE EVERYTHING THAT HAS ARRIVED INTO THE RECEIVE BUFFER, DROP WHAT DOES NOT FIT
+
+    def fill(self):
+        now = self.clock.current()
+        receiver = self.receiver
+        receiver.advance_to(now)
+        new_end = receiver.arrived(now)
+
+        if new_end <= self.rx_pos:
+            return
+
+        if self.baudrate != receiver.baudrate:
+            self.garbled_bytes += new_end - self.rx_pos
+            receiver.resolve(self.rx_pos, new_end, now, False)
+            self.rx_pos = new_end
+            return
+
+        take = min(self.buffer_size - len(self.buffer), new_end - self.rx_pos)
+
+        if take > 0:
+            self.buffer += receiver.wire[self.rx_pos:self.rx_pos + take]
+            self.chunks.append([self.rx_pos, take])
+
+        if self.rx_pos + take < new_end:
+            self.overrun_bytes += new_end - self.rx_pos - take
+            receiver.resolve(self.rx_pos + take, new_end, now, False)
+
+        self.rx_pos = new_end
+        self.high_water = max(self.high_water, len(self.buffer))
+
+    def consume(self, count, consumed=True):
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        now = self.clock.now()
+
+        while count:
+            chunk = self.chunks[0]
+            take = min(count, chunk[1])
+            self.receiver.resolve(chunk[0], chunk[0] + take, now, consumed)
+            chunk[0] += take
+            chunk[1] -= take
+            count -= take
+
+            if not chunk[1]:
+                self.chunks.pop(0)
+
+        if consumed:
+            self.bytes_read += len(data)
+
+        return data
+
+    # TIME WHEN THE NEXT UNSEEN BYTE AT OFFSET ahead ARRIVES (OR THE NEXT EPOCH STARTS)
+
+    def next_arrival(self, ahead):
+        receiver = self.receiver
+        pos = self.rx_pos + ahead
+
+        if pos < len(receiver.wire):
+            return receiver.arrival_time(pos)
+
+        if receiver.finished():
+            return None
+
+        return receiver.next_epoch_time
+
+    # BLOCK UNTIL done() IS TRUE OR THE TIMEOUT EXPIRES
+
+    def wait(self, done, ahead):
+        self.fill()
+        deadline = self.clock.now() + self.timeout
+
+        while not done():
+            when = self.next_arrival(ahead())
+
+            if when is None or when > deadline:
+                self.clock.advance(deadline - self.clock.now())
+                self.fill()
+                return
+
+            self.clock.advance(when - self.clock.now())
+            self.fill()
+
+    def read(self, nbytes=None):
+        if nbytes is None:
+            self.fill()
+            nbytes = len(self.buffer)
+        else:
+            self.wait(lambda: len(self.buffer) >= nbytes, lambda: nbytes - len(self.buffer) - 1)
+
+        if not self.buffer:
+            return None
+
+        return self.consume(min(nbytes, len(self.buffer)))
+
+    def readinto(self, buf, nbytes=None):
+        data = self.read(len(buf) if nbytes is None else nbytes)
+
+        if data is None:
+            return None
+
+        buf[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        def ahead():
+            newline = self.receiver.wire.find(b'\n', self.rx_pos)
+            return newline - self.rx_pos if newline >= 0 else len(self.receiver.wire) - self.rx_pos
+
+        self.wait(lambda: b'\n' in self.buffer, ahead)
+
+        if not self.buffer:
+            return None
+
+        newline = self.buffer.find(b'\n')
+        return self.consume(newline + 1 if newline >= 0 else len(self.buffer))
+
+    def write(self, data):
+        self.clock.advance(len(data) * 10.0 / self.baudrate)
+        self.receiver.host_write(bytes(data), self.baudrate)
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        self.fill()
+        return len(self.buffer)
+
+    def reset_input_buffer(self):
+        self.fill()
+        self.consume(len(self.buffer), consumed=False)
+
+    def deinit(self):
+        pass
+
+
+class sim_gps_port:
+    def __init__(self, receiver, clock):
+        self.receiver = receiver
+        self.clock = clock
+        self.uart = None
+        self.uarts = []
+
+    def open(self, baudrate, receiver_buffer_size=256, timeout=1):
+        self.uart = sim_uart(self.receiver, self.clock, baudrate, receiver_buffer_size, timeout)
+        self.uarts.append(self.uart)
+        return self.uart
+
+
+# DISPLAY, EVERY LABEL TEXT ASSIGNMENT IS COUNTED AS A REDRAW (bitmap_label RE-RENDERS ON EVERY SET).
+# WITH auto_refresh ON EVERY CHANGE IS COUNTED AS A REFRESH OF ITS OWN, WITH IT OFF ONLY refresh() CALLS.
+# LABEL AREAS ASSUME THE CONSOLAS-16 CELL (12 X 20) CODE.PY USES. EACH NEW TEXT OF THE UTC CLOCK IS KEPT
+# IN clock_shown WITH THE TRUE TIME IT REACHED THE SCREEN, WHILE ITS PAGE IS THE ONE SHOWN.
+
+
+# LABEL WHOSE CHANGES ARE TIMED
+clock_label = 'utc_clock_text'
+
+
+class sim_group(list):
+    def __init__(self, scale=1):
+        super().__init__()
+        self.scale = scale
+        self.hidden = False
+
+
+class sim_element:
+    def __init__(self, display, name, **attrs):
+        object.__setattr__(self, '_display', display)
+        object.__setattr__(self, '_name', name)
+
+        for attr, value in attrs.items():
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, attr, value):
+        if not attr.startswith('_'):
+            changed = getattr(self, attr, None) != value
+            self._display.count(self._name, changed, self if attr == 'text' else None)
+
+        object.__setattr__(self, attr, value)
+
+
+# GLYPH FIELD, KEEPS THE SPAN OF CHARACTERS CHANGED BY THE LAST text SET LIKE hamgps.glyphs.glyph_field.
+# text CAN BE SET FROM A bytearray (frame_display.text_bytes)
+
+
+class sim_field(sim_element):
+    def __setattr__(self, attr, value):
+        if attr == 'text':
+            if not isinstance(value, str):
+                value = value.decode('ascii')
+
+            old = self.text
+            value = value[:len(old)] + ' ' * (len(old) - len(value))
+            changed = [i for i in range(len(old)) if old[i] != value[i]]
+            object.__setattr__(self, '_span', (changed[0], changed[-1] + 1) if changed else (0, 0))
+
+        super().__setattr__(attr, value)
+
+    def changed_area(self):
+        first, last = self._span
+        return self.x + first * 12, self.y - 10, (last - first) * 12, 20
+
+
+# PALETTE BITMAP, PIXELS ARE PALETTE INDEXES
+
+
+class sim_bitmap:
+    def __init__(self, name, width, height):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width * height)
+
+    def __getitem__(self, xy):
+        return self.pixels[xy[1] * self.width + xy[0]]
+
+    def __setitem__(self, xy, value):
+        self.pixels[xy[1] * self.width + xy[0]] = value
+
+
+class sim_display:
+    def __init__(self, width, height, clock=None):
+        self.width = width
+        self.height = height
+        self.clock = clock
+        self.auto_refresh = True
+        self.shows = 0
+        self.refreshes = 0
+        self.redraws = {}
+        self.bitmap_writes = {}
+        self.showing = None
+        self.clock_changed = None
+        self.clock_shown = []
+
+    def count(self, name, changed, element=None):
+        entry = self.redraws.setdefault(name, [0, 0])
+        entry[0] += 1
+        entry[1] += changed
+
+        if changed and name == clock_label:
+            self.clock_changed = element
+
+        if changed and self.auto_refresh:
+            self.refresh()
+
+    def shown(self):
+        label = self.clock_changed
+
+        if label is not None and self.clock is not None and self.showing is not None and label in self.showing:
+            self.clock_shown.append((self.clock.now(), label.text))
+
+        self.clock_changed = None
+
+    def load_font(self, path):
+        return path
+
+    def group(self, scale=1):
+        return sim_group(scale)
+
+    def show(self, group):
+        self.shows += 1
+        self.showing = group
+
+    def set_auto_refresh(self, auto_refresh):
+        self.auto_refresh = auto_refresh
+
+    def refresh(self):
+        self.refreshes += 1
+        self.shown()
+
+    def label_area(self, label):
+        return label.x, label.y - 10, len(label.text) * 12, 20
+
+    def label(self, font, text, color, x, y, name=None):
+        return sim_element(self, name or 'label', text=text, color=color, x=x, y=y)
+
+    def glyph_atlas(self, font):
+        return font
+
+    def glyph_field(self, atlas, text, color, x, y, name=None):
+        return sim_field(self, name or 'field', text=text, color=color, x=x, y=y, _span=(0, 0))
+
+    def image(self, path):
+        return sim_element(self, 'image', path=path)
+
+    def progress_bar(self, x, y, width, height, **kwargs):
+        return sim_element(self, 'bat_progress_bar', x=x, y=y, **kwargs)
+
+    def bitmap(self, width, height, colors, x, y, transparent=False, name=None):
+        bitmap = sim_bitmap(name or 'bitmap', width, height)
+        return bitmap, sim_element(self, bitmap.name + '_grid', bitmap=bitmap, x=x, y=y)
+
+    # COUNTS FILLS AND THE PIXELS THAT ACTUALLY CHANGED, OUT OF RANGE AREAS RAISE LIKE bitmaptools DOES
+    def fill(self, bitmap, x1, y1, x2, y2, value):
+        if x2 <= x1 or y2 <= y1:
+            return
+
+        if x1 < 0 or y1 < 0 or x2 > bitmap.width or y2 > bitmap.height:
+            raise ValueError('fill {},{} - {},{} outside {} ({} x {})'.format(x1, y1, x2, y2, bitmap.name, bitmap.width, bitmap.height))
+
+        entry = self.bitmap_writes.setdefault(bitmap.name, [0, 0])
+        entry[0] += 1
+
+        for y in range(y1, y2):
+            row = y * bitmap.width
+
+            for x in range(x1, x2):
+                if bitmap.pixels[row + x] != value:
+                    bitmap.pixels[row + x] = value
+                    entry[1] += 1
+
+
+# SYNTHETIC MAGNETOMETER: HEADING TURNS AT turn_rate DEG/S, RAW AXES CARRY A HARD-IRON OFFSET AND NOISE
+
+
+class sim_compass:
+    def __init__(self, clock, turn_rate=6.0, field=45.0, offset=(30.9, -20.5), noise=1.0, seed=1):
+        self.clock = clock
+        self.turn_rate = turn_rate
+        self.field = field
+        self.offset = offset
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.reads = 0
+        self.mag_rate = 0
+
+    @property
+    def magnetic(self):
+        self.reads += 1
+        heading = math.radians(self.clock.monotonic() * self.turn_rate)
+        x = self.offset[0] - self.field * math.cos(heading) + self.random.gauss(0, self.noise)
+        y = self.offset[1] + self.field * math.sin(heading) + self.random.gauss(0, self.noise)
+        return (x, y, -12.0 + self.random.gauss(0, self.noise))
+
+
+# SYNTHETIC BATTERY ADC: LINEAR DISCHARGE FROM start TO end OVER hours, PLUS NOISE
+
+
+class sim_battery:
+    def __init__(self, clock, start=57500, end=48000, hours=29.0, noise=60, seed=2):
+        self.clock = clock
+        self.start = start
+        self.slope = (end - start) / (hours * 3600.0)
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.reads = 0
+
+    @property
+    def value(self):
+        self.reads += 1
+        value = self.start + self.slope * self.clock.monotonic() + self.random.gauss(0, self.noise)
+        return max(0, min(65535, int(value)))
+
+
+# BUTTON WITH PULL-UP, presses IS A LIST OF (START, LENGTH) IN SECONDS
+
+
+class sim_button:
+    def __init__(self, clock, presses=()):
+        self.clock = clock
+        self.presses = list(presses)
+
+    @property
+    def value(self):
+        now = self.clock.monotonic()
+
+        for start, length in self.presses:
+            if start <= now < start + length:
+                return False
+
+        return True
+
+
+class sim_backlight:
+    def __init__(self, duty_cycle):
+        self._duty_cycle = duty_cycle
+        self.changes = 0
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        self.changes += 1
+        self._duty_cycle = value
+
+
+# CIRCUITPY FILESYSTEM MAPPED ONTO A HOST DIRECTORY, READ-ONLY (OSError 30 ON ANY WRITE) WITHOUT ONE, AS
+# IF boot.py HAD NOT REMOUNTED IT. OPENING A FILE AND EACH 512 BYTES WRITTEN COST open_secs / page_secs
+# OF VIRTUAL TIME, ROUGHLY A FAT WRITE TO THE QSPI FLASH
+
+
+class sim_file:
+    def __init__(self, storage, host_file):
+        self.storage = storage
+        self.host_file = host_file
+
+    def write(self, data):
+        self.storage.clock.advance(self.storage.page_secs * (len(data) + 511) // 512)
+        self.storage.bytes_written += len(data)
+        return self.host_file.write(data)
+
+    def read(self, size=-1):
+        return self.host_file.read(size)
+
+    def close(self):
+        self.host_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class sim_storage:
+    def __init__(self, clock, root=None, open_secs=0.004, page_secs=0.002):
+        self.clock = clock
+        self.root = root
+        self.open_secs = open_secs
+        self.page_secs = page_secs
+        self.bytes_written = 0
+
+        # THE DIRECTORY STANDS IN FOR CIRCUITPY, WHICH IS ALWAYS THERE
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+
+    def path(self, path):
+        return os.path.join(self.root or '', path.lstrip('/'))
+
+    def writable(self):
+        if self.root is None:
+            raise OSError(30, 'Read-only filesystem')
+
+    def listdir(self, path):
+        if self.root is None:
+            return []
+
+        return sorted(os.listdir(self.path(path)))
+
+    def mkdir(self, path):
+        self.writable()
+        os.mkdir(self.path(path))
+
+    def remove(self, path):
+        self.writable()
+        os.remove(self.path(path))
+
+    def open(self, path, mode='r'):
+        if 'w' in mode or 'a' in mode:
+            self.writable()
+
+        self.clock.advance(self.open_secs)
+        return sim_file(self, open(self.path(path), mode))
@@ -0,0 +1,297 @@
+# HAM RADIO GPS - HOST SIMULATOR
+#
+# RUNS Circuitpython/code.py UNCHANGED UNDER CPYTHON WITH SIMULATED DEVICES (SEE sim_devices.py).
+# PLAYS BACK A RECORDED NMEA / UBX CAPTURE (OR A SYNTHETIC ONE) PLUS SYNTHETIC MAGNETOMETER AND
+# BATTERY ADC TRACES, THEN REPORTS LOOP RATE, PER-FIX LATENCY, UART LOSSES AND LABEL REDRAWS. WITH
+# SYNTHETIC DATA IT ALSO TIMES EVERY CHANGE OF THE UTC CLOCK LABEL AGAINST THE GPS SECOND IT SHOWS.
+#
+# --check FAILS THE RUN (EXIT 1) WHEN THE TRACK LOG WROTE NOTHING TO --storage, OR WHEN THE CLOCK LABEL
+# CHANGES AFTER THE FIRST settle_secs ARE FURTHER THAN --clock-limit MS FROM THE GPS SECOND (p95).
+#
+# REQUIRES THE CPYTHON BUILDS OF THE LIBRARIES CODE.PY IMPORTS:
+#
+#   pip install adafruit-circuitpython-gps adafruit-circuitpython-fancyled
+#
+# EXAMPLES:
+#
+#   python Host/simulator.py --synth 120
+#   python Host/simulator.py --capture drive.nmea --receiver-state capture --json
+#   python Host/simulator.py --synth 300 --cpu-scale 40 --press up:200:2
+#   python Host/simulator.py --synth 120 --set gps_mode="'ubx'"
+#   python Host/simulator.py --synth 120 --nvm sim.nvm --press both:2:2 --press up:70:0.2
+#   python Host/simulator.py --synth 600 --storage sim_circuitpy
+#   python Host/simulator.py --synth 900 --clock-ppm 25 --output-delay 0.04 --set time_delay=0.04
+#   python Host/simulator.py --synth 130 --storage sim_circuitpy --check
+#   python Host/simulator.py --synth 120 --set gps_mode="'ubx'" --check
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+import sim_capture
+import sim_devices
+
+host_dir = os.path.dirname(os.path.abspath(__file__))
+firmware_dir = os.path.join(os.path.dirname(host_dir), 'Circuitpython')
+
+# VIRTUAL SECONDS BEFORE THE CLOCK LABEL IS EXPECTED TO BE ON THE GPS SECOND (FIX, THEN A FULL SYNC WINDOW)
+settle_secs = 20
+
+
+def parse_press(text):
+    button, start, length = text.split(':')
+    return button, float(start), float(length)
+
+
+# LOAD CODE.PY WITH USER ADJUSTABLE VARIABLES OVERRIDDEN, overrides ARE 'name=python expression'
+
+
+def load_firmware(overrides):
+    path = os.path.join(firmware_dir, 'code.py')
+
+    with open(path) as source_file:
+        source = source_file.read()
+
+    for override in overrides:
+        name, value = override.split('=', 1)
+        source, count = re.subn(r'^{} = .*$'.format(re.escape(name)), lambda match: '{} = {}'.format(name, value), source, count=1, flags=re.M)
+
+        if not count:
+            raise SystemExit('code.py has no variable named {}'.format(name))
+
+    return compile(source, path, 'exec')
+
+
+# MS FROM THE START OF EACH GPS SECOND TO THE UTC CLOCK LABEL SHOWING IT (NEGATIVE: EARLY). EPOCH n OF A
+# SYNTHETIC CAPTURE IS GPS TIME origin + n AND STARTS n SECONDS INTO THE RUN
+
+
+def clock_errors(shown, origin):
+    errors = []
+
+    for when, text in shown:
+        hour, minute, second = (int(part) for part in text.split(':'))
+        start = (hour * 3600 + minute * 60 + second - origin) % 86400
+        errors.append((when - start) * 1000)
+
+    return errors
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(options):
+    # CIRCUITPYTHON HAS NO TIMEZONES, time.localtime() RETURNS UTC ON THE BOARD
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    if options.capture:
+        epochs = sim_capture.load_capture(options.capture)
+    else:
+        epochs = sim_capture.synth_epochs(options.synth, rate=options.rate)
+
+    if options.write_capture:
+        sim_capture.save_capture(options.write_capture, epochs)
+
+    period = 1.0 / options.rate
+    duration = options.duration or len(epochs) * period + 1.0
+    clock = sim_devices.sim_clock(duration, options.cpu_scale, options.clock_ppm)
+    receiver = sim_devices.sim_receiver(clock, epochs, options.receiver_state, period, options.response_delay, options.output_delay)
+    presses = [parse_press(press) for press in options.press]
+    built = {}
+    nvm = bytearray(8192)
+
+    if options.nvm and os.path.exists(options.nvm):
+        with open(options.nvm, 'rb') as nvm_file:
+            saved = nvm_file.read(len(nvm))
+            nvm[:len(saved)] = saved
+
+    def factory(config):
+        built['display'] = sim_devices.sim_display(config['disp_x'], config['disp_y'], clock)
+        built['gps_port'] = sim_devices.sim_gps_port(receiver, clock)
+        built['compass'] = sim_devices.sim_compass(clock)
+        built['battery'] = sim_devices.sim_battery(clock)
+        built['backlight'] = sim_devices.sim_backlight(config['disp_level'])
+        built['storage'] = sim_devices.sim_storage(clock, options.storage)
+        button_up = sim_devices.sim_button(clock, [(start, length) for button, start, length in presses if button in ('up', 'both')])
+        button_down = sim_devices.sim_button(clock, [(start, length) for button, start, length in presses if button in ('down', 'both')])
+
+        return hal.devices(clock, built['display'], built['gps_port'], built['compass'], built['battery'], button_up, button_down, built['backlight'], nvm, built['storage'])
+
+    sys.path.insert(0, firmware_dir)
+    from hamgps import hal
+
+    hal.install(factory)
+    asyncio.set_event_loop_policy(sim_devices.sim_loop_policy(clock))
+    firmware = load_firmware(options.set)
+    host_start = time.perf_counter()
+    outcome = 'complete'
+
+    try:
+        exec(firmware, {'__name__': '__main__', '__file__': firmware.co_filename})
+    except sim_devices.simulation_complete:
+        pass
+    except Exception as error:
+        outcome = '{}: {}'.format(type(error).__name__, error)
+
+    host_secs = time.perf_counter() - host_start
+
+    if options.nvm:
+        with open(options.nvm, 'wb') as nvm_file:
+            nvm_file.write(nvm)
+    hal.install(None)
+    asyncio.set_event_loop_policy(None)
+
+    latencies = [seen * 1000 for seen in receiver.mark_seen if seen is not None and seen >= 0]
+    loop_secs = (clock.last_tick - clock.first_tick) if clock.first_tick is not None else 0.0
+    uarts = built['gps_port'].uarts if 'gps_port' in built else []
+    shown = built['display'].clock_shown if 'display' in built and not options.capture else []
+    errors = clock_errors(shown, sim_capture.synth_start % 86400)
+    settled = [abs(error) for error, (when, _) in zip(errors, shown) if when >= settle_secs]
+
+    return {
+        'outcome': outcome,
+        'virtual_secs': round(clock.now(), 3),
+        'host_secs': round(host_secs, 3),
+        'boot_secs': round(clock.first_tick, 3) if clock.first_tick is not None else None,
+        'loop_iterations': clock.iterations,
+        'loop_rate_hz': round(clock.iterations / loop_secs, 2) if loop_secs > 0 else 0.0,
+        'host_us_per_iteration': round(host_secs * 1e6 / clock.iterations, 1) if clock.iterations else None,
+        'fixes_sent': len(receiver.mark_seen),
+        'fixes_read': len(latencies),
+        'fixes_lost': sum(1 for seen in receiver.mark_seen if seen is not None and seen < 0),
+        'fix_latency_ms': {
+            'min': round(min(latencies), 2) if latencies else 0.0,
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p95': round(percentile(latencies, 0.95), 2),
+            'max': round(max(latencies), 2) if latencies else 0.0,
+        },
+        'clock_error_ms': {
+            'changes': len(errors),
+            'min': round(min(errors), 2) if errors else 0.0,
+            'mean': round(sum(errors) / len(errors), 2) if errors else 0.0,
+            'p95': round(percentile([abs(error) for error in errors], 0.95), 2),
+            'max': round(max(errors), 2) if errors else 0.0,
+            'settled_changes': len(settled),
+            'settled_p95': round(percentile(settled, 0.95), 2),
+        },
+        'uart': {
+            'bytes_sent': len(receiver.wire),
+            'bytes_read': sum(uart.bytes_read for uart in uarts),
+            'overrun_bytes': sum(uart.overrun_bytes for uart in uarts),
+            'garbled_bytes': sum(uart.garbled_bytes for uart in uarts),
+            'high_water': max([uart.high_water for uart in uarts] or [0]),
+            'ubx_commands': sum(receiver.commands.values()),
+        },
+        'display_refreshes': built['display'].refreshes if 'display' in built else 0,
+        'label_redraws': dict(sorted(built['display'].redraws.items())) if 'display' in built else {},
+        'bitmap_writes': dict(sorted(built['display'].bitmap_writes.items())) if 'display' in built else {},
+        'compass_reads': built['compass'].reads if 'compass' in built else 0,
+        'battery_reads': built['battery'].reads if 'battery' in built else 0,
+        'backlight': {
+            'level': built['backlight'].duty_cycle if 'backlight' in built else None,
+            'changes': built['backlight'].changes if 'backlight' in built else 0,
+        },
+        'storage_bytes_written': built['storage'].bytes_written if 'storage' in built else 0,
+    }
+
+
+def report(results):
+    print('outcome            {}'.format(results['outcome']))
+    print('virtual time       {:.1f} s (host {:.2f} s)'.format(results['virtual_secs'], results['host_secs']))
+    print('boot to main loop  {} s'.format(results['boot_secs']))
+    print('loop iterations    {} ({} / s, {} us host CPU each)'.format(results['loop_iterations'], results['loop_rate_hz'], results['host_us_per_iteration']))
+    print('fixes              {} sent, {} read, {} lost'.format(results['fixes_sent'], results['fixes_read'], results['fixes_lost']))
+    latency = results['fix_latency_ms']
+    print('fix latency ms     min {} / mean {} / p95 {} / max {}'.format(latency['min'], latency['mean'], latency['p95'], latency['max']))
+    error = results['clock_error_ms']
+
+    if error['changes']:
+        print('clock label ms     {} changes, min {} / mean {} / p95 |err| {} / max {}'.format(error['changes'], error['min'], error['mean'], error['p95'], error['max']))
+        print('  after {:3d} s      {} changes, p95 |err| {}'.format(settle_secs, error['settled_changes'], error['settled_p95']))
+
+    uart = results['uart']
+    print('uart bytes         {} sent, {} read, {} overrun, {} garbled, high water {}'.format(uart['bytes_sent'], uart['bytes_read'], uart['overrun_bytes'], uart['garbled_bytes'], uart['high_water']))
+    print('ubx commands       {}'.format(uart['ubx_commands']))
+    print('device reads       compass {}, battery {}'.format(results['compass_reads'], results['battery_reads']))
+    print('backlight          level {}, {} changes'.format(results['backlight']['level'], results['backlight']['changes']))
+    print('storage written    {} bytes'.format(results['storage_bytes_written']))
+    print('display refreshes  {}'.format(results['display_refreshes']))
+    print('label redraws      (assignments / changed)')
+
+    for name, (redraws, changed) in sorted(results['label_redraws'].items(), key=lambda item: -item[1][0]):
+        print('  {:20s} {:8d} {:8d}'.format(name, redraws, changed))
+
+    if results['bitmap_writes']:
+        print('bitmap writes      (fills / pixels changed)')
+
+        for name, (fills, pixels) in results['bitmap_writes'].items():
+            print('  {:20s} {:8d} {:8d}'.format(name, fills, pixels))
+
+
+# FAILURES FOR --check
+
+
+def check(results, options):
+    failures = []
+
+    if options.storage and not results['storage_bytes_written']:
+        failures.append('track log: nothing written to {}'.format(options.storage))
+
+    error = results['clock_error_ms']
+
+    if error['settled_changes'] and error['settled_p95'] > options.clock_limit:
+        failures.append('clock label: p95 |err| {} ms after {} s, limit {} ms'.format(error['settled_p95'], settle_secs, options.clock_limit))
+
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run code.py against simulated devices')
+    parser.add_argument('--capture', help='recorded NMEA / UBX byte stream to play back')
+    parser.add_argument('--synth', type=float, default=120, help='seconds of synthetic data when no capture is given')
+    parser.add_argument('--rate', type=float, default=1, help='navigation rate in Hz (epoch spacing)')
+    parser.add_argument('--write-capture', help='save the capture that was played back')
+    parser.add_argument('--nvm', help='file holding the simulated microcontroller.nvm, loaded before and saved after the run')
+    parser.add_argument('--duration', type=float, help='virtual seconds to run (default: length of the capture)')
+    parser.add_argument('--cpu-scale', type=float, default=1.0, help='multiplier applied to host CPU time')
+    parser.add_argument('--receiver-state', choices=('factory', 'configured', 'capture'), default='factory',
+                        help='factory: 9600 baud, default NMEA set; configured: 38400 baud, RMC and GGA only (kept from an '
+                             'earlier boot); capture: 38400 baud, everything in the capture enabled')
+    parser.add_argument('--response-delay', type=float, default=0.0, help='receiver delay before answering UBX commands')
+    parser.add_argument('--output-delay', type=float, default=0.0, help='receiver delay from the start of an epoch to its first byte')
+    parser.add_argument('--clock-ppm', type=float, default=0.0, help='rate error of the board clock and RTC in ppm (positive: fast)')
+    parser.add_argument('--storage', help='host directory standing in for CIRCUITPY (read-only without one)')
+    parser.add_argument('--press', action='append', default=[], help='button press as up|down|both:START:LENGTH')
+    parser.add_argument('--set', action='append', default=[], help='override a code.py variable, e.g. gps_mode="\'ubx\'"')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--check', action='store_true', help='fail when the track log wrote nothing or the clock label is off the GPS second')
+    parser.add_argument('--clock-limit', type=float, default=5, help='allowed p95 clock label error in ms for --check')
+    options = parser.parse_args(argv)
+
+    results = run(options)
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+
+    failures = check(results, options) if options.check else []
+
+    for failure in failures:
+        print('FAIL {}'.format(failure))
+
+    return 0 if results['outcome'] == 'complete' and not failures else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,580 @@
+# HAM RADIO GPS - TRACK ANALYZER AND GPX EXPORTER
+#
+# READS TRACK LOGS COPIED OFF CIRCUITPY (/tracks/trkNNNNN.bin, SEE Circuitpython/hamgps/track.py) AND
+# RAW NMEA / UBX CAPTURES (AS PLAYED BY THE SIMULATOR), IN ANY MIX. FILES ARE READ IN FIXED SIZE CHUNKS
+# AND EVERY FIX IS PASSED THROUGH GENERATORS ONE AT A TIME, NOTHING GROWS WITH THE LENGTH OF THE INPUT
+# EXCEPT THE SET OF GRID SQUARES VISITED, SO MULTI-GIGABYTE INPUTS RUN IN CONSTANT MEMORY.
+#
+# stats   DISTANCE TRAVELLED, DURATION, TOP SPEED, FIX QUALITY HISTOGRAM, TIME TO FIRST FIX (CAPTURES
+#         ONLY, THE DEVICE LOGS FROM THE FIRST FIX ON) AND THE GRID SQUARES VISITED, WORKED OUT WITH THE
+#         FIRMWARE'S OWN hamgps.grid
+# gpx     GPX 1.1 TRACK, A NEW SEGMENT AFTER EVERY GAP LONGER THAN --gap SECONDS
+# bench   GENERATES A TRACK LOG AND A 10 HZ NMEA CAPTURE IN A TEMPORARY DIRECTORY, TIMES stats ON THEM AND
+#         MEASURES ITS PEAK HEAP
+#
+# EXAMPLES:
+#
+#   python Host/track_tool.py stats /media/CIRCUITPY/tracks/*.bin
+#   python Host/track_tool.py gpx /media/CIRCUITPY/tracks/*.bin -o drive.gpx
+#   python Host/track_tool.py stats drive.nmea --json
+#   python Host/track_tool.py bench --hours 24
+
+import argparse
+import calendar
+import json
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import sim_capture
+
+host_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(host_dir), 'Circuitpython'))
+
+from hamgps import grid
+from hamgps import track
+
+# BYTES READ AT A TIME
+chunk_size = 1 << 20
+
+# LONGEST NMEA SENTENCE / UBX FRAME ACCEPTED, ANYTHING LONGER IS TREATED AS NOISE
+max_sentence = 256
+max_ubx_frame = 1024
+
+earth_radius_m = 6371008.8
+
+# A FIX IS (SECS, LAT, LON, ALTITUDE M, SPEED KNOTS, TRACK DEG, SATELLITES, FIX QUALITY), LAT AND LON ARE
+# NONE WITHOUT A FIX, THE OTHER FIELDS ARE NONE WHEN THE SOURCE DID NOT GIVE THEM
+fix_secs = 0
+fix_lat = 1
+fix_lon = 2
+fix_alt = 3
+fix_speed = 4
+fix_track = 5
+fix_sats = 6
+fix_quality = 7
+
+
+class counters:
+    def __init__(self):
+        self.bytes = 0
+        self.bad_pages = 0
+        self.bad_frames = 0
+
+
+# TRACK LOG PAGES, ONE FIX PER RECORD. PAGES WITH THE WRONG MAGIC (TORN BY A POWER CUT) ARE SKIPPED
+
+
+def track_fixes(path, counts):
+    pages_per_chunk = chunk_size // track.page_size
+    header = struct.Struct(track.page_format)
+    record = struct.Struct(track.record_format)
+
+    with open(path, 'rb') as track_file:
+        while True:
+            data = track_file.read(pages_per_chunk * track.page_size)
+
+            if not data:
+                return
+
+            counts.bytes += len(data)
+
+            for offset in range(0, len(data) - track.page_size + 1, track.page_size):
+                magic, version, count, _ = header.unpack_from(data, offset)
+
+                if magic != track.page_magic or version != track.page_version or count > track.page_records:
+                    counts.bad_pages += 1
+                    continue
+
+                for secs, lat, lon, alt, speed, course, sats, quality, _ in record.iter_unpack(data[offset + track.page_header_size:offset + track.page_header_size + count * track.record_size]):
+                    yield (secs, lat / 1e7, lon / 1e7,
+                           None if alt == track.no_altitude else alt,
+                           None if speed == track.no_value else speed / 100,
+                           None if course == track.no_value else course / 100,
+                           None if sats == track.no_satellites else sats,
+                           quality)
+
+
+# (KEY, FRAME) PAIRS FROM A CAPTURE, READ A CHUNK AT A TIME. A FRAME SPLIT ACROSS TWO CHUNKS IS CARRIED
+# OVER, FRAMES WITH A BAD CHECKSUM ARE COUNTED AND DROPPED
+
+
+def stream_frames(path, counts):
+    pending = b''
+
+    with open(path, 'rb') as capture_file:
+        while True:
+            chunk = capture_file.read(chunk_size)
+            counts.bytes += len(chunk)
+            data = pending + chunk
+            pos = 0
+            end = len(data)
+
+            while pos < end:
+                byte = data[pos]
+
+                if byte == 0x24:
+                    line_end = data.find(b'\n', pos, pos + max_sentence)
+
+                    if line_end < 0:
+                        if end - pos < max_sentence and chunk:
+                            break
+
+                        pos += 1
+                        continue
+
+                    frame = data[pos:line_end + 1].rstrip()
+                    pos = line_end + 1
+                    star = frame.rfind(b'*')
+                    checksum = 0
+
+                    for char in frame[1:star]:
+                        checksum ^= char
+
+                    if star < 0 or frame[star + 1:star + 3].upper() != b'%02X' % checksum:
+                        counts.bad_frames += 1
+                        continue
+
+                    yield (0xF0, sim_capture.nmea_ids.get(frame[3:6], 0xFF)), frame[:star]
+                elif byte == 0xB5 and (end - pos < 2 or data[pos + 1] == 0x62):
+                    if end - pos < 8:
+                        if chunk:
+                            break
+
+                        pos += 1
+                        continue
+
+                    length = data[pos + 4] | (data[pos + 5] << 8)
+                    frame_end = pos + 8 + length
+
+                    if length > max_ubx_frame:
+                        pos += 1
+                        continue
+
+                    if frame_end > end:
+                        if chunk:
+                            break
+
+                        pos += 1
+                        continue
+
+                    frame = data[pos:frame_end]
+
+                    if sim_capture.ubx_checksum(frame[2:-2]) != frame[-2:]:
+                        counts.bad_frames += 1
+                        pos += 1
+                        continue
+
+                    yield (frame[2], frame[3]), frame
+                    pos = frame_end
+                else:
+                    pos += 1
+
+            pending = data[pos:]
+
+            if not chunk:
+                return
+
+
+def nmea_degrees(value, hemisphere, degree_digits):
+    if len(value) < degree_digits + 2 or not hemisphere:
+        return None
+
+    degrees = int(value[:degree_digits]) + float(value[degree_digits:]) / 60
+    return -degrees if hemisphere in (b'S', b'W') else degrees
+
+
+def nmea_float(value):
+    return float(value) if value else None
+
+
+# ONE FIX PER NAVIGATION EPOCH OF A CAPTURE. RMC AND GGA WITH THE SAME TIME OF DAY ARE MERGED, NAV-PVT IS
+# A WHOLE EPOCH ON ITS OWN AND ONCE ONE HAS BEEN SEEN THE NMEA SENTENCES ARE IGNORED. GGA CARRIES NO
+# DATE, THE LAST DATE AN RMC GAVE IS USED
+
+
+def capture_fixes(path, counts):
+    day = 0
+    hms = None
+    fix = None
+    nav_pvt = False
+
+    for key, frame in stream_frames(path, counts):
+        if key == sim_capture.key_nav_pvt:
+            if len(frame) < 8 + 92:
+                counts.bad_frames += 1
+                continue
+
+            year, month, mday, hour, minute, second, valid = struct.unpack_from('<HBBBBBB', frame, 10)
+            fix_type, flags, _, sats, lon, lat, _, alt = struct.unpack_from('<BBBBiiii', frame, 26)
+            speed, course = struct.unpack_from('<ii', frame, 66)
+            secs = calendar.timegm((year, month, mday, hour, minute, second, 0, 0, 0)) if valid & 0x03 == 0x03 else None
+
+            # THE SAME EPOCH AS NMEA SENTENCES ALREADY MERGED
+            if fix is not None and fix[fix_secs] != secs:
+                yield tuple(fix)
+
+            fix = None
+            nav_pvt = True
+            quality = (2 if flags & 0x02 else 1) if flags & 0x01 else 0
+            position = quality > 0 and fix_type >= 2
+            yield (secs, lat / 1e7 if position else None, lon / 1e7 if position else None, alt / 1000 if position else None,
+                   speed / 514.444, course / 1e5, sats, quality)
+            continue
+
+        if nav_pvt or key not in (sim_capture.key_nmea_rmc, sim_capture.key_nmea_gga):
+            continue
+
+        fields = frame.split(b',')
+
+        if len(fields) < 10:
+            counts.bad_frames += 1
+            continue
+
+        if fields[1][:6] != hms:
+            if fix is not None:
+                yield tuple(fix)
+
+            hms = fields[1][:6]
+            fix = [None, None, None, None, None, None, None, 0]
+
+        try:
+            if key == sim_capture.key_nmea_rmc:
+                if len(fields[9]) >= 6:
+                    day = calendar.timegm((2000 + int(fields[9][4:6]), int(fields[9][2:4]), int(fields[9][0:2]), 0, 0, 0, 0, 0, 0))
+
+                if fields[2] == b'A':
+                    fix[fix_lat] = nmea_degrees(fields[3], fields[4], 2)
+                    fix[fix_lon] = nmea_degrees(fields[5], fields[6], 3)
+                    fix[fix_quality] = fix[fix_quality] or 1
+
+                fix[fix_speed] = nmea_float(fields[7])
+                fix[fix_track] = nmea_float(fields[8])
+            else:
+                quality = int(fields[6] or 0)
+                fix[fix_quality] = quality
+
+                if quality:
+                    fix[fix_lat] = nmea_degrees(fields[2], fields[3], 2)
+                    fix[fix_lon] = nmea_degrees(fields[4], fields[5], 3)
+
+                fix[fix_sats] = int(fields[7]) if fields[7] else None
+                fix[fix_alt] = nmea_float(fields[9])
+
+            if len(hms) == 6:
+                fix[fix_secs] = day + int(hms[0:2]) * 3600 + int(hms[2:4]) * 60 + int(hms[4:6])
+        except ValueError:
+            counts.bad_frames += 1
+
+    if fix is not None:
+        yield tuple(fix)
+
+
+# FIXES FROM EVERY FILE IN TURN, TRACK LOGS ARE RECOGNISED BY THE PAGE MAGIC
+
+
+def read_fixes(paths, counts):
+    for path in paths:
+        with open(path, 'rb') as probe:
+            magic = probe.read(len(track.page_magic))
+
+        if magic == track.page_magic:
+            yield from track_fixes(path, counts)
+        else:
+            yield from capture_fixes(path, counts)
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * earth_radius_m * math.asin(min(1.0, math.sqrt(a)))
+
+
+class track_stats:
+    def __init__(self):
+        self.epochs = 0
+        self.fixes = 0
+        self.distance_m = 0.0
+        self.top_speed = 0.0
+        self.first_secs = None
+        self.first_fix_secs = None
+        self.last_fix_secs = None
+        self.quality = {}
+        self.squares = {}
+        self._last = None
+
+    def add(self, fix):
+        self.epochs += 1
+        secs = fix[fix_secs]
+        quality = fix[fix_quality]
+        self.quality[quality] = self.quality.get(quality, 0) + 1
+
+        if self.first_secs is None and secs is not None:
+            self.first_secs = secs
+
+        lat = fix[fix_lat]
+        lon = fix[fix_lon]
+
+        if lat is None or lon is None or not quality:
+            return
+
+        self.fixes += 1
+
+        if self.first_fix_secs is None:
+            self.first_fix_secs = secs
+
+        if secs is not None:
+            self.last_fix_secs = secs
+
+        if fix[fix_speed] is not None and fix[fix_speed] > self.top_speed:
+            self.top_speed = fix[fix_speed]
+
+        square = grid.square_index(lat, lon)
+        self.squares[square] = self.squares.get(square, 0) + 1
+
+        if self._last is not None:
+            self.distance_m += distance_m(self._last[0], self._last[1], lat, lon)
+
+        self._last = (lat, lon)
+
+    def results(self, counts, capture):
+        ttff = None
+
+        if capture and self.first_secs is not None and self.first_fix_secs is not None:
+            ttff = self.first_fix_secs - self.first_secs
+
+        return {
+            'bytes': counts.bytes,
+            'epochs': self.epochs,
+            'fixes': self.fixes,
+            'bad_pages': counts.bad_pages,
+            'bad_frames': counts.bad_frames,
+            'duration_secs': (self.last_fix_secs - self.first_fix_secs) if self.fixes and self.last_fix_secs is not None else 0,
+            'distance_km': round(self.distance_m / 1000, 3),
+            'top_speed_knots': round(self.top_speed, 2),
+            'time_to_first_fix_secs': ttff,
+            'fix_quality': dict(sorted(self.quality.items())),
+            'grid_squares': dict((grid.locator_from_square(square), count) for square, count in sorted(self.squares.items())),
+        }
+
+
+def is_capture(paths):
+    for path in paths:
+        with open(path, 'rb') as probe:
+            if probe.read(len(track.page_magic)) != track.page_magic:
+                return True
+
+    return False
+
+
+def analyze(paths):
+    counts = counters()
+    stats = track_stats()
+
+    for fix in read_fixes(paths, counts):
+        stats.add(fix)
+
+    return stats.results(counts, is_capture(paths))
+
+
+def report(results):
+    print('read               {} bytes, {} epochs, {} fixes'.format(results['bytes'], results['epochs'], results['fixes']))
+    print('bad pages / frames {} / {}'.format(results['bad_pages'], results['bad_frames']))
+    print('duration           {} s'.format(results['duration_secs']))
+    print('distance           {} km'.format(results['distance_km']))
+    print('top speed          {} knots'.format(results['top_speed_knots']))
+    print('time to first fix  {}'.format('{} s'.format(results['time_to_first_fix_secs']) if results['time_to_first_fix_secs'] is not None else 'n/a'))
+    print('fix quality        {}'.format(', '.join('{}: {}'.format(quality, count) for quality, count in results['fix_quality'].items())))
+    print('grid squares       {}'.format(len(results['grid_squares'])))
+
+    for square, count in results['grid_squares'].items():
+        print('  {} {:8d} fixes'.format(square, count))
+
+
+# GPX 1.1, WRITTEN AS THE FIXES ARE READ
+
+
+def gpx_time(secs):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(secs))
+
+
+def write_gpx(paths, out, gap, name):
+    counts = counters()
+    points = 0
+    last_secs = None
+    segment = False
+
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<gpx version="1.1" creator="HAM RADIO GPS track_tool" xmlns="http://www.topografix.com/GPX/1/1">\n')
+    out.write('<trk><name>{}</name>\n'.format(name))
+
+    for fix in read_fixes(paths, counts):
+        if fix[fix_lat] is None or fix[fix_lon] is None or not fix[fix_quality]:
+            continue
+
+        secs = fix[fix_secs]
+
+        if segment and secs is not None and last_secs is not None and secs - last_secs > gap:
+            out.write('</trkseg>\n')
+            segment = False
+
+        if not segment:
+            out.write('<trkseg>\n')
+            segment = True
+
+        point = '<trkpt lat="{:.7f}" lon="{:.7f}">'.format(fix[fix_lat], fix[fix_lon])
+
+        if fix[fix_alt] is not None:
+            point += '<ele>{:.1f}</ele>'.format(fix[fix_alt])
+
+        if secs is not None:
+            point += '<time>{}</time>'.format(gpx_time(secs))
+            last_secs = secs
+
+        if fix[fix_sats] is not None:
+            point += '<sat>{}</sat>'.format(fix[fix_sats])
+
+        out.write(point + '</trkpt>\n')
+        points += 1
+
+    if segment:
+        out.write('</trkseg>\n')
+
+    out.write('</trk>\n</gpx>\n')
+    return points, counts
+
+
+# BENCHMARK DATA: A TRACK LOG OF records RECORDS (A STRAIGHT LINE AT 12 KNOTS) AND A CAPTURE OF seconds
+# AT rate HZ, GENERATED piece SECONDS AT A TIME
+
+
+def write_track(path, records, rate):
+    page = bytearray(track.page_size)
+    lat = 41.8781
+    lon = -87.6298
+    step = 12 * 0.514444 / rate / 111320
+    sequence = 0
+
+    with open(path, 'wb') as track_file:
+        for first in range(0, records, track.page_records):
+            count = min(track.page_records, records - first)
+            struct.pack_into(track.page_format, page, 0, track.page_magic, track.page_version, count, sequence & 0xFFFF)
+
+            for i in range(count):
+                n = first + i
+                record_lat = lat + n * step
+                record_lon = lon + n * step
+                struct.pack_into(track.record_format, page, track.page_header_size + i * track.record_size,
+                                 1665400000 + n // rate, int(record_lat * 1e7), int(record_lon * 1e7), 181, 1200, 4500, 9, 1,
+                                 grid.square_index(record_lat, record_lon))
+
+            track_file.write(page)
+            sequence += 1
+
+
+def write_capture(path, seconds, rate, piece=600):
+    with open(path, 'wb') as capture_file:
+        for start in range(0, seconds, piece):
+            epochs = sim_capture.synth_epochs(min(piece, seconds - start), start_time=1665400000 + start, rate=rate, fix_delay=3 if not start else 0)
+
+            for epoch in epochs:
+                for _, frame in epoch:
+                    capture_file.write(frame)
+
+
+# PEAK PYTHON HEAP USED BY stats ON paths, A SECOND PASS WITH tracemalloc ON (IT SLOWS THE PASS DOWN)
+
+
+def peak_memory_kb(paths):
+    tracemalloc.start()
+    analyze(paths)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak // 1024
+
+
+def bench(options):
+    directory = tempfile.mkdtemp(prefix='track_bench_')
+    rows = []
+
+    try:
+        track_path = os.path.join(directory, 'trk00000.bin')
+        capture_path = os.path.join(directory, 'capture.nmea')
+
+        start = time.perf_counter()
+        write_track(track_path, int(options.hours * 3600 * options.rate), options.rate)
+        write_capture(capture_path, int(options.capture_minutes * 60), options.rate)
+        print('generated in {:.1f} s'.format(time.perf_counter() - start))
+
+        for name, path in (('track log', track_path), ('nmea capture', capture_path)):
+            start = time.perf_counter()
+            results = analyze([path])
+            secs = time.perf_counter() - start
+            rows.append({'input': name, 'mb': round(results['bytes'] / 1e6, 1), 'fixes': results['fixes'], 'secs': round(secs, 2),
+                         'mb_per_sec': round(results['bytes'] / 1e6 / secs, 1), 'fixes_per_sec': int(results['fixes'] / secs),
+                         'peak_kb': peak_memory_kb([path])})
+    finally:
+        shutil.rmtree(directory)
+
+    print('input           MB      fixes    secs   MB/s   fixes/s  peak heap KB')
+
+    for row in rows:
+        print('{:12s} {:6.1f} {:10d} {:7.2f} {:6.1f} {:9d} {:12d}'.format(row['input'], row['mb'], row['fixes'], row['secs'], row['mb_per_sec'], row['fixes_per_sec'], row['peak_kb']))
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze device track logs and NMEA / UBX captures, export GPX')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = commands.add_parser('stats', help='distance, fix quality, time to first fix and grid squares')
+    stats_parser.add_argument('files', nargs='+', help='track logs (trkNNNNN.bin) or NMEA / UBX captures, read in order')
+    stats_parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    gpx_parser = commands.add_parser('gpx', help='export a GPX track')
+    gpx_parser.add_argument('files', nargs='+', help='track logs (trkNNNNN.bin) or NMEA / UBX captures, read in order')
+    gpx_parser.add_argument('-o', '--output', help='GPX file to write (default: standard output)')
+    gpx_parser.add_argument('--gap', type=float, default=60, help='start a new track segment after a gap longer than this many seconds')
+    gpx_parser.add_argument('--name', default='HAM RADIO GPS', help='track name')
+
+    bench_parser = commands.add_parser('bench', help='time stats on a generated track log and capture')
+    bench_parser.add_argument('--hours', type=float, default=24, help='hours of track log to generate')
+    bench_parser.add_argument('--capture-minutes', type=float, default=30, help='minutes of NMEA capture to generate')
+    bench_parser.add_argument('--rate', type=int, default=10, help='fixes per second')
+    bench_parser.add_argument('--json', action='store_true', help='print results as JSON')
+
+    options = parser.parse_args(argv)
+
+    if options.command == 'stats':
+        results = analyze(options.files)
+
+        if options.json:
+            print(json.dumps(results, indent=2))
+        else:
+            report(results)
+    elif options.command == 'gpx':
+        if options.output:
+            with open(options.output, 'w') as out:
+                points, counts = write_gpx(options.files, out, options.gap, options.name)
+        else:
+            points, counts = write_gpx(options.files, sys.stdout, options.gap, options.name)
+
+        print('{} points from {} bytes'.format(points, counts.bytes), file=sys.stderr)
+    else:
+        rows = bench(options)
+
+        if options.json:
+            print(json.dumps(rows, indent=2))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())